@@ -102,6 +102,23 @@ CREATE TABLE `products` (
 INSERT INTO `products` VALUES ('a1b2c3d4-e5f6-7890-1234-567890abcdef','Quantum Laptop','A sleek, powerful laptop for all your computing needs.',100.00,1,100),('b2c3d4e5-f6a7-8901-2345-67890abcdef1','Galactic Smartphone','The latest smartphone with a stunning display and cosmic speed.',800.00,150,150),('c3d4e5f6-a7b8-9012-3456-7890abcdef12','Nebula Noise-Cancelling Headphones','Immerse yourself in sound. Blocks out distractions.',250.00,200,200),('d4e5f6a7-b8c9-0123-4567-890abcdef123','Ergonomic Starship Keyboard','Type comfortably for lightyears.',95.00,75,75);
 /*!40000 ALTER TABLE `products` ENABLE KEYS */;
 
+--
+-- Table structure for table `product_stock_shards`
+--
+
+DROP TABLE IF EXISTS `product_stock_shards`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `product_stock_shards` (
+  `product_id` char(36) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `shard_no` int NOT NULL,
+  `stock` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`product_id`,`shard_no`),
+  CONSTRAINT `product_stock_shards_ibfk_1` FOREIGN KEY (`product_id`) REFERENCES `products` (`product_id`) ON DELETE CASCADE,
+  CONSTRAINT `check_shard_stock_non_negative` CHECK ((`stock` >= 0))
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Dumping routines for database 'ecommerce'
 --
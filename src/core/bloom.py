@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from src.database.redis import ar, r
+
+# Cross-cutting concern: Bloom filter membership index, stored in Redis and
+# mirrored in-process
+
+
+class BloomFilter:
+    """Bloom filter over string ids, shared through a Redis string of bits.
+
+    `might_contain` answers from an in-process copy of the bits, refreshed
+    every `refresh_seconds`. A local miss is confirmed against Redis before it
+    counts, so ids added by other processes since the last refresh are never
+    rejected. A filter that was never built (key missing), one built with a
+    different size or an unreachable Redis answers True: callers only reject
+    ids that are definitely unknown.
+    """
+
+    def __init__(self, key: str, capacity: int, error_rate: float, refresh_seconds: float):
+        self.key = key
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.size += -self.size % 8
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.refresh_seconds = refresh_seconds
+        self._bits: Optional[bytearray] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    # ---- local mirror ----
+
+    def _mirror(self) -> Optional[bytearray]:
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return self._bits
+        with self._lock:
+            if time.monotonic() - self._loaded_at >= self.refresh_seconds:
+                try:
+                    raw = r.get(self.key)
+                    self._bits = (
+                        bytearray(raw) if raw and len(raw) * 8 == self.size else None
+                    )
+                except Exception as e:
+                    logging.warning(f"Bloom filter {self.key} refresh failed: {e}")
+                self._loaded_at = time.monotonic()
+        return self._bits
+
+    def _set_local(self, positions: List[int]) -> None:
+        bits = self._bits
+        if bits is None:
+            return
+        for position in positions:
+            bits[position >> 3] |= 0x80 >> (position & 7)
+
+    @staticmethod
+    def _test(bits: bytearray, positions: List[int]) -> bool:
+        return all(bits[position >> 3] & (0x80 >> (position & 7)) for position in positions)
+
+    # ---- membership ----
+
+    def might_contain(self, item: str) -> bool:
+        positions = self._positions(item)
+        bits = self._mirror()
+        if bits is not None and self._test(bits, positions):
+            return True
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.strlen(self.key)
+            for position in positions:
+                pipe.getbit(self.key, position)
+            length, *found = pipe.execute()
+        except Exception as e:
+            logging.warning(f"Bloom filter {self.key} unavailable: {e}")
+            return True
+        if length != self.size // 8:
+            # Missing, or built with another capacity/error rate (e.g. during
+            # a rolling deploy): our positions mean nothing in it
+            return True
+        if all(found):
+            self._set_local(positions)
+            return True
+        return False
+
+    def add(self, *items: str) -> None:
+        """Add ids to Redis (one pipeline) and to the local copy."""
+        if not items:
+            return
+        positions = [position for item in items for position in self._positions(item)]
+        try:
+            pipe = r.pipeline(transaction=False)
+            for position in positions:
+                pipe.setbit(self.key, position, 1)
+            pipe.execute()
+        except Exception as e:
+            logging.warning(f"Failed to add {len(items)} ids to bloom filter {self.key}: {e}")
+        self._set_local(positions)
+
+    async def add_async(self, *items: str) -> None:
+        if not items:
+            return
+        positions = [position for item in items for position in self._positions(item)]
+        try:
+            pipe = ar.pipeline(transaction=False)
+            for position in positions:
+                pipe.setbit(self.key, position, 1)
+            await pipe.execute()
+        except Exception as e:
+            logging.warning(f"Failed to add {len(items)} ids to bloom filter {self.key}: {e}")
+        self._set_local(positions)
+
+    def rebuild(self, items: Iterable[str]) -> int:
+        """Replace the filter with one built from `items`; returns the count.
+
+        Bits set by concurrent `add` calls while building are kept.
+        """
+        bits = bytearray(self.size // 8)
+        count = 0
+        for item in items:
+            for position in self._positions(item):
+                bits[position >> 3] |= 0x80 >> (position & 7)
+            count += 1
+        building = f"{self.key}:building"
+        pipe = r.pipeline(transaction=True)
+        pipe.set(building, bytes(bits))
+        if r.strlen(self.key) == len(bits):
+            pipe.bitop("OR", building, building, self.key)
+        pipe.rename(building, self.key)
+        pipe.execute()
+        with self._lock:
+            self._loaded_at = 0.0
+        return count
@@ -0,0 +1,171 @@
+import os
+
+# Cross-cutting concern: runtime configuration read from the environment
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# Order processing
+# "single": one Celery task per order (default)
+# "batch":  orders are drained in batches and settled per product group
+# "partitioned": orders are routed by product to ORDER_PARTITIONS queues, each
+#                drained by a single writer that owns the products' stock
+ORDER_PROCESSING_MODE = os.getenv("ORDER_PROCESSING_MODE", "single")
+ORDER_BATCH_SIZE = env_int("ORDER_BATCH_SIZE", 200)
+ORDER_BATCH_WAIT_MS = env_int("ORDER_BATCH_WAIT_MS", 10)
+# Changing this moves products between partitions: drain the queues first
+ORDER_PARTITIONS = env_int("ORDER_PARTITIONS", 8)
+# Upper bound on items per POST /orders/batch request
+ORDER_BULK_MAX_ITEMS = env_int("ORDER_BULK_MAX_ITEMS", 5000)
+
+# Order transport between the API and the settlement consumers
+# "celery": Celery tasks (default)
+# "stream": Redis Stream entries read by consumer-group workers (workers/streams.py)
+ORDER_TRANSPORT = os.getenv("ORDER_TRANSPORT", "celery")
+ORDER_STREAM_KEY = os.getenv("ORDER_STREAM_KEY", "orders:stream")
+ORDER_STREAM_GROUP = os.getenv("ORDER_STREAM_GROUP", "settlers")
+ORDER_STREAM_BATCH = env_int("ORDER_STREAM_BATCH", 200)
+ORDER_STREAM_BLOCK_MS = env_int("ORDER_STREAM_BLOCK_MS", 1000)
+# Entries pending this long on a consumer are reclaimed by another one
+ORDER_STREAM_CLAIM_IDLE_MS = env_int("ORDER_STREAM_CLAIM_IDLE_MS", 60_000)
+# Entries delivered this often without being settled are recorded as FAILED
+# and moved to the dead-letter stream (1 + the Celery task's 3 retries)
+ORDER_STREAM_MAX_DELIVERIES = env_int("ORDER_STREAM_MAX_DELIVERIES", 4)
+ORDER_STREAM_DEAD_LETTER_KEY = os.getenv("ORDER_STREAM_DEAD_LETTER_KEY", "orders:stream:dead")
+
+# Admission control in front of queue_order: 503 when the broker backlog is
+# too deep or too slow to drain, 429 per customer from a Redis token bucket
+ADMISSION_ENABLED = env_bool("ADMISSION_ENABLED")
+ADMISSION_SAMPLE_SECONDS = env_float("ADMISSION_SAMPLE_SECONDS", 1.0)
+ADMISSION_MAX_QUEUE_DEPTH = env_int("ADMISSION_MAX_QUEUE_DEPTH", 50_000)
+ADMISSION_MAX_DRAIN_SECONDS = env_int("ADMISSION_MAX_DRAIN_SECONDS", 30)
+ADMISSION_CUSTOMER_RATE = env_float("ADMISSION_CUSTOMER_RATE", 5.0)
+ADMISSION_CUSTOMER_BURST = env_int("ADMISSION_CUSTOMER_BURST", 20)
+ADMISSION_MAX_RETRY_AFTER = env_int("ADMISSION_MAX_RETRY_AFTER", 30)
+
+# Bloom filters of known product and customer ids: queue_order rejects ids
+# that are definitely unknown before enqueueing
+ID_FILTER_ENABLED = env_bool("ID_FILTER_ENABLED")
+ID_FILTER_CAPACITY = env_int("ID_FILTER_CAPACITY", 1_000_000)
+ID_FILTER_ERROR_RATE = env_float("ID_FILTER_ERROR_RATE", 0.001)
+ID_FILTER_REFRESH_SECONDS = env_int("ID_FILTER_REFRESH_SECONDS", 60)
+# Rebuild from the tables (picks up rows inserted outside the API)
+ID_FILTER_REBUILD_SECONDS = env_int("ID_FILTER_REBUILD_SECONDS", 3600)
+
+# Lifetime of Idempotency-Key records of POST /orders/
+ORDER_IDEMPOTENCY_TTL_SECONDS = env_int("ORDER_IDEMPOTENCY_TTL_SECONDS", 86_400)
+
+# Redis stock reservation gate in front of the order queue
+STOCK_RESERVATION_ENABLED = env_bool("STOCK_RESERVATION_ENABLED")
+STOCK_RESERVATION_RECONCILE_SECONDS = env_int("STOCK_RESERVATION_RECONCILE_SECONDS", 60)
+# Reservations not settled within this window are treated as lost tasks
+STOCK_RESERVATION_MAX_AGE_SECONDS = env_int("STOCK_RESERVATION_MAX_AGE_SECONDS", 600)
+
+# Sharded stock for hot products (shards are created per product, see products/shards.py)
+SHARDED_STOCK_ENABLED = env_bool("SHARDED_STOCK_ENABLED")
+SHARDED_STOCK_ROLLUP_SECONDS = env_int("SHARDED_STOCK_ROLLUP_SECONDS", 5)
+
+# Settlement engine used by orders.process_order
+# "locking":     SELECT ... FOR UPDATE on product and customer (default)
+# "conditional": guarded UPDATE ... WHERE stock > 0 / wallet_balance >= price
+# "group":       conditional checks, writes group-committed per worker process
+SETTLEMENT_ENGINE = os.getenv("SETTLEMENT_ENGINE", "locking")
+# Checked here so a typo stops every process at start, not inside each task
+if SETTLEMENT_ENGINE not in ("locking", "conditional", "group"):
+    raise ValueError(
+        f"Unknown SETTLEMENT_ENGINE {SETTLEMENT_ENGINE!r}, "
+        "expected one of: locking, conditional, group"
+    )
+GROUP_COMMIT_MAX_ITEMS = env_int("GROUP_COMMIT_MAX_ITEMS", 64)
+GROUP_COMMIT_WAIT_MS = env_int("GROUP_COMMIT_WAIT_MS", 5)
+
+# Redis order:{id} status record read before MySQL by get_order
+ORDER_STATUS_CACHE_ENABLED = env_bool("ORDER_STATUS_CACHE_ENABLED")
+ORDER_STATUS_TTL_SECONDS = env_int("ORDER_STATUS_TTL_SECONDS", 86_400)
+
+# Order status push over SSE/WebSocket, fed by Redis pub/sub from the writers
+ORDER_EVENTS_ENABLED = env_bool("ORDER_EVENTS_ENABLED")
+ORDER_EVENTS_TIMEOUT_SECONDS = env_int("ORDER_EVENTS_TIMEOUT_SECONDS", 300)
+ORDER_EVENTS_KEEPALIVE_SECONDS = env_int("ORDER_EVENTS_KEEPALIVE_SECONDS", 15)
+ORDER_EVENTS_MAX_SUBSCRIPTIONS = env_int("ORDER_EVENTS_MAX_SUBSCRIPTIONS", 1000)
+
+# Prometheus metrics: GET /metrics on the API, WORKER_METRICS_PORT on the Celery
+# worker; start.sh points PROMETHEUS_MULTIPROC_DIR at a shared directory so
+# every process is aggregated (see core/metrics.py)
+METRICS_ENABLED = env_bool("METRICS_ENABLED")
+WORKER_METRICS_PORT = env_int("WORKER_METRICS_PORT", 9101)
+
+# OpenTelemetry tracing from the API through the broker into the worker (see
+# core/tracing.py); the ratio applies to root spans, children follow their parent
+TRACING_ENABLED = env_bool("TRACING_ENABLED")
+TRACING_SAMPLE_RATIO = env_float("TRACING_SAMPLE_RATIO", 0.1)
+# "otlp": OTLP/HTTP to TRACING_OTLP_ENDPOINT
+# "file": OTLP JSON lines, one file per process under TRACING_FILE_DIR
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "otlp")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_FILE_DIR = os.getenv("TRACING_FILE_DIR", "/tmp/traces")
+
+# On-demand sampling profiler writing collapsed stacks (see core/profiler.py);
+# HTTP triggers are disabled while PROFILER_TOKEN is empty
+PROFILER_ENABLED = env_bool("PROFILER_ENABLED")
+PROFILER_INTERVAL_MS = env_float("PROFILER_INTERVAL_MS", 10.0)
+PROFILER_SECONDS = env_float("PROFILER_SECONDS", 30.0)
+PROFILER_MAX_SECONDS = env_float("PROFILER_MAX_SECONDS", 300.0)
+PROFILER_DIR = os.getenv("PROFILER_DIR", "/tmp/profiles")
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+
+# Logging (see core/logging.py): records are handed to a listener thread that
+# formats and writes them; "text" or "json" (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = env_int("LOG_QUEUE_SIZE", 10000)
+# Per-logger caps on records per second from each logging call, e.g.
+# "src.modules.workers=20,src.modules.orders.service=50"; ERROR and above are
+# never limited
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "")
+
+# Async request path (AsyncSession + redis.asyncio + async def handlers)
+ASYNC_API_ENABLED = env_bool("ASYNC_API_ENABLED")
+
+# Product read cache
+# With invalidation on, stock changes evict cached entries on every API worker,
+# so freshness no longer depends on short TTLs
+PRODUCT_INVALIDATION_ENABLED = env_bool("PRODUCT_INVALIDATION_ENABLED")
+PRODUCT_INPROC_TTL = env_int(
+    "PRODUCT_INPROC_TTL", 300 if PRODUCT_INVALIDATION_ENABLED else 30
+)
+PRODUCT_REDIS_TTL = env_int(
+    "PRODUCT_REDIS_TTL", 300 if PRODUCT_INVALIDATION_ENABLED else 10
+)
+# Last known value served while another worker reloads a product
+PRODUCT_STALE_TTL = env_int("PRODUCT_STALE_TTL", 300)
+# Cross-process single flight: one loader per product holds lock:product:{id}
+PRODUCT_CACHE_LOCK_ENABLED = env_bool("PRODUCT_CACHE_LOCK_ENABLED", True)
+PRODUCT_CACHE_LOCK_MS = env_int("PRODUCT_CACHE_LOCK_MS", 2000)
+PRODUCT_CACHE_WAIT_MS = env_int("PRODUCT_CACHE_WAIT_MS", 100)
+# Stale-while-revalidate: entries outlive their TTL by the grace period; reads
+# in that window return the stale value and trigger one background refresh
+PRODUCT_SWR_ENABLED = env_bool("PRODUCT_SWR_ENABLED")
+PRODUCT_SWR_GRACE_SECONDS = env_int("PRODUCT_SWR_GRACE_SECONDS", 60)
+# Upper bound on ids per GET /products?ids=... request
+PRODUCT_LOOKUP_MAX_IDS = env_int("PRODUCT_LOOKUP_MAX_IDS", 100)
+PRODUCT_INPROC_MAXSIZE = env_int("PRODUCT_INPROC_MAXSIZE", 10_000)
+# Shared-memory tier between the per-process cache and Redis, one table per host
+PRODUCT_SHM_ENABLED = env_bool("PRODUCT_SHM_ENABLED")
+PRODUCT_SHM_PATH = os.getenv("PRODUCT_SHM_PATH", "/dev/shm/ecommerce-products")
+PRODUCT_SHM_SLOTS = env_int("PRODUCT_SHM_SLOTS", 16_384)
+PRODUCT_SHM_SLOT_BYTES = env_int("PRODUCT_SHM_SLOT_BYTES", 512)
@@ -1,6 +1,35 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 from enum import Enum
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from src.core import config
+
 # Cross-cutting concern: logging configuration
+#
+# Application threads only put records on a bounded queue; a listener thread
+# formats them (text or JSON) and writes them to stderr, so log I/O stays off
+# the request and settlement paths. When the queue is full records are dropped
+# and counted rather than blocking the caller. Call sites use %-style
+# arguments, so disabled levels and rate-limited records are never formatted.
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime",
+}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
 
 class LogLevels(Enum):
     debug = logging.DEBUG
@@ -9,8 +38,177 @@ class LogLevels(Enum):
     error = logging.ERROR
     critical = logging.CRITICAL
 
+
+def _notes(record: logging.LogRecord) -> Dict[str, int]:
+    return {
+        key: getattr(record, key)
+        for key in ("suppressed", "dropped")
+        if getattr(record, key, 0)
+    }
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        notes = _notes(record)
+        if notes:
+            text += " [" + ", ".join(f"{n} {key}" for key, n in notes.items()) + "]"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including fields passed with `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Cap records per second from each call site of the configured loggers.
+
+    Limits apply to a logger and its children (the longest configured prefix
+    wins). Records over the cap are dropped before they are formatted; the
+    next record let through from that call site carries their count as
+    `suppressed`. ERROR and above always pass.
+    """
+
+    def __init__(self, limits: Dict[str, float]):
+        super().__init__()
+        self.limits = limits
+        self._by_logger: Dict[str, Optional[float]] = {}
+        # (pathname, lineno) -> [window start, records in window, suppressed]
+        self._windows: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def _limit(self, name: str) -> Optional[float]:
+        try:
+            return self._by_logger[name]
+        except KeyError:
+            pass
+        matches = [
+            prefix
+            for prefix in self.limits
+            if name == prefix or name.startswith(prefix + ".")
+        ]
+        limit = self.limits[max(matches, key=len)] if matches else None
+        self._by_logger[name] = limit
+        return limit
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        limit = self._limit(record.name)
+        if limit is None:
+            return True
+
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hand records to the listener without formatting or blocking.
+
+    Only the message arguments are resolved here (they may be mutated once
+    the caller continues); formatting and I/O happen on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Carry over the count this record was reporting
+            self.dropped += 1 + getattr(record, "dropped", 0)
+
+
+def _parse_limits(spec: str) -> Dict[str, float]:
+    limits = {}
+    for item in spec.split(","):
+        name, _, limit = item.partition("=")
+        if name.strip() and limit.strip():
+            limits[name.strip()] = float(limit)
+    return limits
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_in_child() -> None:
+    # The listener thread does not survive fork (Celery prefork pool), and
+    # the parent's queue may hold its records or a held lock
+    global _listener
+    if _listener is None:
+        return
+    _queue_handler.queue = queue.Queue(config.LOG_QUEUE_SIZE)
+    _listener = QueueListener(_queue_handler.queue, *_listener.handlers)
+    _listener.start()
+
+
 def configure_logging(level: LogLevels = LogLevels.info):
-    logging.basicConfig(
-        level=level.value,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
\ No newline at end of file
+    global _listener, _queue_handler
+
+    stream = logging.StreamHandler()
+    if config.LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter(TEXT_FORMAT))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(config.LOG_QUEUE_SIZE))
+    limits = _parse_limits(config.LOG_RATE_LIMITS)
+    if limits:
+        queue_handler.addFilter(RateLimitFilter(limits))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.value)
+
+    first = _listener is None
+    _stop_listener()
+    _queue_handler = queue_handler
+    _listener = QueueListener(queue_handler.queue, stream)
+    _listener.start()
+    if first:
+        atexit.register(_stop_listener)
+        os.register_at_fork(after_in_child=_restart_listener_in_child)
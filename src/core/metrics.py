@@ -0,0 +1,277 @@
+"""
+Prometheus metrics (METRICS_ENABLED).
+
+Every process writes its samples under PROMETHEUS_MULTIPROC_DIR (set by
+start.sh before any process starts), so the gunicorn workers, Celery pool
+processes and stream consumers aggregate into one view. `render()` collects
+that directory; it backs GET /metrics on the API and the Celery worker's
+WORKER_METRICS_PORT. Without PROMETHEUS_MULTIPROC_DIR each process only
+reports itself, which is enough for a single-process dev server.
+
+Callers check config.METRICS_ENABLED before observing, so nothing here runs
+when metrics are off.
+"""
+
+import os
+import time
+from typing import Iterable, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Lookups in the in-process tiers take microseconds, DB-backed ones milliseconds
+FAST_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+SETTLE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+    2.5, 5.0, 10.0,
+)
+QUEUE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+)
+CACHE_LOOKUPS = Counter(
+    "product_cache_lookups_total",
+    "Product cache lookups per tier (inproc, shm, redis)",
+    ["tier", "result"],
+)
+CACHE_LOOKUP_SECONDS = Histogram(
+    "product_cache_lookup_seconds",
+    "Product cache lookup latency per tier",
+    ["tier"],
+    buckets=FAST_BUCKETS,
+)
+CACHE_EVENTS = Counter(
+    "product_cache_events_total",
+    "Product cache miss-path events (see products/cache.py stats())",
+    ["event"],
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+    buckets=FAST_BUCKETS,
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Database connections currently checked out",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+ORDER_QUEUE_SECONDS = Histogram(
+    "order_queue_seconds",
+    "Time from enqueue to the start of settlement",
+    ["transport"],
+    buckets=QUEUE_BUCKETS,
+)
+ORDER_SETTLE_SECONDS = Histogram(
+    "order_settle_seconds",
+    "process_order settlement time",
+    ["engine"],
+    buckets=SETTLE_BUCKETS,
+)
+ORDER_SETTLE_PHASE_SECONDS = Histogram(
+    "order_settle_phase_seconds",
+    "Settlement time per engine phase; product_lock, customer_lock and "
+    "stock_update are the row lock waits",
+    ["engine", "phase"],
+    buckets=SETTLE_BUCKETS,
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "order_admission_queue_depth",
+    "Broker backlog seen by the latest admission sample",
+    multiprocess_mode="livemax",
+)
+ADMISSION_SETTLE_RATE = Gauge(
+    "order_admission_settle_rate",
+    "Smoothed cluster-wide settle rate (orders/s) used by admission",
+    multiprocess_mode="livemax",
+)
+ORDERS_ADMITTED = Counter(
+    "order_admission_admitted_total",
+    "Orders admitted by admission control",
+)
+ORDERS_SHED = Counter(
+    "order_admission_shed_total",
+    "Orders shed by admission control (overloaded: 503, rate_limited: 429)",
+    ["reason"],
+)
+ORDERS_SETTLED = Counter(
+    "orders_settled_total",
+    "Settled orders by outcome",
+    ["status", "reason"],
+)
+
+# Failure reasons carry ids; the label keeps only their kind
+_REASONS = (
+    ("Insufficient stock", "out_of_stock"),
+    ("Insufficient balance", "insufficient_balance"),
+    ("Product", "product_not_found"),
+    ("Customer", "customer_not_found"),
+    ("Invalid price", "invalid_price"),
+    ("Previously failed", "previously_failed"),
+    ("Unexpected error", "unexpected_error"),
+)
+
+
+def render() -> Tuple[bytes, str]:
+    """Exposition of every process's samples, and its content type."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def start_http_server(port: int) -> None:
+    """Serve the same exposition as GET /metrics from a background thread."""
+    from prometheus_client import start_http_server as serve
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        serve(port, registry=registry)
+    else:
+        serve(port)
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """Drop the live gauges of an exiting process from the aggregate."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # Route template (as declared on its router) set on match, so ids
+            # do not end up in labels; unmatched paths share one label
+            route = scope.get("route")
+            template = route.path if route is not None else "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], template, str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+def observe_cache(tier: str, hit: bool, started: float) -> None:
+    CACHE_LOOKUPS.labels(tier, "hit" if hit else "miss").inc()
+    CACHE_LOOKUP_SECONDS.labels(tier).observe(time.perf_counter() - started)
+
+
+def observe_cache_many(tier: str, hits: int, misses: int, started: float) -> None:
+    if hits:
+        CACHE_LOOKUPS.labels(tier, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(tier, "miss").inc(misses)
+    CACHE_LOOKUP_SECONDS.labels(tier).observe(time.perf_counter() - started)
+
+
+def observe_queue_latency(transport: str, enqueued_at: Optional[float]) -> None:
+    if enqueued_at is not None:
+        ORDER_QUEUE_SECONDS.labels(transport).observe(max(0.0, time.time() - enqueued_at))
+
+
+def observe_settle(engine: str, seconds: float) -> None:
+    ORDER_SETTLE_SECONDS.labels(engine).observe(seconds)
+
+
+def observe_outcomes(results: Iterable[dict]) -> None:
+    for result in results:
+        status = result.get("status", "UNKNOWN")
+        ORDERS_SETTLED.labels(status, _reason_label(result.get("reason"))).inc()
+
+
+def observe_admission_sample(queue_depth: int, settle_rate: float) -> None:
+    ADMISSION_QUEUE_DEPTH.set(queue_depth)
+    ADMISSION_SETTLE_RATE.set(settle_rate)
+
+
+def count_admission(outcome: str, count: int) -> None:
+    """outcome: admitted, rate_limited or overloaded."""
+    if outcome == "admitted":
+        ORDERS_ADMITTED.inc(count)
+    else:
+        ORDERS_SHED.labels(outcome).inc(count)
+
+
+def _reason_label(reason: Optional[str]) -> str:
+    if not reason:
+        return ""
+    for prefix, label in _REASONS:
+        if reason.startswith(prefix):
+            return label
+    return "other"
+
+
+def settle_phase_hook(engine: str):
+    """settlement.phase_hook recording into order_settle_phase_seconds."""
+
+    def observe(phase: str, seconds: float) -> None:
+        ORDER_SETTLE_PHASE_SECONDS.labels(engine, phase).observe(seconds)
+
+    return observe
+
+
+class _TimedPool:
+    """Pool mixin recording checkout wait and the number of connections out."""
+
+    pool_label = ""
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        POOL_CHECKOUT_SECONDS.labels(self.pool_label).observe(
+            time.perf_counter() - started
+        )
+        return connection
+
+    def _do_get(self):
+        record = super()._do_get()
+        POOL_CHECKED_OUT.labels(self.pool_label).inc()
+        return record
+
+    def _do_return_conn(self, record):
+        POOL_CHECKED_OUT.labels(self.pool_label).dec()
+        super()._do_return_conn(record)
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pool_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pool_label = "async"
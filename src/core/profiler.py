@@ -0,0 +1,304 @@
+"""
+On-demand sampling profiler (PROFILER_ENABLED).
+
+While a session runs, a background thread snapshots every thread's Python
+stack with sys._current_frames() every PROFILER_INTERVAL_MS and counts them in
+collapsed-stack format (`label;frame;frame;... count`), which flamegraph.pl,
+speedscope and inferno read directly. Nothing is sampled between sessions.
+
+Each sample is attributed to the route or task its thread is serving, which
+becomes the root frame:
+
+- Celery tasks: task_prerun/task_postrun label the executing thread
+- API: the middleware records the route of each request's asyncio task (code
+  running on the event loop, e.g. response validation), and the endpoint
+  function of every route it has seen (sync endpoints run in threadpool
+  threads)
+
+Samples of threads serving neither (idle pool threads, the event loop waiting)
+are dropped unless the session was started with all_threads, then they appear
+under `thread:<name>`.
+
+A session runs for a bounded window (capped at PROFILER_MAX_SECONDS) and is
+written to PROFILER_DIR/<service>-<pid>-<time>.collapsed. Triggers:
+
+- SIGUSR2: starts a PROFILER_SECONDS session, or stops the running one early
+- POST /admin/profile?seconds=N on the API (X-Profile-Token: PROFILER_TOKEN):
+  profiles the process serving it and returns the stacks
+- X-Profile: PROFILER_TOKEN on any API request: profiles that route while the
+  request runs; the file is named in the X-Profile-File response header
+- `celery -A src.modules.workers.celery.celery_app control profile [seconds]`:
+  thread/solo pools profile in-process, prefork children get SIGUSR2
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from src.core import config
+
+logger = logging.getLogger(__name__)
+
+# Attribution, maintained by the hooks below while a session runs
+_thread_labels: Dict[int, str] = {}
+_task_scopes: Dict[asyncio.Task, dict] = {}
+_loops: Dict[int, asyncio.AbstractEventLoop] = {}
+_code_labels: Dict[object, str] = {}
+
+
+class _Session:
+    def __init__(self, deadline: float, all_threads: bool, only_scope: Optional[dict]):
+        self.deadline = deadline
+        self.all_threads = all_threads
+        self.only_scope = only_scope
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.done = threading.Event()
+        self.path: Optional[str] = None
+
+
+class Profiler:
+    def __init__(self):
+        self.service = "app"
+        self._lock = threading.Lock()
+        self._session: Optional[_Session] = None
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None
+
+    def start(
+        self,
+        seconds: Optional[float] = None,
+        all_threads: bool = False,
+        only_scope: Optional[dict] = None,
+    ) -> Optional[_Session]:
+        """Start a session; returns None if one is already running.
+
+        With only_scope, only samples of that request's route are kept.
+        """
+        seconds = min(seconds or config.PROFILER_SECONDS, config.PROFILER_MAX_SECONDS)
+        with self._lock:
+            if self._session is not None:
+                return None
+            session = _Session(time.monotonic() + seconds, all_threads, only_scope)
+            session.path = self._path()
+            self._session = session
+        threading.Thread(
+            target=self._run, args=(session,), name="profiler", daemon=True
+        ).start()
+        logger.info(f"Profiling {self.service} pid {os.getpid()} for {seconds}s")
+        return session
+
+    def stop(self) -> None:
+        session = self._session
+        if session is not None:
+            session.stopped.set()
+
+    def toggle(self) -> None:
+        """Start a default session, or end the running one early."""
+        if self.active:
+            self.stop()
+        elif self.start() is None:
+            logger.warning("A profile is already running")
+
+    def _on_signal(self, *_) -> None:
+        # Signal handlers run between bytecodes of the main thread, which may
+        # hold the session or logging locks
+        threading.Thread(target=self.toggle, name="profiler-signal", daemon=True).start()
+
+    def _path(self) -> str:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return os.path.join(
+            config.PROFILER_DIR, f"{self.service}-{os.getpid()}-{stamp}.collapsed"
+        )
+
+    def _run(self, session: _Session) -> None:
+        interval = config.PROFILER_INTERVAL_MS / 1000
+        me = threading.get_ident()
+        names = {}
+        try:
+            while time.monotonic() < session.deadline and not session.stopped.is_set():
+                if len(names) != threading.active_count():
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != me:
+                        self._sample(session, thread_id, frame, names)
+                session.samples += 1
+                session.stopped.wait(interval)
+        finally:
+            self._write(session)
+            with self._lock:
+                self._session = None
+            session.done.set()
+
+    def _sample(self, session: _Session, thread_id: int, frame, names) -> None:
+        frames = []
+        label = _thread_labels.get(thread_id)
+        while frame is not None:
+            code = frame.f_code
+            if label is None:
+                label = _code_labels.get(code)
+            frames.append(f"{code.co_qualname} ({_short(code.co_filename)})")
+            frame = frame.f_back
+        if label is None:
+            label = _task_label(thread_id)
+        if label is None:
+            if not session.all_threads:
+                return
+            label = f"thread:{names.get(thread_id, thread_id)}"
+        if session.only_scope is not None:
+            # Until the request's route is matched every labelled sample is kept
+            wanted = _route_label(session.only_scope)
+            if wanted is not None and label != wanted:
+                return
+        frames.append(label)
+        session.counts[";".join(reversed(frames))] += 1
+
+    def _write(self, session: _Session) -> None:
+        try:
+            os.makedirs(config.PROFILER_DIR, exist_ok=True)
+            with open(session.path, "w", encoding="utf-8") as out:
+                for stack, count in session.counts.most_common():
+                    out.write(f"{stack} {count}\n")
+            logger.info(
+                f"Profile written to {session.path}: {session.samples} samples, "
+                f"{len(session.counts)} distinct stacks"
+            )
+        except OSError as e:
+            logger.error(f"Failed to write profile {session.path}: {e}")
+
+
+def _short(filename: str) -> str:
+    """Library frames by package path, application frames from src/."""
+    _, found, path = filename.rpartition("site-packages/")
+    if found:
+        return path
+    _, found, path = filename.rpartition("/src/")
+    if found:
+        return f"src/{path}"
+    return os.path.basename(filename)
+
+
+def _task_label(thread_id: int) -> Optional[str]:
+    loop = _loops.get(thread_id)
+    if loop is None:
+        return None
+    task = asyncio.current_task(loop)
+    scope = _task_scopes.get(task) if task is not None else None
+    return _route_label(scope) if scope is not None else None
+
+
+def _route_label(scope: dict) -> Optional[str]:
+    route = scope.get("route")
+    if route is None:
+        return None
+    return f"{scope['method']} {route.path}"
+
+
+profiler = Profiler()
+
+
+def _valid_token(value: Optional[str]) -> bool:
+    token = config.PROFILER_TOKEN
+    return bool(token) and value is not None and hmac.compare_digest(value, token)
+
+
+def install_signal_handler(service: str) -> None:
+    """SIGUSR2 toggles a session; must be called from the main thread."""
+    profiler.service = service
+    signal.signal(signal.SIGUSR2, profiler._on_signal)
+
+
+# ---- Celery ----
+
+
+def label_thread(label: str) -> None:
+    if profiler.active:
+        _thread_labels[threading.get_ident()] = label
+
+
+def unlabel_thread() -> None:
+    _thread_labels.pop(threading.get_ident(), None)
+
+
+# ---- API ----
+
+
+class ProfilerMiddleware:
+    """Attributes event-loop work to routes, and serves the X-Profile trigger."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        requested = bool(config.PROFILER_TOKEN) and _valid_token(
+            _header(scope, b"x-profile")
+        )
+        if not profiler.active and not requested:
+            return await self.app(scope, receive, send)
+
+        task = asyncio.current_task()
+        _loops[threading.get_ident()] = asyncio.get_running_loop()
+        _task_scopes[task] = scope
+        session = None
+        if requested:
+            session = profiler.start(only_scope=scope)
+
+        async def send_file(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-file", session.path.encode("utf-8"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_file if session is not None else send)
+        finally:
+            _task_scopes.pop(task, None)
+            route = scope.get("route")
+            if route is not None and hasattr(route, "endpoint"):
+                _code_labels.setdefault(route.endpoint.__code__, _route_label(scope))
+            if session is not None:
+                session.stopped.set()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def register_admin_routes(app) -> None:
+    from fastapi import Header, HTTPException, Query
+    from fastapi.responses import PlainTextResponse
+
+    @app.post("/admin/profile", include_in_schema=False)
+    async def profile(
+        seconds: float = Query(10.0, gt=0),
+        all_threads: bool = False,
+        token: Optional[str] = Header(None, alias="X-Profile-Token"),
+    ):
+        if not _valid_token(token):
+            raise HTTPException(status_code=403, detail="Invalid profiler token")
+        session = profiler.start(seconds, all_threads=all_threads)
+        if session is None:
+            raise HTTPException(status_code=409, detail="A profile is already running")
+        await asyncio.to_thread(session.done.wait)
+        body = "".join(
+            f"{stack} {count}\n" for stack, count in session.counts.most_common()
+        )
+        return PlainTextResponse(body, headers={"X-Profile-File": session.path})
@@ -0,0 +1,135 @@
+"""
+Distributed tracing (TRACING_ENABLED) with OpenTelemetry.
+
+One trace follows an order from the API request through the broker into the
+worker:
+
+- FastAPI: a server span per request (ASGI send/receive spans are dropped)
+- Celery: an `apply_async/<task>` span when queue_order publishes; its context
+  travels in the task headers and the worker continues it in `run/<task>`
+- SQLAlchemy: a child span per SQL statement, for the sync and async engines
+- Redis: a child span per command or pipeline, for the application's clients
+  only (the broker connection is not traced, so idle polling adds no spans)
+
+Root spans are sampled at TRACING_SAMPLE_RATIO; downstream spans follow their
+parent's decision. Spans are batched and exported over OTLP/HTTP
+(TRACING_EXPORTER=otlp) or appended as OTLP JSON lines to one file per process
+under TRACING_FILE_DIR (TRACING_EXPORTER=file), the format the collector's
+otlpjsonfile receiver reads. Nothing is imported or patched when tracing is off.
+"""
+
+import logging
+import os
+import threading
+from typing import Sequence
+
+from google.protobuf.json_format import MessageToJson
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.instrumentation.celery import CeleryInstrumentor
+from opentelemetry.instrumentation.redis import RedisInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from src.core import config
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+
+
+class OTLPJsonFileExporter(SpanExporter):
+    """Append each exported batch as one OTLP JSON line to a per-process file.
+
+    BatchSpanProcessor re-creates its worker thread after a fork, so the file
+    is (re)opened by the first export of each process.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def _open(self):
+        if self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"spans-{os.getpid()}.jsonl")
+            self._file = open(path, "a", encoding="utf-8")
+            self._pid = os.getpid()
+        return self._file
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        line = MessageToJson(encode_spans(spans), indent=None)
+        try:
+            with self._lock:
+                out = self._open()
+                out.write(line + "\n")
+                out.flush()
+        except OSError as e:
+            logger.warning(f"Failed to write {len(spans)} spans: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+
+
+def _exporter() -> SpanExporter:
+    if config.TRACING_EXPORTER == "file":
+        return OTLPJsonFileExporter(config.TRACING_FILE_DIR)
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    return OTLPSpanExporter(endpoint=config.TRACING_OTLP_ENDPOINT)
+
+
+def configure(service_name: str) -> None:
+    """Install the tracer provider and instrument Celery, SQLAlchemy and Redis.
+
+    Called once per process before it serves requests or tasks; processes
+    forked afterwards (Celery prefork children) inherit it.
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    from src.database.core import async_engine, engine
+    from src.database.redis import ar, r
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(config.TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_exporter()))
+    trace.set_tracer_provider(provider)
+
+    CeleryInstrumentor().instrument()
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    # The instrumentor's declared range stops short of SQLAlchemy 2.1, whose
+    # cursor execution events it hooks are unchanged
+    SQLAlchemyInstrumentor().instrument(engines=engines, skip_dep_check=True)
+    RedisInstrumentor.instrument_client(r)
+    RedisInstrumentor.instrument_client(ar)
+    logger.info(
+        f"Tracing {service_name}: {config.TRACING_EXPORTER} exporter, "
+        f"sample ratio {config.TRACING_SAMPLE_RATIO}"
+    )
+
+
+def instrument_app(app) -> None:
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+    FastAPIInstrumentor.instrument_app(
+        app, excluded_urls="/metrics", exclude_spans=["receive", "send"]
+    )
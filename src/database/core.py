@@ -1,12 +1,25 @@
 from typing import Annotated
 from fastapi import Depends
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 import os
 
+from src.core import config
+
+# Timed pools record checkout wait and occupancy (METRICS_ENABLED)
+if config.METRICS_ENABLED:
+    from src.core.metrics import TimedAsyncQueuePool, TimedQueuePool
+
+    pool_options = {"poolclass": TimedQueuePool}
+    async_pool_options = {"poolclass": TimedAsyncQueuePool}
+else:
+    pool_options = async_pool_options = {}
+
 DATABASE_URL = os.environ["DATABASE_URL"]
 engine = create_engine(
     DATABASE_URL,
+    **pool_options,
     pool_size=50,
     max_overflow=100,
     pool_timeout=30,
@@ -26,3 +39,29 @@ def get_db():
         
 DbSession = Annotated[Session, Depends(get_db)]
 
+# Async stack (ASYNC_API_ENABLED): same database through an asyncio driver
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", DATABASE_URL.replace("+pymysql", "+aiomysql")
+)
+async_engine = (
+    create_async_engine(
+        ASYNC_DATABASE_URL,
+        **async_pool_options,
+        pool_size=50,
+        max_overflow=100,
+        pool_timeout=30,
+        pool_pre_ping=True,
+    )
+    if config.ASYNC_API_ENABLED
+    else None
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+AsyncDbSession = Annotated[AsyncSession, Depends(get_async_db)]
@@ -0,0 +1,9 @@
+import os
+import redis
+import redis.asyncio as aioredis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+r = redis.from_url(REDIS_URL, max_connections=1000)
+
+# asyncio client for the async request path (ASYNC_API_ENABLED)
+ar = aioredis.from_url(REDIS_URL, max_connections=1000)
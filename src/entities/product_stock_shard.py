@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+class ProductStockShard(Base):
+    """One slice of a product's stock when the product runs in sharded-stock mode.
+
+    The sum of a product's shards is the real stock; `products.stock` is kept as a
+    periodically rolled-up aggregate for the read path.
+    """
+
+    __tablename__ = "product_stock_shards"
+
+    product_id = Column(String(36), primary_key=True)
+    shard_no = Column(Integer, primary_key=True)
+    stock = Column(Integer, nullable=False, default=0)
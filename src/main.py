@@ -1,14 +1,58 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from .database.core import engine, Base
 from .entities.customer import Customer  # Import models to register them
 from .entities.order import Order  # Import models to register them
 from .entities.product import Product  # Import models to register them
 from .api.v1.api import register_routes
 from .core.logging import configure_logging, LogLevels
+from .core import config
+from .modules.orders import events as order_events
+from .modules.products import cache as product_cache
 
 
 configure_logging(LogLevels.info)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.PRODUCT_INVALIDATION_ENABLED:
+        product_cache.start_invalidation_listener()
+    if config.PROFILER_ENABLED:
+        from .core import profiler
+
+        profiler.install_signal_handler("api")
+    yield
+    product_cache.stop_invalidation_listener()
+    await order_events.hub.close()
+    if config.METRICS_ENABLED:
+        from .core import metrics
+
+        metrics.mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
 
 register_routes(app)
+
+if config.METRICS_ENABLED:
+    from .core import metrics
+
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        body, content_type = metrics.render()
+        return Response(content=body, media_type=content_type)
+
+if config.TRACING_ENABLED:
+    from .core import tracing
+
+    tracing.configure("ecommerce-api")
+    tracing.instrument_app(app)
+
+if config.PROFILER_ENABLED:
+    from .core import profiler
+
+    app.add_middleware(profiler.ProfilerMiddleware)
+    profiler.register_admin_routes(app)
@@ -1,13 +1,22 @@
 from fastapi import APIRouter, HTTPException
 from uuid import UUID
 
-from src.database.core import DbSession
+from src.core import config
+from src.database.core import DbSession, AsyncDbSession
 from .model import CustomerCreate, CustomerResponse
 from . import service
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
 
-@router.post("/", response_model=CustomerResponse, status_code=201)
-def create_customer(db: DbSession, customer: CustomerCreate):
-    return service.create_customer(db, customer)
+if config.ASYNC_API_ENABLED:
+
+    @router.post("/", response_model=CustomerResponse, status_code=201)
+    async def create_customer(db: AsyncDbSession, customer: CustomerCreate):
+        return await service.create_customer_async(db, customer)
+
+else:
+
+    @router.post("/", response_model=CustomerResponse, status_code=201)
+    def create_customer(db: DbSession, customer: CustomerCreate):
+        return service.create_customer(db, customer)
@@ -1,4 +1,5 @@
 import logging
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.core import DbSession
 from src.entities.customer import Customer
 
@@ -8,9 +9,23 @@ def add_customer(db: DbSession, customer_create):
     db.add(customer)
     db.commit()
     db.refresh(customer)
-    logging.info(f"Created new customer: {customer.customer_id}")
+    logging.info("Created new customer: %s", customer.customer_id)
+    return customer
+
+
+async def add_customer_async(db: AsyncSession, customer_create):
+    customer = Customer(username=customer_create.username, wallet_balance=5000.0)
+    db.add(customer)
+    await db.commit()
+    await db.refresh(customer)
+    logging.info("Created new customer: %s", customer.customer_id)
     return customer
 
 
 def get_customer(db: DbSession, customer_id: str) -> Customer | None:
     return db.query(Customer).filter(Customer.customer_id == customer_id).first()
+
+
+def iter_customer_ids(db: DbSession):
+    for (customer_id,) in db.query(Customer.customer_id).yield_per(10_000):
+        yield customer_id
@@ -2,13 +2,39 @@ from uuid import uuid4, UUID
 from .model import CustomerCreate, CustomerResponse
 from src.entities.customer import Customer as CustomerORM
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import repository
+from src.core import config
+from src.core.bloom import BloomFilter
 import logging
 
+# Ids of existing customers (ID_FILTER_ENABLED), fed by every new customer
+known_ids = BloomFilter(
+    "bloom:customers",
+    config.ID_FILTER_CAPACITY,
+    config.ID_FILTER_ERROR_RATE,
+    config.ID_FILTER_REFRESH_SECONDS,
+)
+
 
 def create_customer(db: Session, customer: CustomerCreate) -> CustomerResponse:
     try:
         customer = repository.add_customer(db, customer)
+        if config.ID_FILTER_ENABLED:
+            known_ids.add(str(customer.customer_id).lower())
+        return customer
+    except Exception as e:
+        logging.error(f"Failed to create customer. Error: {str(e)}")
+        raise
+
+
+async def create_customer_async(
+    db: AsyncSession, customer: CustomerCreate
+) -> CustomerResponse:
+    try:
+        customer = await repository.add_customer_async(db, customer)
+        if config.ID_FILTER_ENABLED:
+            await known_ids.add_async(str(customer.customer_id).lower())
         return customer
     except Exception as e:
         logging.error(f"Failed to create customer. Error: {str(e)}")
@@ -23,18 +49,20 @@ def decrease_customer_balance(db: Session, customer_id: str, amount: float) -> b
     try:
         customer = repository.get_customer(db, customer_id)
         if customer is None:
-            logging.warning(f"Customer with ID {customer_id} not found.")
+            logging.warning("Customer with ID %s not found.", customer_id)
             return False
 
         if customer.wallet_balance < amount:
             logging.warning(
-                f"Insufficient balance for customer ID {customer_id}. Current balance: {customer.wallet_balance}, requested decrease: {amount}."
+                "Insufficient balance for customer ID %s. Current balance: %s, requested decrease: %s.",
+                customer_id, customer.wallet_balance, amount,
             )
             return False
 
         customer.wallet_balance -= amount
         logging.info(
-            f"Decreased balance for customer ID {customer_id} by {amount}. New balance: {customer.wallet_balance}."
+            "Decreased balance for customer ID %s by %s. New balance: %s.",
+            customer_id, amount, customer.wallet_balance,
         )
         return True
     except Exception as e:
@@ -42,3 +70,14 @@ def decrease_customer_balance(db: Session, customer_id: str, amount: float) -> b
             f"Failed to decrease balance for customer ID {customer_id}. Error: {str(e)}"
         )
         return False
+
+
+def might_exist(customer_id: str) -> bool:
+    """False only if the customer id is definitely unknown (ID_FILTER_ENABLED)."""
+    return known_ids.might_contain(customer_id.lower())
+
+
+def rebuild_known_ids(db: Session) -> int:
+    return known_ids.rebuild(
+        str(customer_id).lower() for customer_id in repository.iter_customer_ids(db)
+    )
@@ -18,3 +18,12 @@ class CustomerInterface:
     ) -> bool:
         success = service.decrease_customer_balance(db, customer_id, amount)
         return success
+
+    @staticmethod
+    def might_exist(customer_id: str) -> bool:
+        """Bloom filter check (ID_FILTER_ENABLED): False means definitely unknown."""
+        return service.might_exist(customer_id)
+
+    @staticmethod
+    def rebuild_id_filter(db: DbSession) -> int:
+        return service.rebuild_known_ids(db)
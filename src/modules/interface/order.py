@@ -9,7 +9,8 @@ This module serves as the interface layer for the products domain.
 
 from src.database.core import DbSession
 from src.entities.order import OrderStatus
-from src.modules.orders import service
+from src.modules.orders import admission, events, read_model, service
+from typing import Dict, Iterable
 
 
 class OrdersInterface:
@@ -21,3 +22,18 @@ class OrdersInterface:
     def create_order(db: DbSession, order_payload: dict):
         order = service.create_order(db, order_payload)
         return order
+
+    @staticmethod
+    def publish_status_events(results: Iterable[Dict]) -> None:
+        """Push committed order outcomes to clients watching them (ORDER_EVENTS_ENABLED)."""
+        events.publish(results)
+
+    @staticmethod
+    def record_statuses(records: Iterable[Dict]) -> None:
+        """Write committed statuses to the Redis read model (ORDER_STATUS_CACHE_ENABLED)."""
+        read_model.write(records)
+
+    @staticmethod
+    def record_settled(count: int) -> None:
+        """Feed the settle rate used by order admission (ADMISSION_ENABLED)."""
+        admission.record_settled(count)
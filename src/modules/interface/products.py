@@ -8,9 +8,11 @@ This module serves as the interface layer for the products domain.
 """
 
 from src.database.core import DbSession
-from src.modules.products import service
+from src.modules.products import service, reservation, shards
+from src.modules.products import cache as product_cache
 from src.modules.products.build.product import ProductBuilder
-from typing import Optional
+from src.modules.products.model import ProductResponse
+from typing import Dict, List, Optional, Tuple
 
 
 class ProductsInterface:
@@ -21,7 +23,80 @@ class ProductsInterface:
             return None
         return ProductBuilder(product).add_dynamic_price().get().current_price
 
+    @staticmethod
+    def get_many(db: DbSession, product_ids: List[str]) -> Dict[str, Optional[ProductResponse]]:
+        """Fetch several products through the cache tiers; None for unknown ids."""
+        return service.get_products(db, product_ids)
+
+    @staticmethod
+    def get_dynamic_price_for(product, stock: Optional[int] = None) -> Optional[float]:
+        """Price an already-loaded (usually locked) product row without re-querying it."""
+        return service.build_product_response(product, stock).current_price
+
+    @staticmethod
+    def might_exist(product_id: str) -> bool:
+        """Bloom filter check (ID_FILTER_ENABLED): False means definitely unknown."""
+        return service.might_exist(product_id)
+
+    @staticmethod
+    def rebuild_id_filter(db: DbSession) -> int:
+        return service.rebuild_known_ids(db)
+
     @staticmethod
     def decrease_stock(db: DbSession, product_id: str) -> bool:
         """Decrease product stock by 1 (or per business rule). Returns True on success, False otherwise."""
         return service.decrease_stock(db, product_id)
+
+    @staticmethod
+    def reserve_stock(db: DbSession, product_id: str, order_id: str) -> Optional[bool]:
+        """Reserve one unit at the edge. True reserved, False sold out, None undecided."""
+        return reservation.reserve(db, product_id, order_id)
+
+    @staticmethod
+    def reserve_stock_many(
+        db: DbSession, items: List[Tuple[str, str]]
+    ) -> List[Optional[bool]]:
+        """Pipelined reserve_stock for (product_id, order_id) pairs."""
+        return reservation.reserve_many(db, items)
+
+    @staticmethod
+    def finalize_reservation(product_id: str, order_id: str, result: dict) -> None:
+        reservation.finalize(product_id, order_id, result)
+
+    @staticmethod
+    def restock_reservation(product_id: str, amount: int = 1) -> None:
+        reservation.restock(product_id, amount)
+
+    @staticmethod
+    def reconcile_reservations(db: DbSession, max_inflight_age: int) -> int:
+        return reservation.reconcile(db, max_inflight_age)
+
+    @staticmethod
+    def get_sharded_stock(db: DbSession, product_id: str) -> Optional[Tuple[int, int]]:
+        """(shard_count, total_stock) for a sharded product, None if not sharded."""
+        return shards.get_sharded_stock(db, product_id)
+
+    @staticmethod
+    def acquire_stock_shard(db: DbSession, product_id: str, shard_count: int):
+        return shards.acquire_shard(db, product_id, shard_count)
+
+    @staticmethod
+    def take_from_stock_shard(db: DbSession, product_id: str, shard_count: int) -> bool:
+        return shards.take_from_shard(db, product_id, shard_count)
+
+    @staticmethod
+    def lock_stock_shards(db: DbSession, product_id: str) -> list:
+        return shards.lock_shards(db, product_id)
+
+    @staticmethod
+    def restock_shard(db: DbSession, product_id: str, amount: int = 1) -> bool:
+        return shards.restock(db, product_id, amount)
+
+    @staticmethod
+    def rollup_sharded_stock(db: DbSession) -> list:
+        return shards.rollup(db)
+
+    @staticmethod
+    def publish_product_changed(*product_ids: str) -> None:
+        """Invalidate cached product data on every API worker after a committed stock change."""
+        product_cache.publish_changed(*product_ids)
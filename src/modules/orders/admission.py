@@ -0,0 +1,283 @@
+"""
+Admission control in front of queue_order (ADMISSION_ENABLED).
+
+Two checks run before an order is enqueued:
+
+- Overload (503): each API process samples the broker backlog and the
+  cluster-wide settle rate at most every ADMISSION_SAMPLE_SECONDS, with one
+  pipelined round-trip. New orders are shed while the backlog exceeds
+  ADMISSION_MAX_QUEUE_DEPTH or would take longer than
+  ADMISSION_MAX_DRAIN_SECONDS to settle at the current rate.
+- Rate limit (429): a per-customer token bucket in Redis
+  (ADMISSION_CUSTOMER_RATE per second, ADMISSION_CUSTOMER_BURST deep),
+  refilled and taken atomically by a Lua script.
+
+Both answer with Retry-After. The settle rate comes from `admission:settled`,
+which the workers increment per settled batch (`record_settled`). Admit and
+shed counts are kept per process and flushed to `admission:counters` with each
+sample, so `stats()` reports cluster-wide totals and rates. With
+METRICS_ENABLED the same figures are exported to Prometheus
+(order_admission_queue_depth, order_admission_admitted_total,
+order_admission_shed_total by reason); `stats()` stays as a debug view.
+
+Redis errors fail open: admission never blocks ordering on its own outage.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from src.core import config
+from src.database.redis import r
+
+if config.METRICS_ENABLED:
+    from src.core import metrics
+
+SETTLED_KEY = "admission:settled"
+COUNTERS_KEY = "admission:counters"
+BUCKET_KEY = "admission:bucket:{}"
+
+# ARGV: rate, burst. Returns {allowed, seconds until the next token}
+_TAKE = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+_take = r.register_script(_TAKE)
+
+
+def record_settled(count: int) -> None:
+    """Called by the workers after committing `count` order outcomes."""
+    try:
+        r.incrby(SETTLED_KEY, count)
+    except Exception as e:
+        logging.warning(f"Failed to record settled orders: {e}")
+
+
+def _queue_keys() -> List[str]:
+    if config.ORDER_TRANSPORT == "stream":
+        return []
+    return ["celery", "orders.batch"] + [
+        f"orders.p{n}" for n in range(config.ORDER_PARTITIONS)
+    ]
+
+
+class AdmissionController:
+    def __init__(self):
+        self.queue_depth = 0
+        self.settle_rate = 0.0
+        self.admit_rate = 0.0
+        self.shed_rate = 0.0
+        self.totals: Dict[str, int] = {}
+        self._pending = Counter()
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._sampled_at = 0.0
+        self._next_sample = 0.0
+        self._settled: Optional[int] = None
+        self._previous: Dict[str, int] = {}
+
+    # ---- sampling ----
+
+    def _sample(self) -> None:
+        if time.monotonic() < self._next_sample:
+            return
+        # One sampler per process; other threads keep the previous sample
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now < self._next_sample:
+                return
+            self._next_sample = now + config.ADMISSION_SAMPLE_SECONDS
+            elapsed = now - self._sampled_at
+            with self._pending_lock:
+                pending, self._pending = self._pending, Counter()
+            keys = _queue_keys()
+            pipe = r.pipeline(transaction=False)
+            for key in keys:
+                pipe.llen(key)
+            if config.ORDER_TRANSPORT == "stream":
+                pipe.xlen(config.ORDER_STREAM_KEY)
+            pipe.get(SETTLED_KEY)
+            for field, count in pending.items():
+                pipe.hincrby(COUNTERS_KEY, field, count)
+            pipe.hgetall(COUNTERS_KEY)
+            try:
+                replies = pipe.execute()
+            except Exception as e:
+                logging.warning(f"Admission sample failed: {e}")
+                with self._pending_lock:
+                    self._pending.update(pending)
+                return
+            depth_replies = len(keys) + (config.ORDER_TRANSPORT == "stream")
+            settled = int(replies[depth_replies] or 0)
+            totals = {
+                key.decode("utf-8"): int(value) for key, value in replies[-1].items()
+            }
+            self.queue_depth = sum(replies[:depth_replies])
+            if self._settled is not None and self._sampled_at:
+                self.settle_rate = _smooth(
+                    self.settle_rate, max(0, settled - self._settled) / elapsed
+                )
+                self.admit_rate = _smooth(
+                    self.admit_rate, _delta(totals, self._previous, "admitted") / elapsed
+                )
+                self.shed_rate = _smooth(
+                    self.shed_rate,
+                    (
+                        _delta(totals, self._previous, "rate_limited")
+                        + _delta(totals, self._previous, "overloaded")
+                    )
+                    / elapsed,
+                )
+            self._settled, self._previous, self.totals = settled, totals, totals
+            self._sampled_at = now
+            if config.METRICS_ENABLED:
+                metrics.observe_admission_sample(self.queue_depth, self.settle_rate)
+        finally:
+            self._lock.release()
+
+    def _count(self, field: str, count: int = 1) -> None:
+        with self._pending_lock:
+            self._pending[field] += count
+        if config.METRICS_ENABLED and count:
+            metrics.count_admission(field, count)
+
+    # ---- checks ----
+
+    def overload_retry_after(self, incoming: int = 1) -> Optional[int]:
+        """Seconds to wait if the backlog is over its limit, else None.
+
+        The drain-time limit applies to the existing backlog only: an empty
+        queue always admits, whatever the (possibly decayed) settle rate.
+        """
+        self._sample()
+        depth = self.queue_depth
+        excess = depth + incoming - config.ADMISSION_MAX_QUEUE_DEPTH
+        if depth > 0 and self.settle_rate > 0:
+            excess = max(
+                excess, depth - self.settle_rate * config.ADMISSION_MAX_DRAIN_SECONDS
+            )
+        if excess <= 0:
+            return None
+        if self.settle_rate <= 0:
+            return config.ADMISSION_MAX_RETRY_AFTER
+        return _clamp(excess / self.settle_rate)
+
+    def take(self, customer_ids: List[str]) -> List[Optional[int]]:
+        """Take one token per customer id; None if admitted, else seconds to wait."""
+        if not customer_ids:
+            return []
+        try:
+            pipe = r.pipeline(transaction=False)
+            for customer_id in customer_ids:
+                _take(
+                    keys=[BUCKET_KEY.format(customer_id)],
+                    args=[config.ADMISSION_CUSTOMER_RATE, config.ADMISSION_CUSTOMER_BURST],
+                    client=pipe,
+                )
+            replies = pipe.execute()
+        except Exception as e:
+            logging.warning(f"Customer rate limit unavailable: {e}")
+            return [None] * len(customer_ids)
+        return [
+            None if int(allowed) == 1 else _clamp(float(wait))
+            for allowed, wait in replies
+        ]
+
+    def _check_overload(self, incoming: int) -> None:
+        retry_after = self.overload_retry_after(incoming)
+        if retry_after is not None:
+            self._count("overloaded", incoming)
+            raise HTTPException(
+                status_code=503,
+                detail="Order intake is overloaded, retry later",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    def admit(self, customer_id: str) -> None:
+        """Raise 503/429 with Retry-After if the order must be shed."""
+        self._check_overload(1)
+        retry_after = self.take([customer_id])[0]
+        if retry_after is not None:
+            self._count("rate_limited")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many orders for this customer",
+                headers={"Retry-After": str(retry_after)},
+            )
+        self._count("admitted")
+
+    def admit_many(self, customer_ids: List[str]) -> List[Optional[int]]:
+        """Batch variant: raise 503 for the whole batch when overloaded, else
+        return per item None (admitted) or the customer's Retry-After seconds."""
+        self._check_overload(len(customer_ids))
+        limited = self.take(customer_ids)
+        shed = sum(1 for retry_after in limited if retry_after is not None)
+        if shed:
+            self._count("rate_limited", shed)
+        self._count("admitted", len(limited) - shed)
+        return limited
+
+    def stats(self) -> dict:
+        """Latest sample of this process; totals and rates are cluster-wide.
+
+        queue_depth:  queued orders in the broker
+        settle_rate:  orders settled per second by all workers
+        admit_rate:   orders admitted per second by all API processes
+        shed_rate:    orders rejected (429 + 503) per second
+        admitted / rate_limited / overloaded: totals
+        """
+        self._sample()
+        return {
+            "queue_depth": self.queue_depth,
+            "settle_rate": round(self.settle_rate, 1),
+            "admit_rate": round(self.admit_rate, 1),
+            "shed_rate": round(self.shed_rate, 1),
+            **{
+                field: self.totals.get(field, 0)
+                for field in ("admitted", "rate_limited", "overloaded")
+            },
+        }
+
+
+def _delta(totals: Dict[str, int], previous: Dict[str, int], field: str) -> int:
+    return max(0, totals.get(field, 0) - previous.get(field, 0))
+
+
+# Rates below this are reset to 0 ("unknown"), so an idle period does not
+# leave a vanishing settle rate behind
+_RATE_FLOOR = 0.01
+
+
+def _smooth(current: float, sample: float) -> float:
+    rate = sample if current == 0 else 0.5 * current + 0.5 * sample
+    return rate if rate >= _RATE_FLOOR else 0.0
+
+
+def _clamp(seconds: float) -> int:
+    return max(1, min(config.ADMISSION_MAX_RETRY_AFTER, math.ceil(seconds)))
+
+
+controller = AdmissionController()
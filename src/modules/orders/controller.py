@@ -1,8 +1,12 @@
+import json
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
 
-from src.database.core import DbSession
-from .model import OrderCreate, OrderStatusResponse
+from src.core import config
+from src.database.core import DbSession, AsyncDbSession
+from .model import OrderBatchCreate, OrderBatchResponse, OrderCreate, OrderStatusResponse
 from . import service
 
 router = APIRouter(prefix="/orders", tags=["orders"])
@@ -13,23 +17,88 @@ router = APIRouter(prefix="/orders", tags=["orders"])
     response_model=OrderStatusResponse,
     status_code=202,
 )
-def queue_order(db: DbSession, order_data: OrderCreate):
-    order = service.queue_order(db, order_data)
+def queue_order(
+    db: DbSession,
+    order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", min_length=1, max_length=255
+    ),
+):
+    order = service.queue_order(db, order_data, idempotency_key)
     if not order:
         raise HTTPException(status_code=400, detail="Failed to create order")
     return order
 
 
-@router.get(
-    "/{order_id}",
-    response_model=OrderStatusResponse,
-    status_code=200,
+@router.post(
+    "/batch",
+    response_model=OrderBatchResponse,
+    response_model_exclude_none=True,
+    status_code=202,
 )
-def get_order(db: DbSession, order_id: str):
-    order = service.get_order(db, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    return order
+def queue_orders(db: DbSession, batch: OrderBatchCreate):
+    return service.queue_orders(db, batch)
+
+
+if config.ADMISSION_ENABLED:
+
+    @router.get("/admission/stats", status_code=200)
+    def get_admission_stats():
+        """Debug view of order admission; the same figures are in /metrics."""
+        return service.admission_stats()
+
+
+if config.ASYNC_API_ENABLED:
+
+    @router.get(
+        "/{order_id}",
+        response_model=OrderStatusResponse,
+        status_code=200,
+    )
+    async def get_order(db: AsyncDbSession, order_id: str):
+        order = await service.get_order_async(db, order_id)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return order
+
+else:
+
+    @router.get(
+        "/{order_id}",
+        response_model=OrderStatusResponse,
+        status_code=200,
+    )
+    def get_order(db: DbSession, order_id: str):
+        order = service.get_order(db, order_id)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return order
+
+
+if config.ORDER_EVENTS_ENABLED:
+
+    @router.get("/{order_id}/events")
+    async def order_events(order_id: str):
+        """Server-sent events: the order's status now, then each transition
+        until it is final."""
+
+        async def stream():
+            async for event in service.order_events(order_id):
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: status\ndata: {json.dumps(event)}\n\n"
+
+        return StreamingResponse(
+            stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @router.websocket("/events/ws")
+    async def order_events_socket(websocket: WebSocket):
+        await websocket.accept()
+        await service.serve_order_events_socket(websocket)
 
 
 @router.post(
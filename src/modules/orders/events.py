@@ -0,0 +1,125 @@
+"""
+Order status push (ORDER_EVENTS_ENABLED).
+
+After committing a final status (COMPLETED/FAILED from the worker, CANCELLED
+from `cancel_order`) the writer publishes the transition on
+`order:{order_id}:events`. API workers stream it to clients over SSE
+(`GET /orders/{order_id}/events`) or a WebSocket (`/orders/events/ws`), so
+clients learn the outcome without polling MySQL.
+
+Each API worker process holds a single Redis pub/sub connection (`hub`) and
+subscribes to an order's channel only while a client is watching it.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from src.database.redis import ar, r
+
+CHANNEL = "order:{}:events"
+FINAL_STATUSES = {"COMPLETED", "FAILED", "CANCELLED"}
+RESYNC = {"type": "resync"}
+
+
+def _payload(result: Dict) -> str:
+    event = {"updated_at": datetime.now(timezone.utc).isoformat(), **result}
+    if hasattr(event.get("status"), "value"):
+        event["status"] = event["status"].value
+    return json.dumps(event, default=str)
+
+
+def publish(results: Iterable[Dict]) -> None:
+    """Publish committed status transitions, one result dict per order.
+
+    Fire-and-forget: a lost event only means the client falls back to its
+    initial status read or polling.
+    """
+    try:
+        pipe = r.pipeline(transaction=False)
+        for result in results:
+            pipe.publish(CHANNEL.format(result["order_id"]), _payload(result))
+        pipe.execute()
+    except Exception as e:
+        logging.warning(f"Failed to publish order status events: {e}")
+
+
+class OrderEventHub:
+    """Fan-out of order channels from one pub/sub connection to local queues."""
+
+    def __init__(self):
+        self._queues: Dict[str, Set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def subscribe(self, order_id: str, queue: asyncio.Queue) -> None:
+        channel = CHANNEL.format(order_id)
+        queues = self._queues.setdefault(channel, set())
+        queues.add(queue)
+        if self._pubsub is None:
+            self._pubsub = ar.pubsub(ignore_subscribe_messages=True)
+        if len(queues) == 1:
+            await self._pubsub.subscribe(channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    async def unsubscribe(self, order_id: str, queue: asyncio.Queue) -> None:
+        channel = CHANNEL.format(order_id)
+        queues = self._queues.get(channel)
+        if not queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._queues[channel]
+            try:
+                await self._pubsub.unsubscribe(channel)
+            except Exception as e:
+                logging.debug(f"Failed to unsubscribe from {channel}: {e}")
+
+    async def _read(self) -> None:
+        while self._queues:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Order event subscriber error: {e}")
+                await self._reconnect()
+                continue
+            if not message or message["type"] != "message":
+                continue
+            channel = message["channel"].decode("utf-8")
+            event = json.loads(message["data"])
+            for queue in self._queues.get(channel, ()):
+                queue.put_nowait(event)
+
+    async def _reconnect(self) -> None:
+        await asyncio.sleep(1.0)
+        try:
+            await self._pubsub.aclose()
+        except Exception:
+            pass
+        self._pubsub = ar.pubsub(ignore_subscribe_messages=True)
+        if self._queues:
+            try:
+                await self._pubsub.subscribe(*self._queues)
+            except Exception as e:
+                logging.warning(f"Order event resubscribe failed: {e}")
+        # Events may have been missed while reconnecting: watchers re-read status
+        for queues in self._queues.values():
+            for queue in queues:
+                queue.put_nowait(RESYNC)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self._queues.clear()
+
+
+hub = OrderEventHub()
@@ -0,0 +1,126 @@
+"""
+Idempotency keys for POST /orders/ (`Idempotency-Key` header).
+
+The first request with a key claims `idempotency:{customer_id}:{key}` with an
+in-progress marker. Once its order is enqueued the marker is replaced by the
+PENDING response, kept for ORDER_IDEMPOTENCY_TTL_SECONDS; a retry with the
+same key gets that response back without being enqueued again. A duplicate
+arriving while the first request is still in progress is answered with 409
+and Retry-After, since no response exists yet that could be replayed. Claim
+and lookup are a single Lua script, so concurrent duplicates resolve
+atomically in one round-trip and never touch MySQL.
+
+Keys are scoped per customer. Reusing a key for a different product is
+rejected. If the first request fails before its order is enqueued, its claim
+is released so the client can retry with the same key. A marker left by a
+crashed request expires after IN_PROGRESS_TTL seconds.
+"""
+
+import json
+import logging
+from typing import Optional
+
+from fastapi import HTTPException
+
+from src.core import config
+from src.database.redis import r
+from .model import OrderStatusResponse
+
+KEY = "idempotency:{}:{}"
+IN_PROGRESS_TTL = 30
+
+# ARGV: record, ttl. Returns the stored record, or nil if ours was stored
+_CLAIM = """
+local stored = redis.call('GET', KEYS[1])
+if stored then
+    return stored
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+_claim = r.register_script(_CLAIM)
+
+# ARGV: order_id, record, ttl. Replaces the marker only if it is still ours
+_COMPLETE = """
+local stored = redis.call('GET', KEYS[1])
+if stored and cjson.decode(stored)['order_id'] == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return false
+"""
+_complete = r.register_script(_COMPLETE)
+
+# ARGV: order_id. Deletes the claim only if it still belongs to that order
+_RELEASE = """
+local stored = redis.call('GET', KEYS[1])
+if stored and cjson.decode(stored)['order_id'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_release = r.register_script(_RELEASE)
+
+
+def _reused() -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail="Idempotency-Key was already used for a different order",
+    )
+
+
+def claim(key: str, response: OrderStatusResponse) -> Optional[OrderStatusResponse]:
+    """Mark the key in progress for this order, or return the response stored first.
+
+    Returns None when this request owns the key and should be processed; it
+    must then call `complete` once the order is enqueued, or `release`.
+    Raises 409 while the first request is still in progress. Redis errors
+    fail open (the request is processed without idempotency).
+    """
+    redis_key = KEY.format(response.customer_id, key)
+    marker = json.dumps(
+        {"order_id": response.order_id, "product_id": str(response.product_id)}
+    )
+    try:
+        stored = _claim(keys=[redis_key], args=[marker, IN_PROGRESS_TTL])
+    except Exception as e:
+        logging.warning(f"Idempotency key {key} not checked: {e}")
+        return None
+    if stored is None:
+        return None
+    record = json.loads(stored)
+    if "response" not in record:
+        if record["product_id"] != str(response.product_id):
+            raise _reused()
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    original = OrderStatusResponse(**record["response"])
+    if original.product_id != response.product_id:
+        raise _reused()
+    logging.info("Idempotency key %s replayed order %s", key, original.order_id)
+    return original
+
+
+def complete(key: str, response: OrderStatusResponse) -> None:
+    """Store the response of an enqueued order for retries to replay."""
+    record = json.dumps(
+        {"order_id": response.order_id, "response": response.model_dump(mode="json")}
+    )
+    try:
+        _complete(
+            keys=[KEY.format(response.customer_id, key)],
+            args=[response.order_id, record, config.ORDER_IDEMPOTENCY_TTL_SECONDS],
+        )
+    except Exception as e:
+        logging.warning(f"Failed to store idempotency key {key}: {e}")
+
+
+def release(key: str, response: OrderStatusResponse) -> None:
+    try:
+        _release(
+            keys=[KEY.format(response.customer_id, key)], args=[response.order_id]
+        )
+    except Exception as e:
+        logging.warning(f"Failed to release idempotency key {key}: {e}")
@@ -1,5 +1,7 @@
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from src.core import config
 from src.entities.order import OrderStatus
 
 
@@ -32,3 +34,21 @@ class OrderStatusResponse(BaseModel):
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate] = Field(
+        ..., min_length=1, max_length=config.ORDER_BULK_MAX_ITEMS
+    )
+
+
+class OrderBatchItem(BaseModel):
+    # Items are returned in request order; a rejected item has no order_id
+    order_id: Optional[str] = None
+    status: Optional[OrderStatus] = None
+    detail: Optional[str] = None
+
+
+class OrderBatchResponse(BaseModel):
+    created_at: datetime
+    items: List[OrderBatchItem]
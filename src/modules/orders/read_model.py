@@ -0,0 +1,127 @@
+"""
+Redis order status read model (ORDER_STATUS_CACHE_ENABLED).
+
+Each order has a compact `order:{order_id}` hash (status, ids, price_paid,
+timestamps) written after every committed transition:
+
+- queue_order:  PENDING, as soon as the order is accepted
+- worker:       COMPLETED / FAILED
+- cancel_order: CANCELLED
+
+`get_order` answers from the hash and only falls back to MySQL (with backfill)
+on a miss. Writes never move an order back to an earlier state, so a late
+PENDING write cannot overwrite the worker's outcome.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+from src.core import config
+from src.database.redis import ar, r
+from .model import OrderStatusResponse
+
+KEY = "order:{}"
+FIELDS = ("order_id", "product_id", "customer_id", "price_paid", "created_at", "updated_at")
+
+# ARGV: status, ttl, field, value, ...
+_WRITE = """
+local rank = {PENDING = 0, COMPLETED = 1, FAILED = 1, CANCELLED = 2}
+local current = redis.call('HGET', KEYS[1], 'status')
+if current and rank[current] and rank[current] > rank[ARGV[1]] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+_write = r.register_script(_WRITE)
+_write_async = ar.register_script(_WRITE)
+
+
+def _args(record: Dict) -> list:
+    status = record["status"]
+    args = [getattr(status, "value", status), config.ORDER_STATUS_TTL_SECONDS]
+    for field in FIELDS:
+        value = record.get(field)
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        args.extend((field, value))
+    return args
+
+
+def write(records: Iterable[Dict]) -> None:
+    """Record committed statuses, one dict per order, in one round-trip.
+
+    Each record needs order_id and status; other FIELDS are optional and
+    updated_at defaults to now. Fire-and-forget: a failed write only means the
+    next read falls back to MySQL.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        pipe = r.pipeline(transaction=False)
+        for record in records:
+            record = {"updated_at": now, **record}
+            _write(keys=[KEY.format(record["order_id"])], args=_args(record), client=pipe)
+        pipe.execute()
+    except Exception as e:
+        logging.warning(f"Failed to write order status records: {e}")
+
+
+async def write_async(records: Iterable[Dict]) -> None:
+    now = datetime.now(timezone.utc)
+    try:
+        pipe = ar.pipeline(transaction=False)
+        for record in records:
+            record = {"updated_at": now, **record}
+            await _write_async(
+                keys=[KEY.format(record["order_id"])], args=_args(record), client=pipe
+            )
+        await pipe.execute()
+    except Exception as e:
+        logging.warning(f"Failed to write order status records: {e}")
+
+
+def _decode(order_id: str, fields: Dict[bytes, bytes]) -> Optional[OrderStatusResponse]:
+    if not fields:
+        return None
+    record = {key.decode("utf-8"): value.decode("utf-8") for key, value in fields.items()}
+    try:
+        return OrderStatusResponse(
+            order_id=order_id,
+            product_id=record["product_id"],
+            customer_id=record["customer_id"],
+            status=record["status"],
+            created_at=record["created_at"],
+            updated_at=record["updated_at"],
+        )
+    except (KeyError, ValueError) as e:
+        # Partial record (e.g. the PENDING write was lost): treat as a miss
+        logging.debug(f"Incomplete status record for order {order_id}: {e}")
+        return None
+
+
+def read(order_id: str) -> Optional[OrderStatusResponse]:
+    try:
+        return _decode(order_id, r.hgetall(KEY.format(order_id)))
+    except Exception as e:
+        logging.warning(f"Order status record unavailable for {order_id}: {e}")
+        return None
+
+
+async def read_async(order_id: str) -> Optional[OrderStatusResponse]:
+    try:
+        return _decode(order_id, await ar.hgetall(KEY.format(order_id)))
+    except Exception as e:
+        logging.warning(f"Order status record unavailable for {order_id}: {e}")
+        return None
+
+
+def backfill(order: OrderStatusResponse) -> None:
+    write([order.model_dump()])
+
+
+async def backfill_async(order: OrderStatusResponse) -> None:
+    await write_async([order.model_dump()])
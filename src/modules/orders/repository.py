@@ -1,4 +1,6 @@
 import logging
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.core import DbSession
 from src.entities.order import Order
 from src.entities.customer import Customer
@@ -21,7 +23,7 @@ def create_order(db: DbSession, order_data: dict) -> Order:
     db.add(order)
     db.commit()
     db.refresh(order)
-    logging.info(f"Created new order: {order.order_id}")
+    logging.info("Created new order: %s", order.order_id)
     return order
 
 
@@ -35,3 +37,8 @@ def get_product(db: DbSession, product_id: str) -> Product | None:
 
 def get_order(db: DbSession, order_id: str) -> Order | None:
     return db.query(Order).filter(Order.order_id == order_id).first()
+
+
+async def get_order_async(db: AsyncSession, order_id: str) -> Order | None:
+    result = await db.execute(select(Order).where(Order.order_id == order_id))
+    return result.scalars().first()
@@ -1,67 +1,291 @@
+import asyncio
 import logging
 import uuid
 from datetime import datetime, timezone
-from typing import Optional
+from typing import AsyncIterator, List, Optional
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from celery.result import AsyncResult
 
+from src.core import config
 from src.entities.order import OrderStatus
-from .model import OrderCreate, OrderStatusResponse
-from . import repository
+from src.modules.interface.customer import CustomerInterface
+from src.modules.interface.products import ProductsInterface
+from .model import (
+    OrderBatchCreate,
+    OrderBatchItem,
+    OrderBatchResponse,
+    OrderCreate,
+    OrderStatusResponse,
+)
+from . import admission, events, idempotency, read_model, repository
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
-def queue_order(db: Session, order: OrderCreate) -> OrderStatusResponse:
+def queue_order(
+    db: Session, order: OrderCreate, idempotency_key: Optional[str] = None
+) -> OrderStatusResponse:
     """
     Lightweight order creation following Project A pattern:
     - Generate order_id (UUID)
+    - With an Idempotency-Key, return the first request's response instead
+      (409 while that request is still in progress)
+    - Optionally shed load with 503/429 (ADMISSION_ENABLED)
+    - Optionally reject definitely unknown ids with 404 (ID_FILTER_ENABLED)
+    - Optionally reserve stock in Redis (STOCK_RESERVATION_ENABLED)
     - Immediately enqueue Celery task
     - Return PENDING response without DB interaction
     - Worker handles all validation and persistence
     """
     # Import at function level to avoid circular imports (Project A pattern)
-    from src.modules.workers.celery import process_order, celery_app
-
+    from src.modules.workers.dispatch import dispatch_order
+
+    order_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    response = OrderStatusResponse(
+        order_id=order_id,
+        product_id=order.product_id,
+        customer_id=order.customer_id,
+        status=OrderStatus.PENDING,
+        created_at=now,
+        updated_at=now,
+    )
+
+    # Retries of an accepted order get the original response back
+    if idempotency_key:
+        original = idempotency.claim(idempotency_key, response)
+        if original is not None:
+            return original
+
+    reserved = dispatched = False
     try:
-        order_id = str(uuid.uuid4())
-        now = datetime.now(timezone.utc)
+        if config.ADMISSION_ENABLED:
+            admission.controller.admit(str(order.customer_id))
+
+        if config.ID_FILTER_ENABLED:
+            detail = _unknown_id(str(order.product_id), str(order.customer_id))
+            if detail:
+                logger.info("Order rejected at the edge: %s", detail)
+                raise HTTPException(status_code=404, detail=detail)
+
+        # Reject sold-out products at the edge without a queue round-trip
+        if config.STOCK_RESERVATION_ENABLED:
+            outcome = ProductsInterface.reserve_stock(
+                db, str(order.product_id), order_id
+            )
+            if outcome is False:
+                logger.info("Order for product %s rejected: sold out", order.product_id)
+                raise HTTPException(status_code=409, detail="Product out of stock")
+            reserved = outcome is True
 
         # Fire async task immediately (Project A pattern)
-        task = process_order.delay(
-            order_id, str(order.product_id), str(order.customer_id)
+        message_id = dispatch_order(
+            order_id, str(order.product_id), str(order.customer_id), reserved=reserved
         )
+        dispatched = True
+        if idempotency_key:
+            idempotency.complete(idempotency_key, response)
 
-        # Log task ID for tracking
-        logger.info(f"Order {order_id} queued with task ID {task.id}")
+        # Log message ID for tracking
+        logger.info("Order %s queued with message ID %s", order_id, message_id)
 
         # Return immediately without DB interaction
-        return OrderStatusResponse(
-            order_id=order_id,
-            product_id=order.product_id,
-            customer_id=order.customer_id,
-            status=OrderStatus.PENDING,
-            created_at=now,
-            updated_at=now,
-        )
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            read_model.write([response.model_dump()])
+        return response
+
+    except HTTPException:
+        if idempotency_key:
+            idempotency.release(idempotency_key, response)
+        raise
 
     except Exception as e:
+        if idempotency_key:
+            idempotency.release(idempotency_key, response)
+        if reserved and not dispatched:
+            # No worker will settle this order, so give the unit back now
+            # instead of holding it until reconciliation
+            ProductsInterface.finalize_reservation(
+                str(order.product_id), order_id, {"status": "FAILED"}
+            )
         logger.error(f"Failed to queue order: {e}")
         raise HTTPException(status_code=500, detail="Failed to queue order")
 
 
+def queue_orders(db: Session, batch: OrderBatchCreate) -> OrderBatchResponse:
+    """
+    Bulk variant of queue_order:
+    - Generate all order_ids up front
+    - Optionally shed the whole batch (503) or rate-limited items (ADMISSION_ENABLED)
+    - Optionally reject items with definitely unknown ids (ID_FILTER_ENABLED)
+    - Optionally reserve stock for all items in one pipelined Redis round-trip
+    - Publish every task through a single broker producer; items that could
+      not be published are reported as failed and their reservations released
+    - Return a compact per-item PENDING list without DB interaction
+    """
+    from src.modules.workers.dispatch import dispatch_orders
+
+    accepted, dispatched = [], False
+    try:
+        now = datetime.now(timezone.utc)
+        order_ids = [str(uuid.uuid4()) for _ in batch.orders]
+
+        limited: List[Optional[int]] = [None] * len(batch.orders)
+        if config.ADMISSION_ENABLED:
+            limited = admission.controller.admit_many(
+                [str(order.customer_id) for order in batch.orders]
+            )
+
+        unknown: List[Optional[str]] = [None] * len(batch.orders)
+        if config.ID_FILTER_ENABLED:
+            unknown = [
+                _unknown_id(str(order.product_id), str(order.customer_id))
+                for order in batch.orders
+            ]
+
+        outcomes: List[Optional[bool]] = [None] * len(batch.orders)
+        if config.STOCK_RESERVATION_ENABLED:
+            admitted = [
+                i
+                for i, (retry_after, detail) in enumerate(zip(limited, unknown))
+                if retry_after is None and detail is None
+            ]
+            reserved = ProductsInterface.reserve_stock_many(
+                db,
+                [(str(batch.orders[i].product_id), order_ids[i]) for i in admitted],
+            )
+            for i, outcome in zip(admitted, reserved):
+                outcomes[i] = outcome
+
+        items, positions = [], {}
+        for order, order_id, outcome, retry_after, detail in zip(
+            batch.orders, order_ids, outcomes, limited, unknown
+        ):
+            if retry_after is not None:
+                items.append(OrderBatchItem(detail="Too many orders for this customer"))
+                continue
+            if detail is not None:
+                items.append(OrderBatchItem(detail=detail))
+                continue
+            if outcome is False:
+                items.append(OrderBatchItem(detail="Product out of stock"))
+                continue
+            accepted.append(
+                (order_id, str(order.product_id), str(order.customer_id), outcome is True)
+            )
+            positions[order_id] = len(items)
+            items.append(OrderBatchItem(order_id=order_id, status=OrderStatus.PENDING))
+
+        failed = set(dispatch_orders(accepted))
+        dispatched = True
+        if failed:
+            # Orders published before the failure run; the rest never will
+            for order_id, product_id, _, reserved in accepted:
+                if order_id in failed:
+                    items[positions[order_id]] = OrderBatchItem(detail="Failed to queue order")
+                    if reserved:
+                        ProductsInterface.finalize_reservation(
+                            product_id, order_id, {"status": "FAILED"}
+                        )
+            accepted = [item for item in accepted if item[0] not in failed]
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            read_model.write(
+                {
+                    "order_id": order_id,
+                    "product_id": product_id,
+                    "customer_id": customer_id,
+                    "status": OrderStatus.PENDING,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for order_id, product_id, customer_id, _ in accepted
+            )
+        logger.info(
+            "Queued %s of %s orders in one batch", len(accepted), len(batch.orders)
+        )
+        return OrderBatchResponse(created_at=now, items=items)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        if not dispatched:
+            for order_id, product_id, _, reserved in accepted:
+                if reserved:
+                    ProductsInterface.finalize_reservation(
+                        product_id, order_id, {"status": "FAILED"}
+                    )
+        logger.error(f"Failed to queue order batch: {e}")
+        raise HTTPException(status_code=500, detail="Failed to queue orders")
+
+
+def _unknown_id(product_id: str, customer_id: str) -> Optional[str]:
+    if not ProductsInterface.might_exist(product_id):
+        return "Product not found"
+    if not CustomerInterface.might_exist(customer_id):
+        return "Customer not found"
+    return None
+
+
+def admission_stats() -> dict:
+    return admission.controller.stats()
+
+
 def get_order(db: Session, order_id: str) -> Optional[OrderStatusResponse]:
     """
     Retrieve order status with optimized DB access.
     Single query, minimal processing.
+    With ORDER_STATUS_CACHE_ENABLED the Redis status record is read first and
+    a miss is backfilled from the DB.
     """
     try:
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            cached = read_model.read(order_id)
+            if cached:
+                return cached
+
         order = repository.get_order(db, order_id)
         if order is None:
             return None
 
-        return OrderStatusResponse(
+        response = OrderStatusResponse(
+            order_id=order.order_id,
+            product_id=order.product_id,
+            customer_id=order.customer_id,
+            status=order.status,
+            created_at=order.created_at,
+            updated_at=order.updated_at,
+        )
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            read_model.backfill(response)
+        return response
+
+    except Exception as e:
+        logger.error(f"Failed to retrieve order {order_id}: {e}")
+        raise
+
+
+async def get_order_async(
+    db: AsyncSession, order_id: str
+) -> Optional[OrderStatusResponse]:
+    """
+    Async counterpart of get_order (ASYNC_API_ENABLED).
+    """
+    try:
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            cached = await read_model.read_async(order_id)
+            if cached:
+                return cached
+
+        order = await repository.get_order_async(db, order_id)
+        if order is None:
+            return None
+
+        response = OrderStatusResponse(
             order_id=order.order_id,
             product_id=order.product_id,
             customer_id=order.customer_id,
@@ -69,12 +293,148 @@ def get_order(db: Session, order_id: str) -> Optional[OrderStatusResponse]:
             created_at=order.created_at,
             updated_at=order.updated_at,
         )
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            await read_model.backfill_async(response)
+        return response
 
     except Exception as e:
         logger.error(f"Failed to retrieve order {order_id}: {e}")
         raise
 
 
+async def current_status(order_id: str) -> Optional[OrderStatusResponse]:
+    """Status read for push streams, outside any request-scoped session."""
+    if config.ASYNC_API_ENABLED:
+        from src.database.core import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            return await get_order_async(db, order_id)
+
+    from src.database.core import SessionLocal
+
+    def read():
+        db = SessionLocal()
+        try:
+            return get_order(db, order_id)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(read)
+
+
+async def _current_event(order_id: str) -> Optional[dict]:
+    order = await current_status(order_id)
+    return None if order is None else order.model_dump(mode="json")
+
+
+async def order_events(order_id: str) -> AsyncIterator[Optional[dict]]:
+    """
+    Status events of one order (ORDER_EVENTS_ENABLED):
+    - Subscribe first, then read the current status, so no transition is missed
+    - Yield each status until a final one or ORDER_EVENTS_TIMEOUT_SECONDS
+    - Yield None every ORDER_EVENTS_KEEPALIVE_SECONDS without events
+    """
+    queue = asyncio.Queue()
+    await events.hub.subscribe(order_id, queue)
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.ORDER_EVENTS_TIMEOUT_SECONDS
+        event = await _current_event(order_id)
+        while True:
+            if event is not None:
+                yield event
+                if event["status"] in events.FINAL_STATUSES:
+                    return
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), min(config.ORDER_EVENTS_KEEPALIVE_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield None
+                event = None
+                continue
+            if event is events.RESYNC:
+                event = await _current_event(order_id)
+    finally:
+        await events.hub.unsubscribe(order_id, queue)
+
+
+async def serve_order_events_socket(websocket: WebSocket) -> None:
+    """
+    WebSocket variant of order_events for many orders at once. Clients send
+    {"subscribe": [...]} / {"unsubscribe": [...]}; each watched order gets its
+    current status, then every transition, and is dropped once final.
+    """
+    queue = asyncio.Queue()
+    watched = set()
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            for order_id in message.get("unsubscribe", []):
+                if order_id in watched:
+                    watched.discard(order_id)
+                    await events.hub.unsubscribe(order_id, queue)
+            for order_id in message.get("subscribe", []):
+                if order_id in watched:
+                    continue
+                if len(watched) >= config.ORDER_EVENTS_MAX_SUBSCRIPTIONS:
+                    await websocket.send_json(
+                        {"order_id": order_id, "error": "Too many subscriptions"}
+                    )
+                    continue
+                watched.add(order_id)
+                await events.hub.subscribe(order_id, queue)
+                event = await _current_event(order_id)
+                if event is not None:
+                    queue.put_nowait(event)
+
+    async def send():
+        while True:
+            event = await queue.get()
+            if event is events.RESYNC:
+                for order_id in list(watched):
+                    current = await _current_event(order_id)
+                    if current is not None:
+                        queue.put_nowait(current)
+                continue
+            order_id = event["order_id"]
+            if order_id not in watched:
+                continue
+            await websocket.send_json(event)
+            if event["status"] in events.FINAL_STATUSES:
+                watched.discard(order_id)
+                await events.hub.unsubscribe(order_id, queue)
+
+    receiver = asyncio.create_task(receive())
+    sender = asyncio.create_task(send())
+    tasks = {receiver, sender}
+    try:
+        # Either side ending ends the connection: a dead sender must not
+        # leave the socket open with nobody delivering events
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        failed = [
+            task.exception()
+            for task in done
+            if not isinstance(task.exception(), (WebSocketDisconnect, type(None)))
+        ]
+        if failed:
+            logger.error(f"Order events socket failed: {failed[0]}")
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for order_id in watched:
+            await events.hub.unsubscribe(order_id, queue)
+
+
 def get_queue_status(order_id: str) -> dict:
     """
     Get Celery task status for an order (Project A pattern).
@@ -96,38 +456,62 @@ def cancel_order(db: Session, order_id: str) -> bool:
         # Fetch all required entities first
         order = repository.get_order(db, order_id)
         if order is None:
-            logger.warning(f"Order {order_id} not found")
+            logger.warning("Order %s not found", order_id)
             return False
 
         # Check cancellation eligibility
         if order.status == OrderStatus.CANCELLED:
-            logger.info(f"Order {order_id} already cancelled")
+            logger.info("Order %s already cancelled", order_id)
             return False
 
         if order.status != OrderStatus.COMPLETED:
-            logger.info(f"Order {order_id} not completed, cannot cancel")
+            logger.info("Order %s not completed, cannot cancel", order_id)
             return False
 
         # Fetch related entities
         customer = repository.get_customer(db, order.customer_id)
         if customer is None:
-            logger.warning(f"Customer {order.customer_id} not found")
+            logger.warning("Customer %s not found", order.customer_id)
             return False
 
         product = repository.get_product(db, order.product_id)
         if product is None:
-            logger.warning(f"Product {order.product_id} not found")
+            logger.warning("Product %s not found", order.product_id)
             return False
 
         # Perform all updates in single transaction
         order.status = OrderStatus.CANCELLED
         customer.wallet_balance += order.price_paid
-        product.stock += 1
+        if not (
+            config.SHARDED_STOCK_ENABLED
+            and ProductsInterface.restock_shard(db, order.product_id)
+        ):
+            product.stock += 1
 
         # Single commit
         db.commit()
 
-        logger.info(f"Order {order_id} cancelled successfully")
+        if config.STOCK_RESERVATION_ENABLED:
+            ProductsInterface.restock_reservation(order.product_id)
+        if config.PRODUCT_INVALIDATION_ENABLED:
+            ProductsInterface.publish_product_changed(order.product_id)
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            read_model.write(
+                [
+                    {
+                        "order_id": order_id,
+                        "product_id": order.product_id,
+                        "customer_id": order.customer_id,
+                        "status": OrderStatus.CANCELLED,
+                        "price_paid": order.price_paid,
+                        "created_at": order.created_at,
+                    }
+                ]
+            )
+        if config.ORDER_EVENTS_ENABLED:
+            events.publish([{"order_id": order_id, "status": OrderStatus.CANCELLED}])
+
+        logger.info("Order %s cancelled successfully", order_id)
         return True
 
     except Exception as e:
@@ -144,12 +528,12 @@ def set_order_status(db: Session, order_id: str, status: OrderStatus) -> bool:
     try:
         order = repository.get_order(db, order_id)
         if order is None:
-            logger.warning(f"Order {order_id} not found")
+            logger.warning("Order %s not found", order_id)
             return False
 
         order.status = status
         # Don't commit here - let caller handle transaction
-        logger.info(f"Order {order_id} status set to {status}")
+        logger.info("Order %s status set to %s", order_id, status)
         return True
 
     except Exception as e:
@@ -27,5 +27,5 @@ class ProductBuilder:
         return self
 
     def get(self) -> ProductResponse:
-        logging.info("Final product state: %s", self.product)
+        logging.debug("Final product state: %s", self.product)
         return self.product
@@ -0,0 +1,784 @@
+"""
+Product read cache: in-process TTLCache in front of Redis `product:{id}`.
+
+Cache misses are coalesced at two levels so a hot product expiring does not
+send every concurrent reader to MySQL:
+
+- in-process: one thread/coroutine per product_id loads, the others wait for
+  its result (SingleFlight / AsyncSingleFlight)
+- across workers and hosts: the loader takes a short Redis lock
+  `lock:product:{id}`; processes that lose serve the last known value from
+  `product:stale:{id}` or briefly wait for the winner to fill `product:{id}`
+
+`stats()` exposes this process's coalesced vs leader load counters. With
+METRICS_ENABLED they are also exported, with hit/miss and latency per tier.
+
+With PRODUCT_SHM_ENABLED a shared-memory table (see shm.py) sits between the
+in-process tier and Redis, so the API workers of a host share one copy of the
+hot catalog.
+
+Entries in both tiers carry a soft expiry. With PRODUCT_SWR_ENABLED they are
+kept for PRODUCT_SWR_GRACE_SECONDS past it (hard expiry): a read in that window
+returns the stale value at once and schedules one background refresh per key.
+Past the hard expiry it is a normal miss.
+
+With PRODUCT_INVALIDATION_ENABLED, writers call `publish_changed` after a
+committed stock change: `product:ver:{id}` is incremented, the Redis entries
+are deleted and the product id is published on `products:changed`, where every
+API worker's listener thread evicts its in-process entry. Loaders read the
+version before querying MySQL and only write their result back to Redis if it
+is unchanged, so a load that raced with the change (in any process) cannot
+put the old row back.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from cachetools import TTLCache
+
+from src.core import config
+from src.core.singleflight import AsyncSingleFlight, SingleFlight
+from src.database.redis import ar, r
+from . import shm
+from .model import ProductResponse
+
+if config.METRICS_ENABLED:
+    from src.core import metrics
+
+CACHE_KEY = "product:{}"
+STALE_KEY = "product:stale:{}"
+LOCK_KEY = "lock:product:{}"
+VERSION_KEY = "product:ver:{}"
+CHANGED_CHANNEL = "products:changed"
+# Outlives any load by far; an expired version reads as "0" again
+VERSION_TTL = 86400
+# Never equal to a stored version: a load whose version could not be read is
+# not written back
+_UNKNOWN = "unknown"
+
+# Time an entry outlives its soft expiry (0 = plain TTL caching)
+GRACE = config.PRODUCT_SWR_GRACE_SECONDS if config.PRODUCT_SWR_ENABLED else 0
+
+
+class _Entry(NamedTuple):
+    response: ProductResponse
+    soft_expiry: float
+
+
+inproc_cache = TTLCache(
+    maxsize=config.PRODUCT_INPROC_MAXSIZE, ttl=config.PRODUCT_INPROC_TTL + GRACE
+)
+# TTLCache is not thread-safe; request threads, the refresh pool and the
+# invalidation listener all touch it
+_inproc_lock = threading.Lock()
+
+# Invalidations seen by this process per product; a load that raced with an
+# invalidation does not write its (possibly stale) result back
+_generations = Counter()
+
+_flight = SingleFlight()
+_async_flight = AsyncSingleFlight()
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_release_lock = r.register_script(_RELEASE_LOCK)
+_release_lock_async = ar.register_script(_RELEASE_LOCK)
+
+# KEYS: product, stale, version. ARGV: version read before loading, TTL,
+# stale TTL, payload
+_STORE_IF_CURRENT = """
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[2], ARGV[4])
+redis.call('SETEX', KEYS[2], ARGV[3], ARGV[4])
+return 1
+"""
+
+# Background revalidation: at most one refresh per product at a time
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="product-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_refresh_tasks = set()
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(field: str) -> None:
+    with _stats_lock:
+        _stats[field] += 1
+    if config.METRICS_ENABLED:
+        metrics.CACHE_EVENTS.labels(field).inc()
+
+
+def stats() -> dict:
+    """Miss-path counters of this worker process.
+
+    leader:      loads that went to MySQL
+    coalesced:   in-process callers that reused a concurrent leader's result
+    remote_wait: callers that waited for another worker's load via Redis
+    stale:       callers served `product:stale:{id}` while another worker loaded
+    fallback:    callers that gave up waiting and loaded from MySQL themselves
+    swr_stale:   reads answered from a soft-expired entry
+    swr_refresh: background refreshes scheduled
+    batch_load:  IN queries issued for the misses of a batch lookup
+    shm_hit:     in-process misses answered by the shared-memory table
+    shm_miss:    in-process misses that went on to Redis
+    """
+    with _stats_lock:
+        counters = dict(_stats)
+    return {"pid": os.getpid(), **counters}
+
+
+def _encode(response: ProductResponse, soft_expiry: float) -> str:
+    return f'{{"soft": {soft_expiry}, "data": {response.model_dump_json()}}}'
+
+
+def _decode(cache_key: str, cached_bytes: bytes) -> Optional[_Entry]:
+    try:
+        obj = json.loads(cached_bytes.decode("utf-8"))
+        if "data" not in obj:
+            # Plain ProductResponse written before soft expiry existed
+            return _Entry(ProductResponse(**obj), float("inf"))
+        return _Entry(ProductResponse(**obj["data"]), float(obj["soft"]))
+    except (UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        logging.warning(f"Corrupt cache for key {cache_key}: {e}")
+        return None
+
+
+def _put_local(product_id: str, entry: _Entry) -> None:
+    now = time.time()
+    soft_expiry = min(entry.soft_expiry, now + config.PRODUCT_INPROC_TTL)
+    with _inproc_lock:
+        inproc_cache[product_id] = _Entry(entry.response, soft_expiry)
+    if shm.table is not None:
+        try:
+            shm.table.put(
+                product_id,
+                _encode(entry.response, soft_expiry).encode("utf-8"),
+                soft_expiry - now + GRACE,
+            )
+        except OSError as e:
+            logging.debug(f"Shared cache set failed for product {product_id}: {e}")
+
+
+def _shared(product_id: str) -> Optional[_Entry]:
+    started = time.perf_counter()
+    payload = shm.table.get(product_id)
+    if config.METRICS_ENABLED:
+        metrics.observe_cache("shm", payload is not None, started)
+    if payload is None:
+        _count("shm_miss")
+        return None
+    entry = _decode(CACHE_KEY.format(product_id), payload)
+    if entry is not None:
+        _count("shm_hit")
+        with _inproc_lock:
+            inproc_cache[product_id] = entry
+    return entry
+
+
+def _lookup(product_id: str, cached_bytes, schedule) -> Optional[ProductResponse]:
+    """Shared tail of get/get_async once the Redis tier has answered."""
+    if not cached_bytes:
+        return None
+    entry = _decode(CACHE_KEY.format(product_id), cached_bytes)
+    if entry is None:
+        return None
+    if entry.soft_expiry <= time.time():
+        if not GRACE:
+            return None
+        _count("swr_stale")
+        schedule()
+        return entry.response
+    _put_local(product_id, entry)
+    return entry.response
+
+
+def _local(product_id: str, schedule) -> Optional[ProductResponse]:
+    started = time.perf_counter()
+    with _inproc_lock:
+        entry = inproc_cache.get(product_id)
+    if config.METRICS_ENABLED:
+        metrics.observe_cache("inproc", entry is not None, started)
+    if entry is None and shm.table is not None:
+        entry = _shared(product_id)
+    if entry is None:
+        return None
+    if entry.soft_expiry <= time.time():
+        if not GRACE:
+            # Plain TTL caching: the entry outlived the Redis TTL it was
+            # capped to, so it is a miss rather than a stale hit
+            with _inproc_lock:
+                inproc_cache.pop(product_id, None)
+            return None
+        _count("swr_stale")
+        schedule()
+    return entry.response
+
+
+# ---- sync path ----
+
+
+def get(
+    product_id: str, refresh: Optional[Callable[[], Optional[ProductResponse]]] = None
+) -> Optional[ProductResponse]:
+    """Look the product up in the in-process tier, then Redis.
+
+    `refresh` loads the product with its own session; it is used to revalidate
+    soft-expired entries in the background.
+    """
+    schedule = lambda: _schedule_refresh(product_id, refresh)  # noqa: E731
+    hit = _local(product_id, schedule)
+    if hit:
+        return hit
+
+    started = time.perf_counter()
+    cached_bytes = r.get(CACHE_KEY.format(product_id))
+    if config.METRICS_ENABLED:
+        metrics.observe_cache("redis", cached_bytes is not None, started)
+    return _lookup(product_id, cached_bytes, schedule)
+
+
+def store(
+    product_id: str, response: ProductResponse, version: Optional[str] = None
+) -> None:
+    now = time.time()
+    # Fire-and-forget cache set (ignore errors)
+    try:
+        pipe = r.pipeline(transaction=False)
+        _queue_store(pipe, product_id, response, now, version)
+        pipe.execute()
+        _put_local(product_id, _Entry(response, now + config.PRODUCT_INPROC_TTL))
+    except Exception as ce:
+        logging.debug(f"Cache set failed for product {product_id}: {ce}")
+
+
+def load(
+    product_id: str, loader: Callable[[], Optional[ProductResponse]]
+) -> Optional[ProductResponse]:
+    """Load a missed product with stampede protection and fill the cache tiers."""
+    response, shared = _flight.do(product_id, lambda: _load_once(product_id, loader))
+    if shared:
+        _count("coalesced")
+    return response
+
+
+def _load_once(product_id, loader, background=False):
+    if not config.PRODUCT_CACHE_LOCK_ENABLED:
+        return _load_and_store(product_id, loader)
+
+    lock_key = LOCK_KEY.format(product_id)
+    token = uuid.uuid4().hex
+    try:
+        acquired = r.set(lock_key, token, nx=True, px=config.PRODUCT_CACHE_LOCK_MS)
+    except Exception as e:
+        logging.debug(f"Cache lock unavailable for product {product_id}: {e}")
+        return _load_and_store(product_id, loader)
+
+    if acquired:
+        try:
+            return _load_and_store(product_id, loader)
+        finally:
+            try:
+                _release_lock(keys=[lock_key], args=[token])
+            except Exception:
+                pass
+
+    if background:
+        # Another worker is already revalidating this product
+        return None
+
+    # Another worker is loading: serve the last known value if there is one
+    stale_key = STALE_KEY.format(product_id)
+    stale_bytes = r.get(stale_key)
+    if stale_bytes:
+        entry = _decode(stale_key, stale_bytes)
+        if entry is not None:
+            _count("stale")
+            return entry.response
+
+    cache_key = CACHE_KEY.format(product_id)
+    deadline = time.monotonic() + config.PRODUCT_CACHE_WAIT_MS / 1000
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        cached_bytes = r.get(cache_key)
+        if cached_bytes:
+            entry = _decode(cache_key, cached_bytes)
+            if entry is not None:
+                _put_local(product_id, entry)
+                _count("remote_wait")
+                return entry.response
+
+    _count("fallback")
+    return _load_and_store(product_id, loader, count=False)
+
+
+def _load_and_store(product_id, loader, count=True):
+    generation = _generations[product_id]
+    version = _version(product_id)
+    response = loader()
+    if count:
+        _count("leader")
+    if response is not None and _generations[product_id] == generation:
+        store(product_id, response, version)
+    return response
+
+
+def _version(product_id: str) -> Optional[str]:
+    """Version to store a load under; None without invalidation."""
+    if not config.PRODUCT_INVALIDATION_ENABLED:
+        return None
+    try:
+        value = r.get(VERSION_KEY.format(product_id))
+    except Exception:
+        return _UNKNOWN
+    return value.decode("utf-8") if value else "0"
+
+
+def _versions(product_ids: List[str]) -> Dict[str, Optional[str]]:
+    if not config.PRODUCT_INVALIDATION_ENABLED or not product_ids:
+        return {}
+    try:
+        values = r.mget([VERSION_KEY.format(product_id) for product_id in product_ids])
+    except Exception:
+        return dict.fromkeys(product_ids, _UNKNOWN)
+    return {
+        product_id: value.decode("utf-8") if value else "0"
+        for product_id, value in zip(product_ids, values)
+    }
+
+
+async def _version_async(product_id: str) -> Optional[str]:
+    if not config.PRODUCT_INVALIDATION_ENABLED:
+        return None
+    try:
+        value = await ar.get(VERSION_KEY.format(product_id))
+    except Exception:
+        return _UNKNOWN
+    return value.decode("utf-8") if value else "0"
+
+
+async def _versions_async(product_ids: List[str]) -> Dict[str, Optional[str]]:
+    if not config.PRODUCT_INVALIDATION_ENABLED or not product_ids:
+        return {}
+    try:
+        values = await ar.mget(
+            [VERSION_KEY.format(product_id) for product_id in product_ids]
+        )
+    except Exception:
+        return dict.fromkeys(product_ids, _UNKNOWN)
+    return {
+        product_id: value.decode("utf-8") if value else "0"
+        for product_id, value in zip(product_ids, values)
+    }
+
+
+
+def _claim_refresh(product_id: str) -> bool:
+    with _refreshing_lock:
+        if product_id in _refreshing:
+            return False
+        _refreshing.add(product_id)
+    _count("swr_refresh")
+    return True
+
+
+def _release_refresh(product_id: str) -> None:
+    with _refreshing_lock:
+        _refreshing.discard(product_id)
+
+
+def _schedule_refresh(product_id: str, refresh) -> None:
+    if refresh is None or not _claim_refresh(product_id):
+        return
+
+    def run():
+        try:
+            # Another worker may already have refreshed the Redis tier
+            cache_key = CACHE_KEY.format(product_id)
+            cached_bytes = r.get(cache_key)
+            entry = _decode(cache_key, cached_bytes) if cached_bytes else None
+            if entry is not None and entry.soft_expiry > time.time():
+                _put_local(product_id, entry)
+                return
+            _load_once(product_id, refresh, background=True)
+        except Exception as e:
+            logging.warning(f"Background refresh failed for product {product_id}: {e}")
+        finally:
+            _release_refresh(product_id)
+
+    _refresh_pool.submit(run)
+
+
+# ---- async path (ASYNC_API_ENABLED) ----
+
+
+async def get_async(
+    product_id: str,
+    refresh: Optional[Callable[[], Awaitable[Optional[ProductResponse]]]] = None,
+) -> Optional[ProductResponse]:
+    schedule = lambda: _schedule_refresh_async(product_id, refresh)  # noqa: E731
+    hit = _local(product_id, schedule)
+    if hit:
+        return hit
+
+    started = time.perf_counter()
+    cached_bytes = await ar.get(CACHE_KEY.format(product_id))
+    if config.METRICS_ENABLED:
+        metrics.observe_cache("redis", cached_bytes is not None, started)
+    return _lookup(product_id, cached_bytes, schedule)
+
+
+async def store_async(
+    product_id: str, response: ProductResponse, version: Optional[str] = None
+) -> None:
+    now = time.time()
+    # Fire-and-forget cache set (ignore errors)
+    try:
+        pipe = ar.pipeline(transaction=False)
+        _queue_store(pipe, product_id, response, now, version)
+        await pipe.execute()
+        _put_local(product_id, _Entry(response, now + config.PRODUCT_INPROC_TTL))
+    except Exception as ce:
+        logging.debug(f"Cache set failed for product {product_id}: {ce}")
+
+
+async def load_async(
+    product_id: str, loader: Callable[[], Awaitable[Optional[ProductResponse]]]
+) -> Optional[ProductResponse]:
+    response, shared = await _async_flight.do(
+        product_id, lambda: _load_once_async(product_id, loader)
+    )
+    if shared:
+        _count("coalesced")
+    return response
+
+
+async def _load_once_async(product_id, loader, background=False):
+    if not config.PRODUCT_CACHE_LOCK_ENABLED:
+        return await _load_and_store_async(product_id, loader)
+
+    lock_key = LOCK_KEY.format(product_id)
+    token = uuid.uuid4().hex
+    try:
+        acquired = await ar.set(
+            lock_key, token, nx=True, px=config.PRODUCT_CACHE_LOCK_MS
+        )
+    except Exception as e:
+        logging.debug(f"Cache lock unavailable for product {product_id}: {e}")
+        return await _load_and_store_async(product_id, loader)
+
+    if acquired:
+        try:
+            return await _load_and_store_async(product_id, loader)
+        finally:
+            try:
+                await _release_lock_async(keys=[lock_key], args=[token])
+            except Exception:
+                pass
+
+    if background:
+        return None
+
+    stale_key = STALE_KEY.format(product_id)
+    stale_bytes = await ar.get(stale_key)
+    if stale_bytes:
+        entry = _decode(stale_key, stale_bytes)
+        if entry is not None:
+            _count("stale")
+            return entry.response
+
+    cache_key = CACHE_KEY.format(product_id)
+    deadline = time.monotonic() + config.PRODUCT_CACHE_WAIT_MS / 1000
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+        cached_bytes = await ar.get(cache_key)
+        if cached_bytes:
+            entry = _decode(cache_key, cached_bytes)
+            if entry is not None:
+                _put_local(product_id, entry)
+                _count("remote_wait")
+                return entry.response
+
+    _count("fallback")
+    return await _load_and_store_async(product_id, loader, count=False)
+
+
+async def _load_and_store_async(product_id, loader, count=True):
+    generation = _generations[product_id]
+    version = await _version_async(product_id)
+    response = await loader()
+    if count:
+        _count("leader")
+    if response is not None and _generations[product_id] == generation:
+        await store_async(product_id, response, version)
+    return response
+
+
+def _schedule_refresh_async(product_id: str, refresh) -> None:
+    if refresh is None or not _claim_refresh(product_id):
+        return
+
+    async def run():
+        try:
+            cache_key = CACHE_KEY.format(product_id)
+            cached_bytes = await ar.get(cache_key)
+            entry = _decode(cache_key, cached_bytes) if cached_bytes else None
+            if entry is not None and entry.soft_expiry > time.time():
+                _put_local(product_id, entry)
+                return
+            await _load_once_async(product_id, refresh, background=True)
+        except Exception as e:
+            logging.warning(f"Background refresh failed for product {product_id}: {e}")
+        finally:
+            _release_refresh(product_id)
+
+    task = asyncio.get_running_loop().create_task(run())
+    # Keep a reference until done so the task is not garbage collected
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+# ---- batch lookups (GET /products?ids=...) ----
+
+
+def get_many(
+    product_ids: List[str],
+    refresh: Optional[Callable[[str], Optional[ProductResponse]]] = None,
+) -> Dict[str, ProductResponse]:
+    """Resolve what the cache tiers hold: in-process first, then one Redis MGET
+    for the rest. Returns the hits; callers load the remaining ids."""
+    hits = {}
+    for product_id in product_ids:
+        hit = _local(product_id, _refresher(product_id, refresh, _schedule_refresh))
+        if hit:
+            hits[product_id] = hit
+
+    remaining = [product_id for product_id in product_ids if product_id not in hits]
+    if remaining:
+        started = time.perf_counter()
+        values = r.mget([CACHE_KEY.format(product_id) for product_id in remaining])
+        _observe_mget(values, started)
+        for product_id, cached_bytes in zip(remaining, values):
+            schedule = _refresher(product_id, refresh, _schedule_refresh)
+            hit = _lookup(product_id, cached_bytes, schedule)
+            if hit:
+                hits[product_id] = hit
+    return hits
+
+
+def load_many(
+    product_ids: List[str],
+    loader: Callable[[List[str]], Dict[str, Optional[ProductResponse]]],
+) -> Dict[str, Optional[ProductResponse]]:
+    """Load missed products in one call and backfill the cache tiers."""
+    generations = {product_id: _generations[product_id] for product_id in product_ids}
+    versions = _versions(product_ids)
+    loaded = loader(product_ids)
+    _count("batch_load")
+    store_many(_unchanged(loaded, generations), versions)
+    return loaded
+
+
+def store_many(
+    responses: Dict[str, ProductResponse], versions: Optional[Dict[str, str]] = None
+) -> None:
+    if not responses:
+        return
+    now = time.time()
+    # Fire-and-forget cache set (ignore errors)
+    try:
+        pipe = r.pipeline(transaction=False)
+        for product_id, response in responses.items():
+            _queue_store(pipe, product_id, response, now, (versions or {}).get(product_id))
+        pipe.execute()
+        for product_id, response in responses.items():
+            _put_local(product_id, _Entry(response, now + config.PRODUCT_INPROC_TTL))
+    except Exception as ce:
+        logging.debug(f"Cache set failed for products {list(responses)}: {ce}")
+
+
+async def get_many_async(
+    product_ids: List[str],
+    refresh: Optional[Callable[[str], Awaitable[Optional[ProductResponse]]]] = None,
+) -> Dict[str, ProductResponse]:
+    hits = {}
+    for product_id in product_ids:
+        hit = _local(product_id, _refresher(product_id, refresh, _schedule_refresh_async))
+        if hit:
+            hits[product_id] = hit
+
+    remaining = [product_id for product_id in product_ids if product_id not in hits]
+    if remaining:
+        started = time.perf_counter()
+        values = await ar.mget([CACHE_KEY.format(product_id) for product_id in remaining])
+        _observe_mget(values, started)
+        for product_id, cached_bytes in zip(remaining, values):
+            schedule = _refresher(product_id, refresh, _schedule_refresh_async)
+            hit = _lookup(product_id, cached_bytes, schedule)
+            if hit:
+                hits[product_id] = hit
+    return hits
+
+
+async def load_many_async(
+    product_ids: List[str],
+    loader: Callable[[List[str]], Awaitable[Dict[str, Optional[ProductResponse]]]],
+) -> Dict[str, Optional[ProductResponse]]:
+    generations = {product_id: _generations[product_id] for product_id in product_ids}
+    versions = await _versions_async(product_ids)
+    loaded = await loader(product_ids)
+    _count("batch_load")
+    await store_many_async(_unchanged(loaded, generations), versions)
+    return loaded
+
+
+async def store_many_async(
+    responses: Dict[str, ProductResponse], versions: Optional[Dict[str, str]] = None
+) -> None:
+    if not responses:
+        return
+    now = time.time()
+    # Fire-and-forget cache set (ignore errors)
+    try:
+        pipe = ar.pipeline(transaction=False)
+        for product_id, response in responses.items():
+            _queue_store(pipe, product_id, response, now, (versions or {}).get(product_id))
+        await pipe.execute()
+        for product_id, response in responses.items():
+            _put_local(product_id, _Entry(response, now + config.PRODUCT_INPROC_TTL))
+    except Exception as ce:
+        logging.debug(f"Cache set failed for products {list(responses)}: {ce}")
+
+
+def _observe_mget(values, started: float) -> None:
+    if config.METRICS_ENABLED:
+        hits = sum(1 for value in values if value)
+        metrics.observe_cache_many("redis", hits, len(values) - hits, started)
+
+
+def _refresher(product_id, refresh, schedule_refresh):
+    if refresh is None:
+        return lambda: None
+    return lambda: schedule_refresh(product_id, lambda: refresh(product_id))
+
+
+def _queue_store(
+    pipe, product_id: str, response: ProductResponse, now: float, version: Optional[str]
+) -> None:
+    payload = _encode(response, now + config.PRODUCT_REDIS_TTL)
+    if version is None:
+        pipe.setex(CACHE_KEY.format(product_id), config.PRODUCT_REDIS_TTL + GRACE, payload)
+        pipe.setex(STALE_KEY.format(product_id), config.PRODUCT_STALE_TTL, payload)
+        return
+    pipe.eval(
+        _STORE_IF_CURRENT,
+        3,
+        CACHE_KEY.format(product_id),
+        STALE_KEY.format(product_id),
+        VERSION_KEY.format(product_id),
+        version,
+        config.PRODUCT_REDIS_TTL + GRACE,
+        config.PRODUCT_STALE_TTL,
+        payload,
+    )
+
+
+def _unchanged(loaded, generations) -> Dict[str, ProductResponse]:
+    # Skip products invalidated while they were being loaded
+    return {
+        product_id: response
+        for product_id, response in loaded.items()
+        if response is not None and _generations[product_id] == generations[product_id]
+    }
+
+
+# ---- invalidation (PRODUCT_INVALIDATION_ENABLED) ----
+
+
+def publish_changed(*product_ids: str) -> None:
+    """Invalidate products after a committed stock change, on every API worker."""
+    if not product_ids:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for product_id in product_ids:
+            # Loads that started before this point will not be written back
+            pipe.incr(VERSION_KEY.format(product_id))
+            pipe.expire(VERSION_KEY.format(product_id), VERSION_TTL)
+        pipe.delete(
+            *[CACHE_KEY.format(product_id) for product_id in product_ids],
+            *[STALE_KEY.format(product_id) for product_id in product_ids],
+        )
+        for product_id in product_ids:
+            pipe.publish(CHANGED_CHANNEL, product_id)
+        pipe.execute()
+    except Exception as e:
+        logging.warning(f"Failed to publish product change for {product_ids}: {e}")
+    for product_id in product_ids:
+        _evict(product_id)
+
+
+def _evict(product_id: str) -> None:
+    with _inproc_lock:
+        _generations[product_id] += 1
+        inproc_cache.pop(product_id, None)
+    if shm.table is not None:
+        shm.table.delete(product_id)
+
+
+class _InvalidationListener(threading.Thread):
+    def __init__(self):
+        super().__init__(name="product-invalidation", daemon=True)
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(CHANGED_CHANNEL)
+                # Events may have been missed while (re)connecting
+                with _inproc_lock:
+                    inproc_cache.clear()
+                if shm.table is not None:
+                    shm.table.clear()
+                while not self.stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        _evict(message["data"].decode("utf-8"))
+            except Exception as e:
+                logging.warning(f"Product invalidation listener error: {e}")
+                self.stopped.wait(1.0)
+            finally:
+                pubsub.close()
+
+
+_listener: Optional[_InvalidationListener] = None
+
+
+def start_invalidation_listener() -> None:
+    global _listener
+    if _listener is None:
+        _listener = _InvalidationListener()
+        _listener.start()
+
+
+def stop_invalidation_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stopped.set()
+        _listener = None
@@ -1,21 +1,96 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List
 from uuid import UUID
 
-from src.database.core import DbSession
-from .model import ProductResponse
+from src.core import config
+from src.database.core import DbSession, AsyncDbSession
+from .model import ProductLookupItem, ProductLookupResponse, ProductResponse
 from . import service
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
-@router.get(
-    "/{product_id}",
-    response_model=ProductResponse,
-    response_model_exclude={"initial_stock"},
-    status_code=200,
-)
-def get_product(db: DbSession, product_id: str):
-    product = service.get_product(db, product_id, cache=True)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+@router.get("/cache/stats", status_code=200)
+def get_cache_stats():
+    """Product cache miss-path counters (leader vs coalesced loads) of this worker."""
+    return service.cache_stats()
+
+
+def _parse_ids(ids: str) -> List[str]:
+    product_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="No product ids given")
+    if len(product_ids) > config.PRODUCT_LOOKUP_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.PRODUCT_LOOKUP_MAX_IDS} product ids per request",
+        )
+    return product_ids
+
+
+def _lookup_response(products: Dict[str, ProductResponse | None]) -> ProductLookupResponse:
+    return ProductLookupResponse(
+        items=[
+            ProductLookupItem(product_id=product_id, status=200, product=product)
+            if product
+            else ProductLookupItem(
+                product_id=product_id, status=404, detail="Product not found"
+            )
+            for product_id, product in products.items()
+        ]
+    )
+
+
+# Batch lookup: per-item 404s are reported inline, the request itself is 200
+_LOOKUP_EXCLUDE = {"items": {"__all__": {"product": {"initial_stock"}}}}
+
+
+if config.ASYNC_API_ENABLED:
+
+    @router.get(
+        "",
+        response_model=ProductLookupResponse,
+        response_model_exclude=_LOOKUP_EXCLUDE,
+        response_model_exclude_none=True,
+        status_code=200,
+    )
+    async def get_products(db: AsyncDbSession, ids: str = Query(...)):
+        products = await service.get_products_async(db, _parse_ids(ids))
+        return _lookup_response(products)
+
+    @router.get(
+        "/{product_id}",
+        response_model=ProductResponse,
+        response_model_exclude={"initial_stock"},
+        status_code=200,
+    )
+    async def get_product(db: AsyncDbSession, product_id: str):
+        product = await service.get_product_async(db, product_id, cache=True)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
+
+else:
+
+    @router.get(
+        "",
+        response_model=ProductLookupResponse,
+        response_model_exclude=_LOOKUP_EXCLUDE,
+        response_model_exclude_none=True,
+        status_code=200,
+    )
+    def get_products(db: DbSession, ids: str = Query(...)):
+        products = service.get_products(db, _parse_ids(ids))
+        return _lookup_response(products)
+
+    @router.get(
+        "/{product_id}",
+        response_model=ProductResponse,
+        response_model_exclude={"initial_stock"},
+        status_code=200,
+    )
+    def get_product(db: DbSession, product_id: str):
+        product = service.get_product(db, product_id, cache=True)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
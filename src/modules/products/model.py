@@ -1,3 +1,4 @@
+from typing import List, Optional
 from uuid import UUID
 from pydantic import BaseModel, ConfigDict
 
@@ -12,3 +13,14 @@ class ProductResponse(BaseModel):
     initial_stock: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ProductLookupItem(BaseModel):
+    product_id: str
+    status: int
+    product: Optional[ProductResponse] = None
+    detail: Optional[str] = None
+
+
+class ProductLookupResponse(BaseModel):
+    items: List[ProductLookupItem]
@@ -1,7 +1,10 @@
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
 import logging
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from src.database.core import DbSession
 from src.entities.product import Product as ProductORM
 from src.modules.products.model import ProductResponse
@@ -12,3 +15,22 @@ def get_product(db: DbSession, product_id: str):
     if not product:
         return None
     return product
+
+
+async def get_product_async(db: AsyncSession, product_id: str):
+    result = await db.execute(select(ProductORM).where(ProductORM.id == str(product_id)))
+    return result.scalars().first()
+
+
+def get_products(db: DbSession, product_ids: List[str]):
+    return db.query(ProductORM).filter(ProductORM.id.in_(product_ids)).all()
+
+
+async def get_products_async(db: AsyncSession, product_ids: List[str]):
+    result = await db.execute(select(ProductORM).where(ProductORM.id.in_(product_ids)))
+    return result.scalars().all()
+
+
+def iter_product_ids(db: DbSession):
+    for (product_id,) in db.query(ProductORM.id).yield_per(10_000):
+        yield product_id
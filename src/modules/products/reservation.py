@@ -0,0 +1,241 @@
+"""
+Redis-side stock reservation gate (STOCK_RESERVATION_ENABLED).
+
+Per product two keys are kept:
+- stock:available:{product_id}  units that can still be reserved at the edge
+- stock:inflight:{product_id}   sorted set of order_ids reserved but not yet
+                                settled by the worker (score = reservation time)
+
+`queue_order` reserves atomically before enqueueing, so requests for sold-out
+products are rejected without a queue round-trip. The worker settles or
+releases the reservation once the order is decided, `cancel_order` gives the
+unit back, and `reconcile` repairs drift against MySQL:
+
+    available = products.stock - |inflight|
+
+The reconciler reads MySQL and Redis at different moments, so a worker
+settling in between makes one run see a drift that is not there. A drift is
+therefore only corrected once two consecutive runs observe the same value
+(kept in stock:drift:{product_id}), and then applied as a delta so
+reservations made meanwhile are kept.
+
+MySQL stays authoritative: the worker still checks stock under lock, the gate
+only sheds load that is certain to fail.
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.core import config
+from src.database.redis import r
+from src.entities.product import Product as ProductORM
+
+AVAILABLE_KEY = "stock:available:{}"
+INFLIGHT_KEY = "stock:inflight:{}"
+DRIFT_KEY = "stock:drift:{}"
+
+# Returns 1 reserved, 0 sold out, -1 counter not seeded
+_RESERVE = r.register_script(
+    """
+    local available = redis.call('GET', KEYS[1])
+    if not available then return -1 end
+    if tonumber(available) <= 0 then return 0 end
+    redis.call('DECR', KEYS[1])
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+    return 1
+    """
+)
+
+# Seed the counter from a DB stock value unless another process already did
+_SEED = r.register_script(
+    """
+    if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+    local available = tonumber(ARGV[1]) - redis.call('ZCARD', KEYS[2])
+    if available < 0 then available = 0 end
+    redis.call('SET', KEYS[1], available)
+    return 1
+    """
+)
+
+# Give a reservation back; a no-op if the order was already settled/released
+_RELEASE = r.register_script(
+    """
+    if redis.call('ZREM', KEYS[2], ARGV[1]) == 1
+        and redis.call('EXISTS', KEYS[1]) == 1 then
+        redis.call('INCR', KEYS[1])
+        return 1
+    end
+    return 0
+    """
+)
+
+_RESTOCK = r.register_script(
+    """
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        return redis.call('INCRBY', KEYS[1], ARGV[1])
+    end
+    return -1
+    """
+)
+
+# Drop reservations older than the cutoff (lost tasks) and recompute availability.
+# ARGV: stock, cutoff, drift ttl. Returns {previous, available}
+_RECONCILE = r.register_script(
+    """
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[2])
+    local target = tonumber(ARGV[1]) - redis.call('ZCARD', KEYS[2])
+    if target < 0 then target = 0 end
+    local current = tonumber(redis.call('GET', KEYS[1]))
+    if not current then
+        redis.call('SET', KEYS[1], target)
+        redis.call('DEL', KEYS[3])
+        return {-1, target}
+    end
+    local drift = target - current
+    if drift == 0 then
+        redis.call('DEL', KEYS[3])
+        return {current, current}
+    end
+    if tonumber(redis.call('GET', KEYS[3])) ~= drift then
+        redis.call('SET', KEYS[3], drift, 'EX', ARGV[3])
+        return {current, current}
+    end
+    redis.call('DEL', KEYS[3])
+    return {current, redis.call('INCRBY', KEYS[1], drift)}
+    """
+)
+
+
+def _keys(product_id: str):
+    return [AVAILABLE_KEY.format(product_id), INFLIGHT_KEY.format(product_id)]
+
+
+def _db_stock(db: Session, product_id: str) -> Optional[int]:
+    product = db.query(ProductORM.stock).filter(ProductORM.id == product_id).first()
+    return None if product is None else product.stock
+
+
+def reserve(db: Session, product_id: str, order_id: str) -> Optional[bool]:
+    """Reserve one unit for an order.
+
+    Returns True if reserved, False if the product is sold out, and None when the
+    gate cannot decide (unknown product or Redis unavailable) so the caller
+    should fall through to the worker.
+    """
+    keys = _keys(product_id)
+    try:
+        outcome = _RESERVE(keys=keys, args=[order_id, time.time()])
+        if outcome == -1:
+            stock = _db_stock(db, product_id)
+            if stock is None:
+                return None
+            _SEED(keys=keys, args=[stock])
+            outcome = _RESERVE(keys=keys, args=[order_id, time.time()])
+        return outcome == 1
+    except Exception as e:
+        logging.warning(f"Stock reservation unavailable for product {product_id}: {e}")
+        return None
+
+
+def reserve_many(db: Session, items: List[Tuple[str, str]]) -> List[Optional[bool]]:
+    """Reserve one unit for each (product_id, order_id) in one pipelined round-trip.
+
+    Outcomes follow `reserve`. Products whose counter is not seeded yet are
+    seeded once and retried.
+    """
+    try:
+        outcomes = _reserve_pipelined(items)
+        unseeded = {items[i][0] for i, outcome in enumerate(outcomes) if outcome == -1}
+        if unseeded:
+            for product_id in unseeded:
+                stock = _db_stock(db, product_id)
+                if stock is not None:
+                    _SEED(keys=_keys(product_id), args=[stock])
+            retry = [i for i, outcome in enumerate(outcomes) if outcome == -1]
+            for i, outcome in zip(retry, _reserve_pipelined([items[i] for i in retry])):
+                outcomes[i] = outcome
+        return [None if outcome == -1 else outcome == 1 for outcome in outcomes]
+    except Exception as e:
+        logging.warning(f"Stock reservation unavailable for {len(items)} orders: {e}")
+        return [None] * len(items)
+
+
+def _reserve_pipelined(items: List[Tuple[str, str]]) -> List[int]:
+    now = time.time()
+    pipe = r.pipeline(transaction=False)
+    for product_id, order_id in items:
+        _RESERVE(keys=_keys(product_id), args=[order_id, now], client=pipe)
+    return pipe.execute()
+
+
+def finalize(product_id: str, order_id: str, result: Dict) -> None:
+    """Close an order's reservation after the worker committed its outcome.
+
+    COMPLETED and stock-exhausted orders consume the unit; any other failure
+    gives it back to the available counter.
+    """
+    keys = _keys(product_id)
+    try:
+        if result.get("status") == "COMPLETED" or str(
+            result.get("reason", "")
+        ).startswith("Insufficient stock"):
+            r.zrem(keys[1], order_id)
+        else:
+            _RELEASE(keys=keys, args=[order_id])
+    except Exception as e:
+        logging.warning(f"Failed to finalize reservation for order {order_id}: {e}")
+
+
+def restock(product_id: str, amount: int = 1) -> None:
+    """Return units to the gate after a committed restock (e.g. cancellation)."""
+    try:
+        _RESTOCK(keys=_keys(product_id), args=[amount])
+    except Exception as e:
+        logging.warning(f"Failed to restock reservation for product {product_id}: {e}")
+
+
+def reconcile(db: Session, max_inflight_age: int = 600) -> int:
+    """Repair drift between the Redis counters and MySQL.
+
+    Only products that already have a counter are reconciled; counters for
+    products that no longer exist are removed. A drift is corrected once it
+    has been seen by two consecutive runs. Returns the number of counters
+    that were corrected.
+    """
+    product_ids = [
+        key.decode("utf-8").split(":", 2)[2]
+        for key in r.scan_iter(match=AVAILABLE_KEY.format("*"), count=1000)
+    ]
+    if not product_ids:
+        return 0
+
+    stocks = dict(
+        db.query(ProductORM.id, ProductORM.stock)
+        .filter(ProductORM.id.in_(product_ids))
+        .all()
+    )
+
+    cutoff = time.time() - max_inflight_age
+    # Long enough to survive until the next run, short enough to forget
+    # a drift that a stopped beat saw long ago
+    drift_ttl = 3 * config.STOCK_RESERVATION_RECONCILE_SECONDS
+    corrected = 0
+    for product_id in product_ids:
+        keys = _keys(product_id) + [DRIFT_KEY.format(product_id)]
+        if product_id not in stocks:
+            r.delete(*keys)
+            continue
+        previous, available = _RECONCILE(
+            keys=keys, args=[stocks[product_id], cutoff, drift_ttl]
+        )
+        if int(previous) != int(available):
+            corrected += 1
+            logging.info(
+                f"Reconciled stock reservation for product {product_id}: "
+                f"{int(previous)} -> {int(available)}"
+            )
+    return corrected
+
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List
 from uuid import UUID
 
 from sqlalchemy import BOOLEAN
@@ -7,75 +8,209 @@ from src.modules.products.build.product import ProductBuilder
 from .model import ProductResponse
 from src.entities.product import Product as ProductORM
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import repository
+from . import cache as product_cache
+from src.core import config
+from src.core.bloom import BloomFilter
 import logging
-import redis
-import json
-from cachetools import TTLCache
 
-inproc_cache = TTLCache(maxsize=10_000, ttl=30)
+# Ids of existing products (ID_FILTER_ENABLED), fed by every product load
+known_ids = BloomFilter(
+    "bloom:products",
+    config.ID_FILTER_CAPACITY,
+    config.ID_FILTER_ERROR_RATE,
+    config.ID_FILTER_REFRESH_SECONDS,
+)
 
-redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
-r = redis.from_url(redis_url, max_connections=1000)
+
+def build_product_response(
+    product: ProductORM, stock: int | None = None
+) -> ProductResponse:
+    """Build the priced response for an already-loaded product row.
+
+    `stock` overrides `product.stock`, e.g. with the exact sum of a sharded product.
+    """
+    response = ProductResponse(
+        product_id=product.id,
+        name=product.name,
+        description=product.description or "",
+        base_price=product.base_price,
+        current_price=0,
+        stock=product.stock if stock is None else stock,
+        initial_stock=product.initial_stock,
+    )
+    return ProductBuilder(response).add_dynamic_price().get()
 
 
 def get_product(db: Session, product_id: str, cache: bool) -> ProductResponse | None:
     """
     Retrieve a product with optional multi‑tier caching (in‑proc + Redis).
     When cache=False: always hit DB and do not read/write caches.
+    Cache misses are coalesced per product (see cache.py).
     """
     try:
         if cache:
-            # In‑process cache tier
-            hit = inproc_cache.get(product_id)
+            hit = product_cache.get(product_id, lambda: _refresh_product(product_id))
             if hit:
                 return hit
+            return product_cache.load(product_id, lambda: _load_product(db, product_id))
 
-            # Redis cache tier
-            cache_key = f"product:{product_id}"
-            cached_bytes = r.get(cache_key)
-            if cached_bytes:
-                try:
-                    obj = json.loads(cached_bytes.decode("utf-8"))
-                    model = ProductResponse(**obj)
-                    inproc_cache[product_id] = model
-                    return model
-                except (UnicodeDecodeError, ValueError) as e:
-                    logging.warning(f"Corrupt cache for key {cache_key}: {e}")
-
-        # DB fetch
-        product = repository.get_product(db, product_id)
-        if product is None:
-            logging.warning(f"Product with ID {product_id} not found.")
-            return None
-
-        response = ProductResponse(
-            product_id=product.id,
-            name=product.name,
-            description=product.description or "",
-            base_price=product.base_price,
-            current_price=0,
-            stock=product.stock,
-            initial_stock=product.initial_stock,
-        )
-        response = ProductBuilder(response).add_dynamic_price().get()
+        return _load_product(db, product_id)
+    except Exception as e:
+        logging.error(f"Failed to retrieve product {product_id}. Error: {e}")
+        raise
+
+
+def _load_product(db: Session, product_id: str) -> ProductResponse | None:
+    # DB fetch
+    product = repository.get_product(db, product_id)
+    if product is None:
+        logging.warning("Product with ID %s not found.", product_id)
+        return None
+    if config.ID_FILTER_ENABLED:
+        known_ids.add(product.id.lower())
+    return build_product_response(product)
+
+
+def _refresh_product(product_id: str) -> ProductResponse | None:
+    # Background revalidation outlives the request session, so use its own
+    from src.database.core import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return _load_product(db, product_id)
+    finally:
+        db.close()
 
+
+async def get_product_async(
+    db: AsyncSession, product_id: str, cache: bool
+) -> ProductResponse | None:
+    """
+    Async counterpart of get_product (ASYNC_API_ENABLED): same cache tiers, but
+    Redis and MySQL are awaited instead of blocking a threadpool worker.
+    """
+    try:
         if cache:
-            cache_key = f"product:{product_id}"
-            payload = response.model_dump_json()
-            # Fire-and-forget cache set (ignore errors)
-            try:
-                r.setex(cache_key, 10, payload)
-                inproc_cache[product_id] = response
-            except Exception as ce:
-                logging.debug(f"Cache set failed for {cache_key}: {ce}")
-
-        return response
+            hit = await product_cache.get_async(
+                product_id, lambda: _refresh_product_async(product_id)
+            )
+            if hit:
+                return hit
+            return await product_cache.load_async(
+                product_id, lambda: _load_product_async(db, product_id)
+            )
+
+        return await _load_product_async(db, product_id)
     except Exception as e:
         logging.error(f"Failed to retrieve product {product_id}. Error: {e}")
         raise
 
 
+async def _load_product_async(
+    db: AsyncSession, product_id: str
+) -> ProductResponse | None:
+    # DB fetch
+    product = await repository.get_product_async(db, product_id)
+    if product is None:
+        logging.warning("Product with ID %s not found.", product_id)
+        return None
+    if config.ID_FILTER_ENABLED:
+        await known_ids.add_async(product.id.lower())
+    return build_product_response(product)
+
+
+async def _refresh_product_async(product_id: str) -> ProductResponse | None:
+    from src.database.core import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return await _load_product_async(db, product_id)
+
+
+def get_products(
+    db: Session, product_ids: List[str], cache: bool = True
+) -> Dict[str, ProductResponse | None]:
+    """
+    Batch counterpart of get_product: in-process hits, then one Redis MGET, then
+    one IN query for whatever is left. Returns every requested id, None for
+    products that do not exist.
+    """
+    try:
+        found = {}
+        if cache:
+            found = product_cache.get_many(product_ids, _refresh_product)
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        if missing:
+            loader = lambda ids: _load_products(db, ids)  # noqa: E731
+            if cache:
+                found.update(product_cache.load_many(missing, loader))
+            else:
+                found.update(loader(missing))
+        return {product_id: found.get(product_id) for product_id in product_ids}
+    except Exception as e:
+        logging.error(f"Failed to retrieve products {product_ids}. Error: {e}")
+        raise
+
+
+def _load_products(
+    db: Session, product_ids: List[str]
+) -> Dict[str, ProductResponse | None]:
+    products = repository.get_products(db, product_ids)
+    if config.ID_FILTER_ENABLED:
+        known_ids.add(*(product.id.lower() for product in products))
+    return _build_many(product_ids, products)
+
+
+async def get_products_async(
+    db: AsyncSession, product_ids: List[str], cache: bool = True
+) -> Dict[str, ProductResponse | None]:
+    try:
+        found = {}
+        if cache:
+            found = await product_cache.get_many_async(
+                product_ids, _refresh_product_async
+            )
+        missing = [product_id for product_id in product_ids if product_id not in found]
+        if missing:
+            loader = lambda ids: _load_products_async(db, ids)  # noqa: E731
+            if cache:
+                found.update(await product_cache.load_many_async(missing, loader))
+            else:
+                found.update(await loader(missing))
+        return {product_id: found.get(product_id) for product_id in product_ids}
+    except Exception as e:
+        logging.error(f"Failed to retrieve products {product_ids}. Error: {e}")
+        raise
+
+
+async def _load_products_async(
+    db: AsyncSession, product_ids: List[str]
+) -> Dict[str, ProductResponse | None]:
+    products = await repository.get_products_async(db, product_ids)
+    if config.ID_FILTER_ENABLED:
+        await known_ids.add_async(*(product.id.lower() for product in products))
+    return _build_many(product_ids, products)
+
+
+def _build_many(product_ids, products) -> Dict[str, ProductResponse | None]:
+    # Pricing runs over the loaded set; ids without a row map to None. Rows
+    # are matched case-insensitively, as MySQL's collation matched them
+    responses = {
+        product.id.lower(): build_product_response(product) for product in products
+    }
+    for product_id in product_ids:
+        if product_id.lower() not in responses:
+            logging.warning("Product with ID %s not found.", product_id)
+    return {
+        product_id: responses.get(product_id.lower()) for product_id in product_ids
+    }
+
+
+def cache_stats() -> dict:
+    return product_cache.stats()
+
+
 def decrease_stock(db: Session, product_id: UUID, amount: int = 1) -> bool:
     """Decrease stock for a product by a specified amount.
 
@@ -84,18 +219,20 @@ def decrease_stock(db: Session, product_id: UUID, amount: int = 1) -> bool:
     try:
         product = repository.get_product(db, str(product_id))
         if product is None:
-            logging.warning(f"Product with ID {product_id} not found.")
+            logging.warning("Product with ID %s not found.", product_id)
             return False
 
         if product.stock < amount:
             logging.warning(
-                f"Insufficient stock for product ID {product_id}. Current stock: {product.stock}, requested decrease: {amount}."
+                "Insufficient stock for product ID %s. Current stock: %s, requested decrease: %s.",
+                product_id, product.stock, amount,
             )
             return False
 
         product.stock -= amount
         logging.info(
-            f"Decreased stock for product ID {product_id} by {amount}. New stock: {product.stock}."
+            "Decreased stock for product ID %s by %s. New stock: %s.",
+            product_id, amount, product.stock,
         )
         return True
     except Exception as e:
@@ -113,12 +250,13 @@ def increase_stock(db: Session, product_id: UUID, amount: int = 1) -> bool:
     try:
         product = repository.get_product(db, str(product_id))
         if product is None:
-            logging.warning(f"Product with ID {product_id} not found.")
+            logging.warning("Product with ID %s not found.", product_id)
             return False
 
         product.stock += amount
         logging.info(
-            f"Increased stock for product ID {product_id} by {amount}. New stock: {product.stock}."
+            "Increased stock for product ID %s by %s. New stock: %s.",
+            product_id, amount, product.stock,
         )
         return True
     except Exception as e:
@@ -126,3 +264,14 @@ def increase_stock(db: Session, product_id: UUID, amount: int = 1) -> bool:
             f"Failed to increase stock for product ID {product_id}. Error: {str(e)}"
         )
         return False
+
+
+def might_exist(product_id: str) -> bool:
+    """False only if the product id is definitely unknown (ID_FILTER_ENABLED)."""
+    return known_ids.might_contain(product_id.lower())
+
+
+def rebuild_known_ids(db: Session) -> int:
+    return known_ids.rebuild(
+        product_id.lower() for product_id in repository.iter_product_ids(db)
+    )
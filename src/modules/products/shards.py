@@ -0,0 +1,208 @@
+"""
+Sharded stock for hot products (SHARDED_STOCK_ENABLED).
+
+A sharded product's stock is split across K rows of `product_stock_shards`, so
+concurrent orders lock different rows instead of queueing on the single
+`products.stock` column. The sum of the shards is the real stock;
+`products.stock` is rolled up periodically as the aggregate the read path uses.
+"""
+
+import logging
+import random
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.entities.product import Product as ProductORM
+from src.entities.product_stock_shard import ProductStockShard
+
+
+def get_sharded_stock(db: Session, product_id: str) -> Optional[Tuple[int, int]]:
+    """Return (shard_count, total_stock) for a sharded product, None otherwise.
+
+    Uses a plain consistent read, no locks are taken.
+    """
+    count, total = (
+        db.query(func.count(ProductStockShard.shard_no), func.sum(ProductStockShard.stock))
+        .filter(ProductStockShard.product_id == product_id)
+        .one()
+    )
+    if not count:
+        return None
+    return count, int(total or 0)
+
+
+def acquire_shard(
+    db: Session, product_id: str, shard_count: int, attempts: int = 3
+) -> Optional[ProductStockShard]:
+    """Lock one non-empty shard of a product.
+
+    Shards are probed by primary key starting at a random shard with
+    SKIP LOCKED, so concurrent workers spread across shards. If every non-empty
+    shard is currently locked, falls back to a blocking lock on the first
+    non-empty shard. Returns None when the product is out of stock.
+    """
+    for _ in range(attempts):
+        start = random.randrange(shard_count)
+        for i in range(shard_count):
+            shard = (
+                db.query(ProductStockShard)
+                .filter(
+                    ProductStockShard.product_id == product_id,
+                    ProductStockShard.shard_no == (start + i) % shard_count,
+                    ProductStockShard.stock > 0,
+                )
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if shard is not None:
+                return shard
+
+        # Everything non-empty is locked by other workers: wait for one
+        shard = (
+            db.query(ProductStockShard)
+            .filter(
+                ProductStockShard.product_id == product_id,
+                ProductStockShard.stock > 0,
+            )
+            .with_for_update()
+            .first()
+        )
+        if shard is None:
+            return None
+        if shard.stock > 0:
+            return shard
+    return None
+
+
+def take_from_shard(db: Session, product_id: str, shard_count: int) -> bool:
+    """Decrement one non-empty shard with guarded UPDATEs, starting at a random
+    shard. Row locks are only held by the UPDATE itself. Returns False when
+    every shard is empty.
+    """
+    start = random.randrange(shard_count)
+    for i in range(shard_count):
+        taken = (
+            db.query(ProductStockShard)
+            .filter(
+                ProductStockShard.product_id == product_id,
+                ProductStockShard.shard_no == (start + i) % shard_count,
+                ProductStockShard.stock > 0,
+            )
+            .update(
+                {ProductStockShard.stock: ProductStockShard.stock - 1},
+                synchronize_session=False,
+            )
+        )
+        if taken:
+            return True
+    return False
+
+
+def lock_shards(db: Session, product_id: str) -> List[ProductStockShard]:
+    """Lock all shards of a product (batch settlement). Empty list if not sharded."""
+    return (
+        db.query(ProductStockShard)
+        .filter(ProductStockShard.product_id == product_id)
+        .order_by(ProductStockShard.shard_no)
+        .with_for_update()
+        .all()
+    )
+
+
+def restock(db: Session, product_id: str, amount: int = 1) -> bool:
+    """Return units to a random shard. Returns False if the product is not sharded.
+
+    The caller commits.
+    """
+    sharded = get_sharded_stock(db, product_id)
+    if sharded is None:
+        return False
+    shard_count, _ = sharded
+    db.query(ProductStockShard).filter(
+        ProductStockShard.product_id == product_id,
+        ProductStockShard.shard_no == random.randrange(shard_count),
+    ).update(
+        {ProductStockShard.stock: ProductStockShard.stock + amount},
+        synchronize_session=False,
+    )
+    return True
+
+
+def split(db: Session, product_id: str, shard_count: int) -> bool:
+    """Spread a product's current stock evenly over `shard_count` shards.
+
+    Existing shards are merged back first, so this also re-shards a product.
+    """
+    if shard_count < 1:
+        raise ValueError("shard_count must be >= 1")
+
+    product = (
+        db.query(ProductORM).filter(ProductORM.id == product_id).with_for_update().first()
+    )
+    if product is None:
+        logging.warning(f"Product with ID {product_id} not found.")
+        return False
+
+    shards = lock_shards(db, product_id)
+    stock = sum(shard.stock for shard in shards) if shards else product.stock
+    for shard in shards:
+        db.delete(shard)
+    db.flush()
+
+    base, remainder = divmod(stock, shard_count)
+    for shard_no in range(shard_count):
+        db.add(
+            ProductStockShard(
+                product_id=product_id,
+                shard_no=shard_no,
+                stock=base + (1 if shard_no < remainder else 0),
+            )
+        )
+    product.stock = stock
+    db.commit()
+    logging.info(f"Split stock of product {product_id} ({stock}) into {shard_count} shards")
+    return True
+
+
+def merge(db: Session, product_id: str) -> bool:
+    """Fold a product's shards back into `products.stock` and drop them."""
+    product = (
+        db.query(ProductORM).filter(ProductORM.id == product_id).with_for_update().first()
+    )
+    if product is None:
+        return False
+
+    shards = lock_shards(db, product_id)
+    if not shards:
+        return False
+    product.stock = sum(shard.stock for shard in shards)
+    for shard in shards:
+        db.delete(shard)
+    db.commit()
+    logging.info(f"Merged shards of product {product_id}, stock {product.stock}")
+    return True
+
+
+def rollup(db: Session) -> List[str]:
+    """Refresh `products.stock` from the shard sums.
+
+    Returns the ids of products whose aggregate changed.
+    """
+    totals = (
+        db.query(ProductStockShard.product_id, func.sum(ProductStockShard.stock))
+        .group_by(ProductStockShard.product_id)
+        .all()
+    )
+    changed = []
+    for product_id, total in totals:
+        updated = (
+            db.query(ProductORM)
+            .filter(ProductORM.id == product_id, ProductORM.stock != int(total or 0))
+            .update({ProductORM.stock: int(total or 0)}, synchronize_session=False)
+        )
+        if updated:
+            changed.append(product_id)
+    db.commit()
+    return changed
@@ -0,0 +1,239 @@
+"""
+Shared-memory product table (PRODUCT_SHM_ENABLED).
+
+A fixed-layout table in a memory-mapped file under /dev/shm that every API
+worker on the host maps. It sits between the per-process TTLCache and Redis:
+one copy of the hot catalog per host instead of one per gunicorn worker, and a
+product loaded by any worker is a local hit for all of them.
+
+Layout: a 64-byte header followed by `slots` fixed-size slots. A product id
+hashes to a slot and is probed linearly over PROBE slots. Each slot starts
+with a sequence counter (seqlock): the writer makes it odd, writes the slot,
+then makes it even again; readers copy the slot and retry if the counter was
+odd or changed meanwhile, so readers never take a lock. Writers are serialized
+by flock on the file (across processes) plus a thread lock (within one).
+
+Clearing the table bumps the header epoch; slots written under an older epoch
+read as empty.
+
+The file name carries the layout (`{path}-{slots}x{slot_size}`), so workers
+configured differently (e.g. during a rolling deploy) use separate tables. A
+file that may be mapped is never resized: a missing or unreadable table is
+built in a temporary file and renamed into place, and workers still mapping
+the old file keep a valid mapping of it.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Optional
+
+from src.core import config
+
+MAGIC = b"PRODSHM1"
+PROBE = 8
+READ_RETRIES = 16
+
+# magic, slots, slot_size, epoch
+_HEADER = struct.Struct("<8sIII")
+HEADER_SIZE = 64
+
+# seq, epoch, hard_expiry, key_len, key, payload_len
+_SLOT = struct.Struct("<IId B40s I")
+_SEQ = struct.Struct("<I")
+SLOT_HEADER_SIZE = 64
+
+
+class SharedTable:
+    def __init__(self, path: str, slots: int, slot_size: int):
+        if slot_size <= SLOT_HEADER_SIZE:
+            raise ValueError("slot_size must be larger than the slot header")
+        self.path = f"{path}-{slots}x{slot_size}"
+        self.slots = slots
+        self.slot_size = slot_size
+        self.size = HEADER_SIZE + slots * slot_size
+        self._write_lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+
+    # ---- mapping ----
+
+    def _map(self) -> mmap.mmap:
+        # flock is per open file description: a forked worker must reopen the
+        # file or it would share its parent's lock
+        if self._pid == os.getpid():
+            return self._mm
+        # Serializes creation, so concurrent workers end up on the same file
+        lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            fd = self._open()
+        finally:
+            os.close(lock_fd)
+        mm = mmap.mmap(fd, self.size, mmap.MAP_SHARED)
+        self._fd, self._mm, self._pid = fd, mm, os.getpid()
+        return mm
+
+    def _open(self) -> int:
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            fd = None
+        if fd is not None:
+            if os.fstat(fd).st_size == self.size and _HEADER.unpack(
+                os.pread(fd, _HEADER.size, 0)
+            )[:3] == (MAGIC, self.slots, self.slot_size):
+                return fd
+            os.close(fd)
+            logging.warning(f"Replacing shared product table {self.path}")
+
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, _HEADER.pack(MAGIC, self.slots, self.slot_size, 1), 0)
+            os.rename(tmp, self.path)
+        except OSError:
+            os.close(fd)
+            os.unlink(tmp)
+            raise
+        return fd
+
+    def _epoch(self, mm) -> int:
+        return _HEADER.unpack_from(mm, 0)[3]
+
+    def _offsets(self, key: bytes):
+        start = zlib.crc32(key) % self.slots
+        for i in range(min(PROBE, self.slots)):
+            yield HEADER_SIZE + ((start + i) % self.slots) * self.slot_size
+
+    # ---- readers (lock-free) ----
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the payload stored for key, None if absent or expired."""
+        mm = self._map()
+        key_bytes = key.encode("utf-8")
+        epoch = self._epoch(mm)
+        now = time.time()
+        for offset in self._offsets(key_bytes):
+            for _ in range(READ_RETRIES):
+                seq = _SEQ.unpack_from(mm, offset)[0]
+                if seq & 1:
+                    continue
+                _, slot_epoch, hard_expiry, key_len, slot_key, payload_len = (
+                    _SLOT.unpack_from(mm, offset)
+                )
+                if slot_epoch != epoch or slot_key[:key_len] != key_bytes:
+                    payload = None
+                else:
+                    start = offset + SLOT_HEADER_SIZE
+                    payload = mm[start : start + payload_len]
+                if _SEQ.unpack_from(mm, offset)[0] != seq:
+                    continue
+                if payload is None:
+                    break
+                return payload if hard_expiry > now else None
+        return None
+
+    # ---- writers (serialized) ----
+
+    def put(self, key: str, payload: bytes, ttl: float) -> bool:
+        """Store payload for ttl seconds. Returns False if it does not fit."""
+        key_bytes = key.encode("utf-8")
+        if len(key_bytes) > 40 or len(payload) > self.slot_size - SLOT_HEADER_SIZE:
+            return False
+        mm = self._map()
+        with self._locked():
+            epoch = self._epoch(mm)
+            now = time.time()
+            target, oldest = None, None
+            for offset in self._offsets(key_bytes):
+                _, slot_epoch, hard_expiry, key_len, slot_key, _ = _SLOT.unpack_from(
+                    mm, offset
+                )
+                if slot_epoch == epoch and slot_key[:key_len] == key_bytes:
+                    target = offset
+                    break
+                if target is None and (slot_epoch != epoch or hard_expiry <= now):
+                    target = offset
+                if oldest is None or hard_expiry < oldest[0]:
+                    oldest = (hard_expiry, offset)
+            if target is None:
+                target = oldest[1]
+            self._write(mm, target, epoch, now + ttl, key_bytes, payload)
+        return True
+
+    def delete(self, key: str) -> None:
+        key_bytes = key.encode("utf-8")
+        mm = self._map()
+        with self._locked():
+            epoch = self._epoch(mm)
+            for offset in self._offsets(key_bytes):
+                _, slot_epoch, _, key_len, slot_key, _ = _SLOT.unpack_from(mm, offset)
+                if slot_epoch == epoch and slot_key[:key_len] == key_bytes:
+                    self._write(mm, offset, 0, 0.0, b"", b"")
+
+    def clear(self) -> None:
+        mm = self._map()
+        with self._locked():
+            magic, slots, slot_size, epoch = _HEADER.unpack_from(mm, 0)
+            _HEADER.pack_into(mm, 0, magic, slots, slot_size, (epoch % 0xFFFFFFFF) + 1)
+
+    def _write(self, mm, offset, epoch, hard_expiry, key_bytes, payload):
+        seq = _SEQ.unpack_from(mm, offset)[0]
+        _SEQ.pack_into(mm, offset, seq + 1)
+        start = offset + SLOT_HEADER_SIZE
+        mm[start : start + len(payload)] = payload
+        _SLOT.pack_into(
+            mm, offset, seq + 1, epoch, hard_expiry, len(key_bytes), key_bytes, len(payload)
+        )
+        _SEQ.pack_into(mm, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def _locked(self):
+        return _FileLock(self._fd, self._write_lock)
+
+    def used(self) -> int:
+        """Number of live slots (diagnostics)."""
+        mm = self._map()
+        epoch = self._epoch(mm)
+        now = time.time()
+        used = 0
+        for i in range(self.slots):
+            _, slot_epoch, hard_expiry, _, _, _ = _SLOT.unpack_from(
+                mm, HEADER_SIZE + i * self.slot_size
+            )
+            if slot_epoch == epoch and hard_expiry > now:
+                used += 1
+        return used
+
+
+class _FileLock:
+    def __init__(self, fd, thread_lock):
+        self.fd = fd
+        self.thread_lock = thread_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+
+table: Optional[SharedTable] = None
+if config.PRODUCT_SHM_ENABLED:
+    try:
+        table = SharedTable(
+            config.PRODUCT_SHM_PATH, config.PRODUCT_SHM_SLOTS, config.PRODUCT_SHM_SLOT_BYTES
+        )
+        table._map()
+    except (OSError, ValueError) as e:
+        logging.warning(f"Shared-memory product cache disabled: {e}")
+        table = None
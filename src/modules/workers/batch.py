@@ -0,0 +1,232 @@
+"""
+Batched, product-grouped order settlement.
+
+Used by the `orders.process_order_batch` task. Orders drained from the queue are
+grouped by product so each product row is locked once per group instead of once
+per order. Per-order outcomes and idempotency rules match `process_order`.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.core import config
+from src.entities.customer import Customer
+from src.entities.order import Order, OrderStatus
+from src.entities.product import Product
+from src.modules.interface.products import ProductsInterface
+
+logger = logging.getLogger(__name__)
+
+
+def group_by_product(
+    orders: Iterable[Tuple[str, str, str]],
+) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Group (order_id, product_id, customer_id) triples by product.
+    Redelivered duplicates of the same order_id are dropped; groups keep arrival
+    order and are returned sorted by product_id for a stable lock order.
+    """
+    groups: Dict[str, List[Tuple[str, str]]] = {}
+    seen = set()
+    for order_id, product_id, customer_id in orders:
+        if order_id in seen:
+            continue
+        seen.add(order_id)
+        groups.setdefault(product_id, []).append((order_id, customer_id))
+    return dict(sorted(groups.items()))
+
+
+def _completed(order_id: str, price: float) -> Dict:
+    return {"order_id": order_id, "status": "COMPLETED", "price_paid": float(price)}
+
+
+def _failed(order_id: str, reason: str) -> Dict:
+    return {"order_id": order_id, "status": "FAILED", "reason": reason}
+
+
+def _take_one(product: Product, shards: List) -> None:
+    if not shards:
+        product.stock -= 1
+        return
+    for shard in shards:
+        if shard.stock > 0:
+            shard.stock -= 1
+            return
+
+
+def settle_product_group(
+    db: Session, product_id: str, orders: List[Tuple[str, str]]
+) -> Dict[str, Dict]:
+    """
+    Settle every order of one product inside the caller's transaction.
+
+    - Product row is locked once, customers are locked in sorted order
+    - Orders are applied in arrival order, so dynamic pricing follows stock
+    - New COMPLETED/FAILED rows are written with a single bulk INSERT
+    Commit (or rollback) is left to the caller.
+    """
+    order_ids = [order_id for order_id, _ in orders]
+    existing = {
+        o.order_id: o
+        for o in db.query(Order).filter(Order.order_id.in_(order_ids)).all()
+    }
+
+    results: Dict[str, Dict] = {}
+    pending: List[Tuple[str, str]] = []
+    for order_id, customer_id in orders:
+        existing_order = existing.get(order_id)
+        if existing_order is not None:
+            if existing_order.status == OrderStatus.COMPLETED:
+                logger.info("Order %s already completed", order_id)
+                results[order_id] = _completed(order_id, existing_order.price_paid)
+                continue
+            if existing_order.status == OrderStatus.FAILED:
+                logger.info("Order %s already failed", order_id)
+                results[order_id] = _failed(order_id, "Previously failed")
+                continue
+        pending.append((order_id, customer_id))
+
+    if not pending:
+        return results
+
+    new_rows: List[Dict] = []
+
+    def record(order_id, customer_id, price, status, update_existing=True):
+        existing_order = existing.get(order_id)
+        if existing_order is None:
+            new_rows.append(
+                {
+                    "order_id": order_id,
+                    "customer_id": customer_id,
+                    "product_id": product_id,
+                    "price_paid": price,
+                    "status": status,
+                }
+            )
+        elif update_existing:
+            existing_order.status = status
+            existing_order.price_paid = price
+
+    # Lock the product row once for the whole group
+    product = (
+        db.query(Product).filter(Product.id == product_id).with_for_update().first()
+    )
+    if not product:
+        for order_id, customer_id in pending:
+            record(order_id, customer_id, 0, OrderStatus.FAILED, update_existing=False)
+            results[order_id] = _failed(order_id, f"Product {product_id} not found")
+        if new_rows:
+            db.execute(insert(Order), new_rows)
+        return results
+
+    # Sharded products: lock every shard once for the group; the shard sum is
+    # the real stock and units are taken from the first non-empty shard
+    shards = (
+        ProductsInterface.lock_stock_shards(db, product_id)
+        if config.SHARDED_STOCK_ENABLED
+        else []
+    )
+    available = sum(shard.stock for shard in shards) if shards else product.stock
+
+    # Lock all customers of the group in a deterministic order
+    customer_ids = sorted({customer_id for _, customer_id in pending})
+    customers = {
+        c.customer_id: c
+        for c in db.query(Customer)
+        .filter(Customer.customer_id.in_(customer_ids))
+        .order_by(Customer.customer_id)
+        .with_for_update()
+        .all()
+    }
+
+    completed = 0
+    for order_id, customer_id in pending:
+        price = ProductsInterface.get_dynamic_price_for(product, stock=available)
+        if price is None or price <= 0:
+            record(order_id, customer_id, 0, OrderStatus.FAILED, update_existing=False)
+            results[order_id] = _failed(
+                order_id, f"Invalid price for product {product_id}"
+            )
+            continue
+
+        customer = customers.get(customer_id)
+        if not customer:
+            record(
+                order_id, customer_id, price, OrderStatus.FAILED, update_existing=False
+            )
+            results[order_id] = _failed(order_id, f"Customer {customer_id} not found")
+            continue
+
+        if available <= 0:
+            record(order_id, customer_id, price, OrderStatus.FAILED)
+            results[order_id] = _failed(
+                order_id, f"Insufficient stock for product {product_id}"
+            )
+            continue
+
+        if customer.wallet_balance < price:
+            record(order_id, customer_id, price, OrderStatus.FAILED)
+            results[order_id] = _failed(
+                order_id, f"Insufficient balance for customer {customer_id}"
+            )
+            continue
+
+        _take_one(product, shards)
+        available -= 1
+        customer.wallet_balance -= price
+        record(order_id, customer_id, price, OrderStatus.COMPLETED)
+        results[order_id] = _completed(order_id, price)
+        completed += 1
+
+    if new_rows:
+        db.execute(insert(Order), new_rows)
+
+    logger.info(
+        "Settled %s orders for product %s: %s completed, %s failed",
+        len(pending), product_id, completed, len(pending) - completed,
+    )
+    return results
+
+
+def complete_group(
+    product_id: str,
+    orders: List[Tuple[str, str]],
+    results: Dict[str, Dict],
+    reserved_orders: Set[str],
+) -> None:
+    """
+    Post-commit follow-ups of a settled product group, shared by the batch
+    consumers: finalize reservations, invalidate the product, record the
+    statuses, publish the status events, feed the admission settle rate and
+    count the outcomes.
+    """
+    from src.modules.interface.order import OrdersInterface
+
+    for order_id, result in results.items():
+        if order_id in reserved_orders:
+            ProductsInterface.finalize_reservation(product_id, order_id, result)
+    if config.PRODUCT_INVALIDATION_ENABLED and any(
+        result.get("status") == "COMPLETED" for result in results.values()
+    ):
+        ProductsInterface.publish_product_changed(product_id)
+    if config.ORDER_STATUS_CACHE_ENABLED:
+        customers = dict(orders)
+        OrdersInterface.record_statuses(
+            {
+                **result,
+                "product_id": product_id,
+                "customer_id": customers[order_id],
+            }
+            for order_id, result in results.items()
+        )
+    if config.ORDER_EVENTS_ENABLED:
+        OrdersInterface.publish_status_events(results.values())
+    if config.ADMISSION_ENABLED:
+        OrdersInterface.record_settled(len(results))
+    if config.METRICS_ENABLED:
+        from src.core import metrics
+
+        metrics.observe_outcomes(results.values())
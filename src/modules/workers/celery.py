@@ -1,9 +1,25 @@
 import logging
+import os
+import signal
+import time
 from typing import Dict
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    setup_logging,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_ready,
+)
 from celery.utils.log import get_task_logger
+from celery_batches import Batches
 from sqlalchemy.exc import SQLAlchemyError
 
+from src.core import config
+
 logger = get_task_logger(__name__)
 
 celery_app = Celery(
@@ -21,6 +37,12 @@ celery_app.conf.update(
     task_acks_late=True,
     worker_prefetch_multiplier=1,
     task_reject_on_worker_lost=True,
+    task_routes={
+        # Batch consumer runs on its own queue so it can prefetch a full batch
+        "orders.process_order_batch": {"queue": "orders.batch"},
+        # orders.process_order_partition is routed per message to orders.p{n}
+    },
+    beat_schedule={},
 )
 
 
@@ -33,195 +55,291 @@ celery_app.conf.update(
     retry_backoff_max=60,
     retry_kwargs={"max_retries": 3},
 )
-def process_order(self, order_id: str, product_id: str, customer_id: str) -> Dict:
+def process_order(
+    self, order_id: str, product_id: str, customer_id: str, reserved: bool = False
+) -> Dict:
     """
-    Process order with proper locking to ensure exactly one succeeds when stock=1.
-    All orders (success or failure) are saved to the database.
+    Settle one order with the configured engine (SETTLEMENT_ENGINE, see
+    settlement.py). All orders (success or failure) are saved to the database.
+    Orders admitted through the Redis reservation gate settle or release their
+    reservation once the outcome is committed.
     """
-    from src.database.core import SessionLocal
-    from src.modules.interface.order import OrdersInterface
-    from src.entities.order import OrderStatus, Order
-    from src.entities.product import Product
-    from src.entities.customer import Customer
+    from src.modules.workers.settlement import settle_order
     from src.modules.interface.products import ProductsInterface
-    
-    db = SessionLocal()
-    
-    try:
-        # Check if order already exists (idempotency)
-        existing_order = db.query(Order).filter_by(order_id=order_id).first()
-        if existing_order:
-            if existing_order.status == OrderStatus.COMPLETED:
-                logger.info(f"Order {order_id} already completed")
-                return {
-                    "order_id": order_id,
-                    "status": "COMPLETED",
-                    "price_paid": float(existing_order.price_paid)
-                }
-            elif existing_order.status == OrderStatus.FAILED:
-                logger.info(f"Order {order_id} already failed")
-                return {
-                    "order_id": order_id,
-                    "status": "FAILED",
-                    "reason": "Previously failed"
-                }
-        
-        # CRITICAL: Lock product row FIRST to prevent race conditions
-        product = db.query(Product).filter(
-            Product.id == product_id
-        ).with_for_update().first()  # Pessimistic lock - only one worker can hold this
-        
-        if not product:
-            # Create failed order for product not found
-            if not existing_order:
-                order = Order(
-                    order_id=order_id,
-                    customer_id=customer_id,
-                    product_id=product_id,
-                    price_paid=0,
-                    status=OrderStatus.FAILED
-                )
-                db.add(order)
-                db.commit()
-            raise ValueError(f"Product {product_id} not found")
-        
-        # Calculate price first (needed for order record)
-        price = ProductsInterface.get_dynamic_price(db, product_id)
-        if price is None or price <= 0:
-            # Create failed order for invalid price
-            if not existing_order:
-                order = Order(
-                    order_id=order_id,
-                    customer_id=customer_id,
-                    product_id=product_id,
-                    price_paid=0,
-                    status=OrderStatus.FAILED
-                )
-                db.add(order)
-                db.commit()
-            raise ValueError(f"Invalid price for product {product_id}")
-        
-        # Get customer with lock
-        customer = db.query(Customer).filter(
-            Customer.customer_id == customer_id
-        ).with_for_update().first()
-        
-        if not customer:
-            # Create failed order for customer not found
-            if not existing_order:
-                order = Order(
-                    order_id=order_id,
-                    customer_id=customer_id,
-                    product_id=product_id,
-                    price_paid=price,
-                    status=OrderStatus.FAILED
-                )
-                db.add(order)
-                db.commit()
-            raise ValueError(f"Customer {customer_id} not found")
-        
-        # Create or update order to PENDING first
-        if not existing_order:
-            order = Order(
-                order_id=order_id,
-                customer_id=customer_id,
-                product_id=product_id,
-                price_paid=price,
-                status=OrderStatus.PENDING
+
+    if config.METRICS_ENABLED:
+        from src.core import metrics
+
+        metrics.observe_queue_latency("celery", self.request.get("enqueued_at"))
+        started = time.perf_counter()
+    result = settle_order(order_id, product_id, customer_id)
+    if config.METRICS_ENABLED:
+        metrics.observe_settle(config.SETTLEMENT_ENGINE, time.perf_counter() - started)
+        metrics.observe_outcomes([result])
+    if reserved:
+        ProductsInterface.finalize_reservation(product_id, order_id, result)
+    if config.PRODUCT_INVALIDATION_ENABLED and result.get("status") == "COMPLETED":
+        ProductsInterface.publish_product_changed(product_id)
+    if (
+        config.ORDER_STATUS_CACHE_ENABLED
+        or config.ORDER_EVENTS_ENABLED
+        or config.ADMISSION_ENABLED
+    ):
+        from src.modules.interface.order import OrdersInterface
+
+        if config.ORDER_STATUS_CACHE_ENABLED:
+            OrdersInterface.record_statuses(
+                [{**result, "product_id": product_id, "customer_id": customer_id}]
             )
-            db.add(order)
-            db.flush()  # Make order visible in this transaction but don't commit yet
-        else:
-            existing_order.status = OrderStatus.PENDING
-            existing_order.price_paid = price
-            order = existing_order
-        
-        # NOW check stock AFTER creating the order and acquiring lock
-        if product.stock <= 0:
-            # Mark order as FAILED due to insufficient stock
-            order.status = OrderStatus.FAILED
-            db.commit()
-            logger.warning(f"Order {order_id} FAILED: Insufficient stock")
-            raise ValueError(f"Insufficient stock for product {product_id}")
-        
-        # Check customer balance
-        if customer.wallet_balance < price:
-            # Mark order as FAILED due to insufficient balance
-            order.status = OrderStatus.FAILED
-            db.commit()
-            logger.warning(f"Order {order_id} FAILED: Insufficient balance")
-            raise ValueError(f"Insufficient balance for customer {customer_id}")
-        
-        # All validations passed - execute the transaction
-        
-        # Decrease stock atomically
-        product.stock -= 1
-        
-        # Decrease customer balance atomically
-        customer.wallet_balance -= price
-        
-        # Mark order as completed
-        order.status = OrderStatus.COMPLETED
-        
-        # SINGLE COMMIT for all changes
+        if config.ORDER_EVENTS_ENABLED:
+            OrdersInterface.publish_status_events([result])
+        if config.ADMISSION_ENABLED:
+            OrdersInterface.record_settled(1)
+    return result
+
+
+@celery_app.task(
+    base=Batches,
+    name="orders.process_order_batch",
+    acks_late=True,
+    flush_every=config.ORDER_BATCH_SIZE,
+    flush_interval=config.ORDER_BATCH_WAIT_MS / 1000,
+)
+def process_order_batch(requests) -> None:
+    """
+    Batch consumer for ORDER_PROCESSING_MODE=batch.
+    Drains up to ORDER_BATCH_SIZE queued orders (or whatever arrived within
+    ORDER_BATCH_WAIT_MS), groups them by product and settles each group in one
+    transaction. Each request still gets the same result dict as process_order.
+    """
+    from src.modules.workers.batch import settle_product_group
+
+    def settle(db, product_id, orders):
+        results = settle_product_group(db, product_id, orders)
         db.commit()
-        
-        logger.info(f"Order {order_id} COMPLETED successfully")
-        
-        return {
-            "order_id": order_id,
-            "status": "COMPLETED",
-            "price_paid": float(price)
-        }
-        
-    except ValueError as e:
-        # Business logic failures - order should already be saved as FAILED
-        error_msg = str(e)
-        logger.warning(f"Order {order_id} processing failed: {error_msg}")
-        
-        return {
-            "order_id": order_id,
-            "status": "FAILED",
-            "reason": error_msg
-        }
-        
-    except SQLAlchemyError as e:
-        # Database errors - retry
-        db.rollback()
-        logger.error(f"Database error processing order {order_id}: {e}, will retry")
-        raise
-        
-    except Exception as e:
-        # Unexpected errors - try to save as failed
-        db.rollback()
-        logger.error(f"Unexpected error processing order {order_id}: {e}")
-        
-        try:
-            db2 = SessionLocal()
+        return results
+
+    _settle_requests(requests, settle, "Batch")
+
+
+@celery_app.task(
+    base=Batches,
+    name="orders.process_order_partition",
+    acks_late=True,
+    flush_every=config.ORDER_BATCH_SIZE,
+    flush_interval=config.ORDER_BATCH_WAIT_MS / 1000,
+)
+def process_order_partition(requests) -> None:
+    """
+    Partition consumer for ORDER_PROCESSING_MODE=partitioned.
+    Each orders.p{n} queue has exactly one consumer, which owns the stock of
+    the products hashed to it and settles them without locking the product
+    row (see partition.py).
+    """
+    from src.modules.workers.partition import settler
+
+    _settle_requests(requests, settler.settle, "Partition")
+
+
+def _settle_requests(requests, settle, kind: str) -> None:
+    """
+    Group drained requests by product and settle each group with
+    settle(db, product_id, orders), which commits. Failed groups are handed
+    back to the single-order path; settled ones get the same follow-ups as
+    process_order.
+    """
+    from src.database.core import SessionLocal
+    from src.modules.workers.batch import complete_group, group_by_product
+
+    requests_by_order = {}
+    reserved_orders = set()
+    for request in requests:
+        requests_by_order.setdefault(request.args[0], []).append(request)
+        if request.kwargs.get("reserved"):
+            reserved_orders.add(request.args[0])
+
+    groups = group_by_product(tuple(request.args) for request in requests)
+
+    db = SessionLocal()
+    try:
+        for product_id, orders in groups.items():
             try:
-                existing = db2.query(Order).filter_by(order_id=order_id).first()
-                if not existing:
-                    order = Order(
-                        order_id=order_id,
-                        customer_id=customer_id,
-                        product_id=product_id,
-                        price_paid=0,
-                        status=OrderStatus.FAILED
+                results = settle(db, product_id, orders)
+            except Exception as e:
+                # Hand the group back to the single-order path, which has
+                # retries and per-order failure handling
+                db.rollback()
+                logger.error(
+                    f"{kind} settlement failed for product {product_id}: {e}, "
+                    f"re-dispatching {len(orders)} orders individually"
+                )
+                for order_id, customer_id in orders:
+                    process_order.delay(
+                        order_id,
+                        product_id,
+                        customer_id,
+                        reserved=order_id in reserved_orders,
                     )
-                    db2.add(order)
-                else:
-                    existing.status = OrderStatus.FAILED
-                db2.commit()
-            finally:
-                db2.close()
-        except Exception:
-            pass
-        
-        return {
-            "order_id": order_id,
-            "status": "FAILED",
-            "reason": f"Unexpected error: {str(e)}"
-        }
-        
+                continue
+
+            for order_id, result in results.items():
+                for request in requests_by_order.get(order_id, []):
+                    celery_app.backend.mark_as_done(request.id, result, request=request)
+            complete_group(product_id, orders, results, reserved_orders)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="orders.reconcile_stock_reservations")
+def reconcile_stock_reservations() -> int:
+    """Periodically repair drift between Redis stock counters and MySQL."""
+    from src.database.core import SessionLocal
+    from src.modules.interface.products import ProductsInterface
+
+    db = SessionLocal()
+    try:
+        return ProductsInterface.reconcile_reservations(
+            db, config.STOCK_RESERVATION_MAX_AGE_SECONDS
+        )
+    finally:
+        db.close()
+
+
+if config.STOCK_RESERVATION_ENABLED:
+    celery_app.conf.beat_schedule["reconcile-stock-reservations"] = {
+        "task": "orders.reconcile_stock_reservations",
+        "schedule": config.STOCK_RESERVATION_RECONCILE_SECONDS,
+    }
+
+
+@celery_app.task(name="products.rollup_sharded_stock")
+def rollup_sharded_stock() -> int:
+    """Refresh the products.stock aggregate of sharded products from their shards."""
+    from src.database.core import SessionLocal
+    from src.modules.interface.products import ProductsInterface
+
+    db = SessionLocal()
+    try:
+        changed = ProductsInterface.rollup_sharded_stock(db)
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+    if config.PRODUCT_INVALIDATION_ENABLED:
+        ProductsInterface.publish_product_changed(*changed)
+    return len(changed)
+
+
+@celery_app.task(name="orders.rebuild_id_filters")
+def rebuild_id_filters() -> dict:
+    """Rebuild the product and customer id Bloom filters from the tables."""
+    from src.database.core import SessionLocal
+    from src.modules.interface.customer import CustomerInterface
+    from src.modules.interface.products import ProductsInterface
+
+    db = SessionLocal()
+    try:
+        products = ProductsInterface.rebuild_id_filter(db)
+        customers = CustomerInterface.rebuild_id_filter(db)
+    finally:
+        db.close()
+    logger.info(f"Rebuilt id filters: {products} products, {customers} customers")
+    return {"products": products, "customers": customers}
+
+
+@setup_logging.connect
+def configure_worker_logging(loglevel=None, **kwargs):
+    # Replaces Celery's synchronous stderr handlers with the queue pipeline
+    from src.core.logging import LogLevels, configure_logging
+
+    configure_logging(LogLevels(loglevel or logging.INFO))
+
+
+if config.ID_FILTER_ENABLED:
+    celery_app.conf.beat_schedule["rebuild-id-filters"] = {
+        "task": "orders.rebuild_id_filters",
+        "schedule": config.ID_FILTER_REBUILD_SECONDS,
+    }
+
+    @worker_ready.connect
+    def build_id_filters(sender=None, **kwargs):
+        # Until the first build the filters accept every id
+        rebuild_id_filters.delay()
+
+
+if config.SHARDED_STOCK_ENABLED:
+    celery_app.conf.beat_schedule["rollup-sharded-stock"] = {
+        "task": "products.rollup_sharded_stock",
+        "schedule": config.SHARDED_STOCK_ROLLUP_SECONDS,
+    }
+
+
+if config.TRACING_ENABLED:
+
+    @worker_init.connect
+    def start_tracing(sender=None, **kwargs):
+        # Before the pool starts, so prefork children inherit the provider
+        from src.core import tracing
+
+        tracing.configure("ecommerce-worker")
+
+
+if config.METRICS_ENABLED:
+
+    @before_task_publish.connect
+    def stamp_enqueue_time(headers=None, **kwargs):
+        # Read back as task.request.enqueued_at for order_queue_seconds
+        headers.setdefault("enqueued_at", time.time())
+
+    @worker_init.connect
+    def serve_metrics(sender=None, **kwargs):
+        from src.core import metrics
+
+        try:
+            metrics.start_http_server(config.WORKER_METRICS_PORT)
+        except OSError as e:
+            # Workers on one host share the multiprocess directory, so the
+            # first one to bind the port serves them all
+            logger.info(f"Worker metrics port {config.WORKER_METRICS_PORT} not bound: {e}")
+
+    @worker_process_shutdown.connect
+    def drop_process_metrics(pid=None, **kwargs):
+        from src.core import metrics
+
+        metrics.mark_process_dead(pid)
+
+
+if config.PROFILER_ENABLED:
+    from celery.worker.control import control_command, nok, ok
+
+    from src.core import profiler
+
+    @worker_init.connect
+    @worker_process_init.connect
+    def install_profiler(sender=None, **kwargs):
+        profiler.install_signal_handler("worker")
+
+    @task_prerun.connect
+    def label_profiled_task(task=None, **kwargs):
+        profiler.label_thread(task.name)
+
+    @task_postrun.connect
+    def unlabel_profiled_task(**kwargs):
+        profiler.unlabel_thread()
+
+    @control_command(args=[("seconds", float)], signature="[seconds]")
+    def profile(state, seconds=None):
+        """Profile the pool for a bounded window (see core/profiler.py)."""
+        # Runs in the main process; prefork children are reached by signal
+        # and profile for PROFILER_SECONDS
+        children = [
+            pid
+            for pid in state.consumer.pool.info.get("processes", [])
+            if pid != os.getpid()
+        ]
+        if children:
+            for pid in children:
+                os.kill(pid, signal.SIGUSR2)
+            return ok(f"profiling pool processes {children} into {config.PROFILER_DIR}")
+        session = profiler.profiler.start(seconds)
+        if session is None:
+            return nok("a profile is already running")
+        return ok(f"profiling into {session.path}")
@@ -0,0 +1,100 @@
+"""
+Order dispatch: picks the transport (ORDER_TRANSPORT) and the worker task that
+settles an accepted order (ORDER_PROCESSING_MODE), so the API layer does not
+need to know which consumer runs.
+"""
+
+import logging
+from typing import List, Tuple
+
+from src.core import config
+
+logger = logging.getLogger(__name__)
+
+
+def dispatch_order(
+    order_id: str, product_id: str, customer_id: str, reserved: bool = False
+):
+    """Enqueue an order for settlement. Returns the message id (Celery task id
+    or stream entry id).
+
+    reserved marks orders holding a Redis stock reservation that the worker
+    has to settle or release once the order is decided.
+    """
+    if config.ORDER_TRANSPORT == "stream":
+        from src.modules.workers.streams import publish
+
+        return publish([(order_id, product_id, customer_id, reserved)])[0]
+
+    # Import at function level to avoid circular imports
+    from src.modules.workers.celery import (
+        process_order,
+        process_order_batch,
+        process_order_partition,
+    )
+    from src.modules.workers.partition import queue_for
+
+    if config.ORDER_PROCESSING_MODE == "partitioned":
+        # One queue per partition, so every order of a product meets the same writer
+        return process_order_partition.apply_async(
+            (order_id, product_id, customer_id),
+            {"reserved": reserved},
+            queue=queue_for(product_id),
+        ).id
+    if config.ORDER_PROCESSING_MODE == "batch":
+        return process_order_batch.delay(
+            order_id, product_id, customer_id, reserved=reserved
+        ).id
+    return process_order.delay(order_id, product_id, customer_id, reserved=reserved).id
+
+
+def dispatch_orders(orders: List[Tuple[str, str, str, bool]]) -> List[str]:
+    """Enqueue many orders, each as (order_id, product_id, customer_id, reserved).
+
+    All messages are published through one producer (or one stream pipeline),
+    so the broker round-trips are paid once per batch instead of once per order.
+
+    Returns the order_ids that were not enqueued. The stream pipeline is
+    all-or-nothing; Celery publishes in order and stops at the first failure,
+    so the orders before it are enqueued and every later one is returned.
+    """
+    if config.ORDER_TRANSPORT == "stream":
+        from src.modules.workers.streams import publish
+
+        try:
+            publish(orders)
+        except Exception as e:
+            logger.error(f"Failed to publish {len(orders)} orders: {e}")
+            return [order[0] for order in orders]
+        return []
+
+    from src.modules.workers.celery import (
+        celery_app,
+        process_order,
+        process_order_batch,
+        process_order_partition,
+    )
+    from src.modules.workers.partition import queue_for
+
+    partitioned = config.ORDER_PROCESSING_MODE == "partitioned"
+    if partitioned:
+        task = process_order_partition
+    elif config.ORDER_PROCESSING_MODE == "batch":
+        task = process_order_batch
+    else:
+        task = process_order
+    published = 0
+    try:
+        with celery_app.producer_or_acquire() as producer:
+            for order_id, product_id, customer_id, reserved in orders:
+                options = {"queue": queue_for(product_id)} if partitioned else {}
+                task.apply_async(
+                    (order_id, product_id, customer_id),
+                    {"reserved": reserved},
+                    producer=producer,
+                    **options,
+                )
+                published += 1
+    except Exception as e:
+        logger.error(f"Failed to publish orders after {published} of {len(orders)}: {e}")
+    return [order[0] for order in orders[published:]]
@@ -0,0 +1,228 @@
+"""
+Group commit for settlement writes (SETTLEMENT_ENGINE=group).
+
+The task threads of one worker process (`--pool threads`) hand their decided
+mutations to a shared `GroupCommitter` instead of committing themselves. A
+single writer thread collects them for up to GROUP_COMMIT_WAIT_MS or
+GROUP_COMMIT_MAX_ITEMS items, applies them in one transaction and wakes every
+waiting task with its result, so one fsync is paid per group instead of per
+order.
+
+Within the group each settlement runs the guarded UPDATEs of the conditional
+engine inside a SAVEPOINT: a failed balance check rolls back that order's
+stock decrement only. All new order rows (COMPLETED and FAILED) are written
+with one bulk INSERT.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from src.core import config
+from src.database.core import SessionLocal
+from src.entities.customer import Customer
+from src.entities.order import Order, OrderStatus
+from src.entities.product import Product
+from src.modules.interface.products import ProductsInterface
+
+logger = logging.getLogger(__name__)
+
+# Deadlocks between the groups of different worker processes are retried
+FLUSH_ATTEMPTS = 3
+
+
+class Mutation:
+    """One order's write, submitted by a task thread.
+
+    settle=True applies the guarded stock/balance updates and records the
+    outcome; settle=False only records a FAILED order (`reason`).
+    """
+
+    __slots__ = (
+        "order_id", "product_id", "customer_id", "price", "settle", "reason",
+        "shard_count", "existing", "done", "result", "error",
+    )
+
+    def __init__(
+        self,
+        order_id: str,
+        product_id: str,
+        customer_id: str,
+        price: float,
+        settle: bool,
+        reason: Optional[str] = None,
+        shard_count: Optional[int] = None,
+        existing: bool = False,
+    ):
+        self.order_id = order_id
+        self.product_id = product_id
+        self.customer_id = customer_id
+        self.price = price
+        self.settle = settle
+        self.reason = reason
+        self.shard_count = shard_count
+        self.existing = existing
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitter:
+    def __init__(self, max_items: int, max_wait_ms: int):
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Mutation]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, mutation: Mutation) -> Dict:
+        """Queue a mutation and block until its group is committed."""
+        self._ensure_writer()
+        self._queue.put(mutation)
+        mutation.done.wait()
+        if mutation.error is not None:
+            raise mutation.error
+        return mutation.result
+
+    def _ensure_writer(self) -> None:
+        # Started lazily per process: prefork children do not inherit threads
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(
+                    target=self._run, name="group-commit", daemon=True
+                ).start()
+                self._pid = os.getpid()
+
+    def _run(self) -> None:
+        pending = self._queue
+        while True:
+            group = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(group) < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    group.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(group)
+
+    def _flush(self, group: List[Mutation]) -> None:
+        # Stable product order keeps lock acquisition consistent across groups
+        ordered = sorted(group, key=lambda m: m.product_id)
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            db = SessionLocal()
+            try:
+                results = _apply(db, ordered)
+                db.commit()
+                for mutation in group:
+                    mutation.result = results[mutation.order_id]
+                logger.info("Group committed %s orders", len(group))
+                break
+            except OperationalError as e:
+                db.rollback()
+                if attempt < FLUSH_ATTEMPTS:
+                    logger.warning(f"Group commit of {len(group)} orders retried: {e}")
+                    continue
+                _fail(group, e)
+            except Exception as e:
+                db.rollback()
+                _fail(group, e)
+                break
+            finally:
+                db.close()
+        for mutation in group:
+            mutation.done.set()
+
+
+def _fail(group: List[Mutation], error: BaseException) -> None:
+    logger.error(f"Group commit of {len(group)} orders failed: {error}")
+    for mutation in group:
+        mutation.error = error
+
+
+def _apply(db, group: List[Mutation]) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    new_rows = []
+    for m in group:
+        if m.order_id in results:
+            # Redelivered duplicate inside the same group
+            continue
+        status, result = OrderStatus.FAILED, None
+        if not m.settle:
+            result = {"order_id": m.order_id, "status": "FAILED", "reason": m.reason}
+        else:
+            savepoint = db.begin_nested()
+            if m.shard_count:
+                in_stock = ProductsInterface.take_from_stock_shard(
+                    db, m.product_id, m.shard_count
+                )
+            else:
+                in_stock = (
+                    db.query(Product)
+                    .filter(Product.id == m.product_id, Product.stock > 0)
+                    .update({Product.stock: Product.stock - 1}, synchronize_session=False)
+                    == 1
+                )
+            paid = in_stock and (
+                db.query(Customer)
+                .filter(
+                    Customer.customer_id == m.customer_id,
+                    Customer.wallet_balance >= m.price,
+                )
+                .update(
+                    {Customer.wallet_balance: Customer.wallet_balance - m.price},
+                    synchronize_session=False,
+                )
+                == 1
+            )
+            if paid:
+                savepoint.commit()
+                status = OrderStatus.COMPLETED
+                result = {
+                    "order_id": m.order_id,
+                    "status": "COMPLETED",
+                    "price_paid": float(m.price),
+                }
+            else:
+                savepoint.rollback()
+                reason = (
+                    f"Insufficient balance for customer {m.customer_id}"
+                    if in_stock
+                    else f"Insufficient stock for product {m.product_id}"
+                )
+                result = {"order_id": m.order_id, "status": "FAILED", "reason": reason}
+
+        if m.existing:
+            db.query(Order).filter(Order.order_id == m.order_id).update(
+                {Order.status: status, Order.price_paid: m.price},
+                synchronize_session=False,
+            )
+        else:
+            new_rows.append(
+                {
+                    "order_id": m.order_id,
+                    "customer_id": m.customer_id,
+                    "product_id": m.product_id,
+                    "price_paid": m.price,
+                    "status": status,
+                }
+            )
+        results[m.order_id] = result
+
+    if new_rows:
+        db.execute(insert(Order), new_rows)
+    return results
+
+
+committer = GroupCommitter(config.GROUP_COMMIT_MAX_ITEMS, config.GROUP_COMMIT_WAIT_MS)
@@ -0,0 +1,244 @@
+"""
+Per-product single-writer settlement (ORDER_PROCESSING_MODE=partitioned).
+
+Orders are routed by a hash of product_id to one of ORDER_PARTITIONS queues
+(`orders.p{n}`), and each queue is drained by exactly one batch consumer
+(`start.sh` runs one `--concurrency=1` worker per partition). A product
+therefore has a single writer, which keeps the product's stock counter in
+memory and decides COMPLETED/FAILED without locking the product row:
+
+- The counter is loaded from MySQL the first time the partition sees the
+  product, and re-read once per batch before an order is failed for stock, so
+  restocks and cancellations made elsewhere are picked up.
+- Customers are shared between partitions and are still locked
+  (FOR UPDATE, sorted) for the balance checks.
+- The stock taken by a batch is persisted with one guarded
+  `UPDATE ... SET stock = stock - n WHERE stock >= n` in the same transaction
+  as the bulk INSERT of the order rows. If the guard fails another writer
+  touched the row: the counter is dropped and the batch is retried through
+  the single-order path.
+
+The counter only changes after a successful commit, and a worker that dies
+before its commit gets the batch redelivered (acks_late), so recovery is a
+reload from MySQL; redelivered orders that were already committed are
+answered from their order rows.
+
+Sharded products keep their stock in shards and are settled by the batch
+engine (`settle_product_group`) instead.
+"""
+
+import logging
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.core import config
+from src.entities.customer import Customer
+from src.entities.order import Order, OrderStatus
+from src.entities.product import Product
+from src.modules.interface.products import ProductsInterface
+from .batch import _completed, _failed, settle_product_group
+
+logger = logging.getLogger(__name__)
+
+QUEUE = "orders.p{}"
+
+
+def partition_for(product_id: str) -> int:
+    """Stable partition of a product (crc32, identical in every process)."""
+    return zlib.crc32(product_id.encode("utf-8")) % config.ORDER_PARTITIONS
+
+
+def queue_for(product_id: str) -> str:
+    return QUEUE.format(partition_for(product_id))
+
+
+class StockConflict(Exception):
+    """The product row changed under the partition's counter."""
+
+
+class _Book:
+    """In-memory state of one product owned by this partition."""
+
+    __slots__ = ("product", "stock")
+
+    def __init__(self, product: Product):
+        # Detached copy: pricing fields only, stock is tracked in `stock`
+        self.product = Product(
+            id=product.id,
+            name=product.name,
+            description=product.description,
+            base_price=product.base_price,
+            stock=product.stock,
+            initial_stock=product.initial_stock,
+        )
+        self.stock = product.stock
+
+
+class PartitionSettler:
+    def __init__(self):
+        self.books: Dict[str, _Book] = {}
+
+    def settle(
+        self, db: Session, product_id: str, orders: List[Tuple[str, str]]
+    ) -> Dict[str, Dict]:
+        """
+        Settle one product's orders and commit. Results follow the same
+        contract and failure reasons as `settle_product_group`.
+        """
+        try:
+            results, book, stock = self._settle(db, product_id, orders)
+            db.commit()
+        except Exception:
+            self.books.pop(product_id, None)
+            raise
+        if book is not None:
+            book.stock = stock
+        return results
+
+    def _settle(self, db: Session, product_id: str, orders: List[Tuple[str, str]]):
+        book = self.books.get(product_id)
+        if book is None:
+            if config.SHARDED_STOCK_ENABLED and ProductsInterface.get_sharded_stock(
+                db, product_id
+            ) is not None:
+                return settle_product_group(db, product_id, orders), None, None
+            product = db.query(Product).filter(Product.id == product_id).first()
+            if product is not None:
+                book = self.books[product_id] = _Book(product)
+
+        order_ids = [order_id for order_id, _ in orders]
+        existing = {
+            o.order_id: o
+            for o in db.query(Order).filter(Order.order_id.in_(order_ids)).all()
+        }
+
+        results: Dict[str, Dict] = {}
+        pending: List[Tuple[str, str]] = []
+        for order_id, customer_id in orders:
+            existing_order = existing.get(order_id)
+            if existing_order is not None:
+                if existing_order.status == OrderStatus.COMPLETED:
+                    logger.info("Order %s already completed", order_id)
+                    results[order_id] = _completed(order_id, existing_order.price_paid)
+                    continue
+                if existing_order.status == OrderStatus.FAILED:
+                    logger.info("Order %s already failed", order_id)
+                    results[order_id] = _failed(order_id, "Previously failed")
+                    continue
+            pending.append((order_id, customer_id))
+
+        if not pending:
+            return results, book, book.stock if book else None
+
+        new_rows: List[Dict] = []
+
+        def record(order_id, customer_id, price, status, update_existing=True):
+            existing_order = existing.get(order_id)
+            if existing_order is None:
+                new_rows.append(
+                    {
+                        "order_id": order_id,
+                        "customer_id": customer_id,
+                        "product_id": product_id,
+                        "price_paid": price,
+                        "status": status,
+                    }
+                )
+            elif update_existing:
+                existing_order.status = status
+                existing_order.price_paid = price
+
+        if book is None:
+            for order_id, customer_id in pending:
+                record(order_id, customer_id, 0, OrderStatus.FAILED, update_existing=False)
+                results[order_id] = _failed(order_id, f"Product {product_id} not found")
+            if new_rows:
+                db.execute(insert(Order), new_rows)
+            return results, None, None
+
+        # Customers are not partitioned: lock them in a deterministic order
+        customer_ids = sorted({customer_id for _, customer_id in pending})
+        customers = {
+            c.customer_id: c
+            for c in db.query(Customer)
+            .filter(Customer.customer_id.in_(customer_ids))
+            .order_by(Customer.customer_id)
+            .with_for_update()
+            .all()
+        }
+
+        available = book.stock
+        taken = 0
+        reloaded = False
+        for order_id, customer_id in pending:
+            if available <= 0 and not reloaded:
+                reloaded = True
+                available = self._reload_stock(db, product_id) - taken
+
+            price = ProductsInterface.get_dynamic_price_for(book.product, stock=available)
+            if price is None or price <= 0:
+                record(order_id, customer_id, 0, OrderStatus.FAILED, update_existing=False)
+                results[order_id] = _failed(
+                    order_id, f"Invalid price for product {product_id}"
+                )
+                continue
+
+            customer = customers.get(customer_id)
+            if not customer:
+                record(
+                    order_id, customer_id, price, OrderStatus.FAILED, update_existing=False
+                )
+                results[order_id] = _failed(order_id, f"Customer {customer_id} not found")
+                continue
+
+            if available <= 0:
+                record(order_id, customer_id, price, OrderStatus.FAILED)
+                results[order_id] = _failed(
+                    order_id, f"Insufficient stock for product {product_id}"
+                )
+                continue
+
+            if customer.wallet_balance < price:
+                record(order_id, customer_id, price, OrderStatus.FAILED)
+                results[order_id] = _failed(
+                    order_id, f"Insufficient balance for customer {customer_id}"
+                )
+                continue
+
+            available -= 1
+            taken += 1
+            customer.wallet_balance -= price
+            record(order_id, customer_id, price, OrderStatus.COMPLETED)
+            results[order_id] = _completed(order_id, price)
+
+        if taken:
+            persisted = (
+                db.query(Product)
+                .filter(Product.id == product_id, Product.stock >= taken)
+                .update({Product.stock: Product.stock - taken}, synchronize_session=False)
+            )
+            if persisted != 1:
+                raise StockConflict(
+                    f"Stock of product {product_id} changed outside partition "
+                    f"{partition_for(product_id)}"
+                )
+        if new_rows:
+            db.execute(insert(Order), new_rows)
+
+        logger.info(
+            "Partition settled %s orders for product %s: %s completed, %s failed",
+            len(pending), product_id, taken, len(pending) - taken,
+        )
+        return results, book, available
+
+    def _reload_stock(self, db: Session, product_id: str) -> int:
+        stock: Optional[int] = (
+            db.query(Product.stock).filter(Product.id == product_id).scalar()
+        )
+        return stock or 0
+
+
+settler = PartitionSettler()
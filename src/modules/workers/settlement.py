@@ -0,0 +1,514 @@
+"""
+Order settlement engines.
+
+Every engine decides and persists one order inside the given session and
+returns the task result dict. Business failures raise ValueError after the
+FAILED order has been committed; `settle_order` turns them into the FAILED
+result, lets SQLAlchemy errors propagate for the task's retry policy and
+records unexpected errors as FAILED.
+
+- locking:     SELECT ... FOR UPDATE on product and customer, checks in Python
+- conditional: guarded single-statement UPDATEs, success read from rowcount
+- group:       conditional checks, but writes are handed to the process-wide
+               group committer (group_commit.py) and committed with others
+
+Engines report how long each of their phases took through `phase_hook`: into
+order_settle_phase_seconds with METRICS_ENABLED, or to the in-process
+benchmark (tests/bench_process_order.py).
+"""
+
+import time
+from typing import Callable, Dict, Optional
+
+from celery.utils.log import get_task_logger
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core import config
+from src.database.core import SessionLocal
+from src.entities.customer import Customer
+from src.entities.order import Order, OrderStatus
+from src.entities.product import Product
+from src.modules.interface.products import ProductsInterface
+
+logger = get_task_logger(__name__)
+
+# hook(phase, seconds), called from the settling thread; "session_open" covers
+# the pool checkout and the idempotency lookup, the session's first statement
+phase_hook: Optional[Callable[[str, float], None]] = None
+if config.METRICS_ENABLED:
+    from src.core import metrics
+
+    phase_hook = metrics.settle_phase_hook(config.SETTLEMENT_ENGINE)
+
+
+def _phase(name: str, started: float) -> float:
+    """Report the phase that began at `started`; returns when it ended."""
+    now = time.perf_counter()
+    if phase_hook is not None:
+        phase_hook(name, now - started)
+    return now
+
+
+def settle_order(
+    order_id: str, product_id: str, customer_id: str, engine: str | None = None
+) -> Dict:
+    """Settle one order in its own session with the configured (or given) engine."""
+    settle = ENGINES[engine or config.SETTLEMENT_ENGINE]
+    db = SessionLocal()
+
+    try:
+        return settle(db, order_id, product_id, customer_id)
+
+    except ValueError as e:
+        # Business logic failures - order should already be saved as FAILED
+        error_msg = str(e)
+        logger.warning("Order %s processing failed: %s", order_id, error_msg)
+
+        return {
+            "order_id": order_id,
+            "status": "FAILED",
+            "reason": error_msg
+        }
+
+    except SQLAlchemyError as e:
+        # Database errors - retry
+        db.rollback()
+        logger.error(f"Database error processing order {order_id}: {e}, will retry")
+        raise
+
+    except Exception as e:
+        # Unexpected errors - try to save as failed
+        db.rollback()
+        logger.error(f"Unexpected error processing order {order_id}: {e}")
+
+        try:
+            db2 = SessionLocal()
+            try:
+                existing = db2.query(Order).filter_by(order_id=order_id).first()
+                if not existing:
+                    order = Order(
+                        order_id=order_id,
+                        customer_id=customer_id,
+                        product_id=product_id,
+                        price_paid=0,
+                        status=OrderStatus.FAILED
+                    )
+                    db2.add(order)
+                else:
+                    existing.status = OrderStatus.FAILED
+                db2.commit()
+            finally:
+                db2.close()
+        except Exception:
+            pass
+
+        return {
+            "order_id": order_id,
+            "status": "FAILED",
+            "reason": f"Unexpected error: {str(e)}"
+        }
+
+    finally:
+        db.close()
+
+
+def _settle_locking(db, order_id: str, product_id: str, customer_id: str) -> Dict:
+    """
+    Process order with proper locking to ensure exactly one succeeds when stock=1.
+    All orders (success or failure) are saved to the database.
+    """
+    # Check if order already exists (idempotency)
+    started = time.perf_counter()
+    existing_order = db.query(Order).filter_by(order_id=order_id).first()
+    started = _phase("session_open", started)
+    if existing_order:
+        if existing_order.status == OrderStatus.COMPLETED:
+            logger.info("Order %s already completed", order_id)
+            return {
+                "order_id": order_id,
+                "status": "COMPLETED",
+                "price_paid": float(existing_order.price_paid)
+            }
+        elif existing_order.status == OrderStatus.FAILED:
+            logger.info("Order %s already failed", order_id)
+            return {
+                "order_id": order_id,
+                "status": "FAILED",
+                "reason": "Previously failed"
+            }
+
+    # Sharded products keep their stock in product_stock_shards: the product
+    # row is only read and a single shard is locked when stock is taken
+    sharded = (
+        ProductsInterface.get_sharded_stock(db, product_id)
+        if config.SHARDED_STOCK_ENABLED
+        else None
+    )
+
+    # CRITICAL: Lock product row FIRST to prevent race conditions
+    product_query = db.query(Product).filter(Product.id == product_id)
+    if sharded is None:
+        product_query = product_query.with_for_update()  # Pessimistic lock - only one worker can hold this
+    product = product_query.first()
+    started = _phase("product_lock", started)
+
+    if not product:
+        # Create failed order for product not found
+        if not existing_order:
+            order = Order(
+                order_id=order_id,
+                customer_id=customer_id,
+                product_id=product_id,
+                price_paid=0,
+                status=OrderStatus.FAILED
+            )
+            db.add(order)
+            db.commit()
+        raise ValueError(f"Product {product_id} not found")
+
+    # Calculate price first (needed for order record)
+    if sharded is not None:
+        price = ProductsInterface.get_dynamic_price_for(product, stock=sharded[1])
+    else:
+        price = ProductsInterface.get_dynamic_price(db, product_id)
+    started = _phase("price", started)
+    if price is None or price <= 0:
+        # Create failed order for invalid price
+        if not existing_order:
+            order = Order(
+                order_id=order_id,
+                customer_id=customer_id,
+                product_id=product_id,
+                price_paid=0,
+                status=OrderStatus.FAILED
+            )
+            db.add(order)
+            db.commit()
+        raise ValueError(f"Invalid price for product {product_id}")
+
+    # Get customer with lock
+    customer = db.query(Customer).filter(
+        Customer.customer_id == customer_id
+    ).with_for_update().first()
+    started = _phase("customer_lock", started)
+
+    if not customer:
+        # Create failed order for customer not found
+        if not existing_order:
+            order = Order(
+                order_id=order_id,
+                customer_id=customer_id,
+                product_id=product_id,
+                price_paid=price,
+                status=OrderStatus.FAILED
+            )
+            db.add(order)
+            db.commit()
+        raise ValueError(f"Customer {customer_id} not found")
+
+    # Create or update order to PENDING first
+    if not existing_order:
+        order = Order(
+            order_id=order_id,
+            customer_id=customer_id,
+            product_id=product_id,
+            price_paid=price,
+            status=OrderStatus.PENDING
+        )
+        db.add(order)
+        db.flush()  # Make order visible in this transaction but don't commit yet
+    else:
+        existing_order.status = OrderStatus.PENDING
+        existing_order.price_paid = price
+        order = existing_order
+
+    # NOW check stock AFTER creating the order and acquiring lock
+    shard = None
+    if sharded is not None:
+        shard = ProductsInterface.acquire_stock_shard(db, product_id, sharded[0])
+        in_stock = shard is not None
+    else:
+        in_stock = product.stock > 0
+
+    if not in_stock:
+        # Mark order as FAILED due to insufficient stock
+        order.status = OrderStatus.FAILED
+        db.commit()
+        logger.warning("Order %s FAILED: Insufficient stock", order_id)
+        raise ValueError(f"Insufficient stock for product {product_id}")
+
+    # Check customer balance
+    if customer.wallet_balance < price:
+        # Mark order as FAILED due to insufficient balance
+        order.status = OrderStatus.FAILED
+        db.commit()
+        logger.warning("Order %s FAILED: Insufficient balance", order_id)
+        raise ValueError(f"Insufficient balance for customer {customer_id}")
+
+    # All validations passed - execute the transaction
+
+    # Decrease stock atomically
+    if shard is not None:
+        shard.stock -= 1
+    else:
+        product.stock -= 1
+
+    # Decrease customer balance atomically
+    customer.wallet_balance -= price
+
+    # Mark order as completed
+    order.status = OrderStatus.COMPLETED
+    started = _phase("write", started)
+
+    # SINGLE COMMIT for all changes
+    db.commit()
+    _phase("commit", started)
+
+    logger.info("Order %s COMPLETED successfully", order_id)
+
+    return {
+        "order_id": order_id,
+        "status": "COMPLETED",
+        "price_paid": float(price)
+    }
+
+
+def _record_order(
+    db, existing_order, order_id, customer_id, product_id, price, status
+) -> None:
+    """Insert the order row, or update the row left behind by an earlier attempt."""
+    if existing_order is None:
+        db.add(
+            Order(
+                order_id=order_id,
+                customer_id=customer_id,
+                product_id=product_id,
+                price_paid=price,
+                status=status,
+            )
+        )
+    else:
+        existing_order.status = status
+        existing_order.price_paid = price
+
+
+def _settle_conditional(
+    db, order_id: str, product_id: str, customer_id: str
+) -> Dict:
+    """
+    Settle an order with guarded single-statement UPDATEs instead of FOR UPDATE:
+
+        UPDATE products  SET stock = stock - 1 WHERE product_id = ? AND stock > 0
+        UPDATE customers SET wallet_balance = wallet_balance - ?
+                         WHERE customer_id = ? AND wallet_balance >= ?
+
+    Success is read from the rowcount, so row locks are only held between the
+    UPDATE and the commit. The price is computed from a plain (unlocked) read
+    of the stock, the same value a concurrent locking worker would have priced
+    from just before its turn.
+    """
+    # Check if order already exists (idempotency)
+    started = time.perf_counter()
+    existing_order = db.query(Order).filter_by(order_id=order_id).first()
+    started = _phase("session_open", started)
+    if existing_order:
+        if existing_order.status == OrderStatus.COMPLETED:
+            logger.info("Order %s already completed", order_id)
+            return {
+                "order_id": order_id,
+                "status": "COMPLETED",
+                "price_paid": float(existing_order.price_paid),
+            }
+        elif existing_order.status == OrderStatus.FAILED:
+            logger.info("Order %s already failed", order_id)
+            return {
+                "order_id": order_id,
+                "status": "FAILED",
+                "reason": "Previously failed",
+            }
+
+    product = db.query(Product).filter(Product.id == product_id).first()
+    started = _phase("product_read", started)
+    if not product:
+        if not existing_order:
+            _record_order(
+                db, None, order_id, customer_id, product_id, 0, OrderStatus.FAILED
+            )
+            db.commit()
+        raise ValueError(f"Product {product_id} not found")
+
+    sharded = (
+        ProductsInterface.get_sharded_stock(db, product_id)
+        if config.SHARDED_STOCK_ENABLED
+        else None
+    )
+    if sharded is not None:
+        price = ProductsInterface.get_dynamic_price_for(product, stock=sharded[1])
+    else:
+        price = ProductsInterface.get_dynamic_price_for(product)
+    started = _phase("price", started)
+    if price is None or price <= 0:
+        if not existing_order:
+            _record_order(
+                db, None, order_id, customer_id, product_id, 0, OrderStatus.FAILED
+            )
+            db.commit()
+        raise ValueError(f"Invalid price for product {product_id}")
+
+    customer_exists = (
+        db.query(Customer.customer_id)
+        .filter(Customer.customer_id == customer_id)
+        .first()
+    )
+    started = _phase("customer_read", started)
+    if not customer_exists:
+        if not existing_order:
+            _record_order(
+                db, None, order_id, customer_id, product_id, price, OrderStatus.FAILED
+            )
+            db.commit()
+        raise ValueError(f"Customer {customer_id} not found")
+
+    # Guarded stock decrement
+    if sharded is not None:
+        in_stock = ProductsInterface.take_from_stock_shard(db, product_id, sharded[0])
+    else:
+        in_stock = (
+            db.query(Product)
+            .filter(Product.id == product_id, Product.stock > 0)
+            .update({Product.stock: Product.stock - 1}, synchronize_session=False)
+            == 1
+        )
+    started = _phase("stock_update", started)
+    if not in_stock:
+        _record_order(
+            db, existing_order, order_id, customer_id, product_id, price,
+            OrderStatus.FAILED,
+        )
+        db.commit()
+        logger.warning("Order %s FAILED: Insufficient stock", order_id)
+        raise ValueError(f"Insufficient stock for product {product_id}")
+
+    # Guarded balance decrement
+    paid = (
+        db.query(Customer)
+        .filter(Customer.customer_id == customer_id, Customer.wallet_balance >= price)
+        .update(
+            {Customer.wallet_balance: Customer.wallet_balance - price},
+            synchronize_session=False,
+        )
+        == 1
+    )
+    started = _phase("balance_update", started)
+    if not paid:
+        # Give the unit back by discarding the stock decrement
+        db.rollback()
+        _record_order(
+            db, existing_order, order_id, customer_id, product_id, price,
+            OrderStatus.FAILED,
+        )
+        db.commit()
+        logger.warning("Order %s FAILED: Insufficient balance", order_id)
+        raise ValueError(f"Insufficient balance for customer {customer_id}")
+
+    _record_order(
+        db, existing_order, order_id, customer_id, product_id, price,
+        OrderStatus.COMPLETED,
+    )
+    db.commit()
+    _phase("commit", started)
+
+    logger.info("Order %s COMPLETED successfully", order_id)
+
+    return {"order_id": order_id, "status": "COMPLETED", "price_paid": float(price)}
+
+
+def _settle_grouped(db, order_id: str, product_id: str, customer_id: str) -> Dict:
+    """
+    Decide with plain reads in the task thread, then submit the writes to the
+    group committer and wait for the shared commit. Result contract and failure
+    reasons match the conditional engine.
+    """
+    from src.modules.workers.group_commit import Mutation, committer
+
+    # Check if order already exists (idempotency)
+    started = time.perf_counter()
+    existing_order = db.query(Order).filter_by(order_id=order_id).first()
+    started = _phase("session_open", started)
+    if existing_order:
+        if existing_order.status == OrderStatus.COMPLETED:
+            logger.info("Order %s already completed", order_id)
+            return {
+                "order_id": order_id,
+                "status": "COMPLETED",
+                "price_paid": float(existing_order.price_paid),
+            }
+        elif existing_order.status == OrderStatus.FAILED:
+            logger.info("Order %s already failed", order_id)
+            return {
+                "order_id": order_id,
+                "status": "FAILED",
+                "reason": "Previously failed",
+            }
+
+    def fail(price: float, reason: str) -> Dict:
+        db.rollback()
+        result = committer.submit(
+            Mutation(
+                order_id, product_id, customer_id, price,
+                settle=False, reason=reason, existing=existing_order is not None,
+            )
+        )
+        raise ValueError(result["reason"])
+
+    product = db.query(Product).filter(Product.id == product_id).first()
+    started = _phase("product_read", started)
+    if not product:
+        fail(0, f"Product {product_id} not found")
+
+    sharded = (
+        ProductsInterface.get_sharded_stock(db, product_id)
+        if config.SHARDED_STOCK_ENABLED
+        else None
+    )
+    if sharded is not None:
+        price = ProductsInterface.get_dynamic_price_for(product, stock=sharded[1])
+    else:
+        price = ProductsInterface.get_dynamic_price_for(product)
+    started = _phase("price", started)
+    if price is None or price <= 0:
+        fail(0, f"Invalid price for product {product_id}")
+
+    customer_exists = (
+        db.query(Customer.customer_id)
+        .filter(Customer.customer_id == customer_id)
+        .first()
+    )
+    started = _phase("customer_read", started)
+    if not customer_exists:
+        fail(price, f"Customer {customer_id} not found")
+
+    # Waiting on the group never holds this session's read snapshot
+    db.rollback()
+    result = committer.submit(
+        Mutation(
+            order_id, product_id, customer_id, price,
+            settle=True,
+            shard_count=sharded[0] if sharded is not None else None,
+            existing=existing_order is not None,
+        )
+    )
+    _phase("group_commit", started)
+    if result["status"] == "FAILED":
+        logger.warning("Order %s FAILED: %s", order_id, result["reason"])
+        raise ValueError(result["reason"])
+
+    logger.info("Order %s COMPLETED successfully", order_id)
+    return result
+
+
+ENGINES = {
+    "locking": _settle_locking,
+    "conditional": _settle_conditional,
+    "group": _settle_grouped,
+}
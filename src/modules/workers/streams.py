@@ -0,0 +1,318 @@
+"""
+Redis Streams order transport (ORDER_TRANSPORT=stream).
+
+A lean alternative to Celery for the order write path. `publish` appends one
+compact entry per order to ORDER_STREAM_KEY with a pipelined XADD: no task
+envelope, no result backend. Settlement consumers (`python -m
+src.modules.workers.streams`, started by `start.sh`) share the consumer group
+ORDER_STREAM_GROUP and per loop:
+
+- reclaim entries left pending by a crashed consumer for longer than
+  ORDER_STREAM_CLAIM_IDLE_MS (XAUTOCLAIM); entries already delivered
+  ORDER_STREAM_MAX_DELIVERIES times are recorded as FAILED, copied to
+  ORDER_STREAM_DEAD_LETTER_KEY and acknowledged instead
+- read up to ORDER_STREAM_BATCH new entries with one XREADGROUP
+- settle them per product group with the batch engine (`settle_product_group`)
+- XACK and XDEL the settled entries in one pipeline
+
+Delivery is at-least-once: an entry is only acknowledged after its outcome is
+committed, and a redelivered order is answered from its existing order row,
+the same idempotency check the Celery tasks rely on.
+"""
+
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError, ResponseError
+
+from src.core import config
+from src.database.redis import r
+
+if config.METRICS_ENABLED:
+    from src.core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def publish(orders: List[Tuple[str, str, str, bool]]) -> List[str]:
+    """Append (order_id, product_id, customer_id, reserved) orders in one round-trip.
+
+    Returns the stream entry ids in order. The entries are appended in one
+    MULTI/EXEC, so a failed call appended none of them.
+    """
+    pipe = r.pipeline(transaction=True)
+    for order_id, product_id, customer_id, reserved in orders:
+        pipe.xadd(
+            config.ORDER_STREAM_KEY,
+            {"o": order_id, "p": product_id, "c": customer_id, "r": int(reserved)},
+        )
+    return [entry_id.decode("utf-8") for entry_id in pipe.execute()]
+
+
+def _decode(fields: Dict[bytes, bytes]) -> Optional[Tuple[str, str, str, bool]]:
+    try:
+        return (
+            fields[b"o"].decode("utf-8"),
+            fields[b"p"].decode("utf-8"),
+            fields[b"c"].decode("utf-8"),
+            fields.get(b"r") == b"1",
+        )
+    except (KeyError, AttributeError):
+        return None
+
+
+def _entry_time(entry_id: bytes) -> float:
+    # Auto-generated entry ids start with the XADD time in milliseconds
+    return int(entry_id.split(b"-", 1)[0]) / 1000
+
+
+class StreamConsumer:
+    def __init__(self, name: Optional[str] = None):
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.stream = config.ORDER_STREAM_KEY
+        self.group = config.ORDER_STREAM_GROUP
+        self._running = True
+        self._next_claim = 0.0
+        # XAUTOCLAIM cursor, so entries at the head cannot starve the rest
+        self._claim_cursor = "0-0"
+
+    def ensure_group(self) -> None:
+        try:
+            r.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def stop(self, *_) -> None:
+        self._running = False
+
+    def run(self) -> None:
+        self.ensure_group()
+        logger.info("Order stream consumer %s reading %s", self.name, self.stream)
+        while self._running:
+            try:
+                entries = self._reclaim() or self._read()
+            except RedisError as e:
+                logger.error(f"Order stream read failed: {e}")
+                time.sleep(1.0)
+                continue
+            if entries:
+                try:
+                    self.handle(entries)
+                except Exception as e:
+                    # e.g. the database is down; unacknowledged entries stay
+                    # pending and are reclaimed once it is back
+                    logger.error(f"Order stream batch of {len(entries)} failed: {e}")
+                    time.sleep(1.0)
+
+    def _read(self) -> list:
+        response = r.xreadgroup(
+            self.group,
+            self.name,
+            {self.stream: ">"},
+            count=config.ORDER_STREAM_BATCH,
+            block=config.ORDER_STREAM_BLOCK_MS,
+        )
+        return response[0][1] if response else []
+
+    def _reclaim(self) -> list:
+        now = time.monotonic()
+        if now < self._next_claim:
+            return []
+        self._next_claim = now + config.ORDER_STREAM_CLAIM_IDLE_MS / 2000
+        self._claim_cursor, entries, *_ = r.xautoclaim(
+            self.stream,
+            self.group,
+            self.name,
+            min_idle_time=config.ORDER_STREAM_CLAIM_IDLE_MS,
+            count=config.ORDER_STREAM_BATCH,
+            start_id=self._claim_cursor,
+        )
+        # Entries deleted after their claim come back without fields
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries:
+            return []
+        deliveries = self._deliveries([entry_id for entry_id, _ in entries])
+        exhausted = [
+            entry
+            for entry in entries
+            if deliveries.get(entry[0], 0) > config.ORDER_STREAM_MAX_DELIVERIES
+        ]
+        if exhausted:
+            self._give_up(exhausted)
+            entries = [entry for entry in entries if entry not in exhausted]
+        if entries:
+            logger.warning("Reclaimed %s pending order stream entries", len(entries))
+        return entries
+
+    def _deliveries(self, entry_ids: list) -> Dict[bytes, int]:
+        # XAUTOCLAIM does not report delivery counts; XPENDING per entry does
+        pipe = r.pipeline(transaction=False)
+        for entry_id in entry_ids:
+            pipe.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+        return {
+            pending[0]["message_id"]: pending[0]["times_delivered"]
+            for pending in pipe.execute()
+            if pending
+        }
+
+    def _give_up(self, entries: list) -> None:
+        """Dead-letter entries that were never settled, record them as FAILED
+        and acknowledge them, as Celery does once a task is out of retries."""
+        from src.modules.workers.batch import complete_group, group_by_product
+
+        pipe = r.pipeline(transaction=False)
+        for entry_id, fields in entries:
+            pipe.xadd(config.ORDER_STREAM_DEAD_LETTER_KEY, {**fields, b"entry": entry_id})
+        pipe.execute()
+
+        # The same order may have been published twice
+        orders = {
+            order[0]: order
+            for order in map(_decode, (fields for _, fields in entries))
+            if order
+        }.values()
+        logger.error(
+            f"Giving up on {len(entries)} order stream entries after "
+            f"{config.ORDER_STREAM_MAX_DELIVERIES} deliveries"
+        )
+        reason = f"Not settled after {config.ORDER_STREAM_MAX_DELIVERIES} deliveries"
+        results = _record_failed([order[:3] for order in orders], reason)
+        reserved_orders = {order[0] for order in orders if order[3]}
+        for product_id, group in group_by_product(order[:3] for order in orders).items():
+            complete_group(
+                product_id,
+                group,
+                {order_id: results[order_id] for order_id, _ in group if order_id in results},
+                reserved_orders,
+            )
+        self._ack([entry_id for entry_id, _ in entries])
+
+    def handle(self, entries: list) -> None:
+        """Settle a batch of entries and acknowledge the ones that were decided."""
+        from src.database.core import SessionLocal
+        from src.modules.workers.batch import (
+            complete_group,
+            group_by_product,
+            settle_product_group,
+        )
+
+        done, orders, entry_ids = [], [], {}
+        reserved_orders = set()
+        for entry_id, fields in entries:
+            order = _decode(fields)
+            if order is None:
+                logger.error(f"Dropping malformed order stream entry {entry_id}")
+                done.append(entry_id)
+                continue
+            order_id, product_id, customer_id, reserved = order
+            if config.METRICS_ENABLED:
+                metrics.observe_queue_latency("stream", _entry_time(entry_id))
+            orders.append((order_id, product_id, customer_id))
+            entry_ids.setdefault(order_id, []).append(entry_id)
+            if reserved:
+                reserved_orders.add(order_id)
+
+        db = SessionLocal()
+        try:
+            for product_id, group in group_by_product(orders).items():
+                try:
+                    results = settle_product_group(db, product_id, group)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(
+                        f"Stream settlement failed for product {product_id}: {e}, "
+                        f"settling {len(group)} orders individually"
+                    )
+                    results = self._settle_each(product_id, group)
+                complete_group(product_id, group, results, reserved_orders)
+                for order_id in results:
+                    done.extend(entry_ids[order_id])
+        finally:
+            db.close()
+            self._ack(done)
+
+    def _settle_each(self, product_id: str, group: List[Tuple[str, str]]) -> Dict[str, Dict]:
+        # Database errors leave the entry pending, so it is reclaimed and retried
+        from sqlalchemy.exc import SQLAlchemyError
+        from src.modules.workers.settlement import settle_order
+
+        results = {}
+        for order_id, customer_id in group:
+            try:
+                results[order_id] = settle_order(order_id, product_id, customer_id)
+            except SQLAlchemyError:
+                continue
+        return results
+
+    def _ack(self, entry_ids: list) -> None:
+        if not entry_ids:
+            return
+        pipe = r.pipeline(transaction=False)
+        pipe.xack(self.stream, self.group, *entry_ids)
+        pipe.xdel(self.stream, *entry_ids)
+        try:
+            pipe.execute()
+        except RedisError as e:
+            # The outcomes are committed; reclaimed entries are answered from
+            # their order rows and acknowledged then
+            logger.error(f"Failed to acknowledge {len(entry_ids)} order stream entries: {e}")
+
+
+def _record_failed(orders: List[Tuple[str, str, str]], reason: str) -> Dict[str, Dict]:
+    """Write FAILED rows for orders that have none. Returns their results;
+    orders that already have a row were decided and are left out."""
+    from sqlalchemy.exc import SQLAlchemyError
+    from src.database.core import SessionLocal
+    from src.entities.order import Order, OrderStatus
+
+    results = {
+        order_id: {"order_id": order_id, "status": "FAILED", "reason": reason}
+        for order_id, _, _ in orders
+    }
+    db = SessionLocal()
+    try:
+        decided = {
+            order_id
+            for (order_id,) in db.query(Order.order_id).filter(
+                Order.order_id.in_(list(results))
+            )
+        }
+        for order_id, product_id, customer_id in orders:
+            if order_id in decided:
+                results.pop(order_id, None)
+                continue
+            db.add(
+                Order(
+                    order_id=order_id,
+                    customer_id=customer_id,
+                    product_id=product_id,
+                    price_paid=0,
+                    status=OrderStatus.FAILED,
+                )
+            )
+        db.commit()
+    except SQLAlchemyError as e:
+        # The dead-letter entry stays the record of the order
+        db.rollback()
+        logger.error(f"Failed to record {len(orders)} given-up orders as FAILED: {e}")
+    finally:
+        db.close()
+    return results
+
+
+if __name__ == "__main__":
+    from src.core.logging import LogLevels, configure_logging
+
+    configure_logging(LogLevels.info)
+    consumer = StreamConsumer()
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+    consumer.run()
+    if config.METRICS_ENABLED:
+        metrics.mark_process_dead()
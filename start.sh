@@ -1,7 +1,45 @@
 #!/bin/bash
 
+# Prometheus multiprocess mode (METRICS_ENABLED): every process below writes its
+# samples into one directory, which /metrics and the worker's port aggregate
+if [[ "${METRICS_ENABLED,,}" =~ ^(1|true|yes|on)$ ]]; then
+  export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+# Group commit (SETTLEMENT_ENGINE=group) batches the writes of concurrent task
+# threads, so the worker runs a thread pool instead of prefork processes
+WORKER_POOL_ARGS=""
+if [ "${SETTLEMENT_ENGINE:-locking}" = "group" ]; then
+  WORKER_POOL_ARGS="--pool=threads --concurrency=${GROUP_COMMIT_THREADS:-64}"
+fi
+
 # Start Celery worker in the background
-celery -A src.modules.workers.celery.celery_app worker --loglevel=info &
+# (-B runs the embedded beat scheduler for periodic maintenance tasks)
+celery -A src.modules.workers.celery.celery_app worker -B $WORKER_POOL_ARGS --loglevel=info &
+
+# Batch consumer (ORDER_PROCESSING_MODE=batch): single process that prefetches a full batch
+if [ "${ORDER_PROCESSING_MODE:-single}" = "batch" ]; then
+  celery -A src.modules.workers.celery.celery_app worker -Q orders.batch -n batch@%h \
+    --concurrency=1 --prefetch-multiplier="${ORDER_BATCH_SIZE:-200}" --loglevel=info &
+fi
+
+# Partition consumers (ORDER_PROCESSING_MODE=partitioned): exactly one single-process
+# worker per orders.p{n} queue, since each partition owns its products' stock
+if [ "${ORDER_PROCESSING_MODE:-single}" = "partitioned" ]; then
+  for ((p = 0; p < ${ORDER_PARTITIONS:-8}; p++)); do
+    celery -A src.modules.workers.celery.celery_app worker -Q "orders.p${p}" -n "p${p}@%h" \
+      --concurrency=1 --prefetch-multiplier="${ORDER_BATCH_SIZE:-200}" --loglevel=info &
+  done
+fi
+
+# Redis Streams consumers (ORDER_TRANSPORT=stream), one consumer-group member each
+if [ "${ORDER_TRANSPORT:-celery}" = "stream" ]; then
+  for ((c = 0; c < ${ORDER_STREAM_CONSUMERS:-2}; c++)); do
+    python -m src.modules.workers.streams &
+  done
+fi
 
 # Start FastAPI app using Gunicorn with UvicornWorker
-exec gunicorn src.main:app -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --workers 9
\ No newline at end of file
+exec gunicorn src.main:app -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --workers 9
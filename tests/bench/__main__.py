@@ -0,0 +1,129 @@
+"""
+End-to-end load and contention benchmark against a running stack.
+
+    PYTHONPATH=. python -m tests.bench hot_sku --duration 30 --rate 500
+    PYTHONPATH=. python -m tests.bench browse --concurrency 200 --output browse.json
+
+Seeds fresh products and customers in MySQL (DATABASE_URL), drives the API
+(BASE_URL) with the chosen scenario, waits for every submitted order to reach
+a final status, checks the stock and money invariants and prints one JSON
+document (also written to --output). Latencies are in milliseconds. Exits
+non-zero when an invariant is violated.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+from . import use_local_database
+
+use_local_database()
+
+import httpx  # noqa: E402
+
+from .driver import Context, run  # noqa: E402
+from .scenarios import SCENARIOS  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m tests.bench")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--base-url", default=os.getenv("BASE_URL", "http://localhost:8000/api/v1"))
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=100, help="max requests in flight")
+    parser.add_argument("--rate", type=float, default=None, help="arrivals per second (open loop); closed loop if omitted")
+    parser.add_argument("--poisson", action="store_true", help="Poisson instead of constant arrival spacing")
+    parser.add_argument("--products", type=int, help="override the scenario's catalog size")
+    parser.add_argument("--stock", type=int, help="override the scenario's stock per product")
+    parser.add_argument("--customers", type=int, help="override the scenario's customer count")
+    parser.add_argument("--orders", type=int, help="orders placed before the load (status_poll, cancel_storm)")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="status polling interval for time to final status")
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="seconds to wait for orders to become final")
+    parser.add_argument("--label", default="", help="free text stored in the report, e.g. the stack's settings")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    return parser.parse_args()
+
+
+def _options(args) -> dict:
+    names = ("products", "stock", "customers", "orders", "drain_timeout")
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+async def main(args) -> dict:
+    started_at = datetime.now(timezone.utc).isoformat()
+    scenario = SCENARIOS[args.scenario](_options(args))
+    scenario.seed()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 50)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        ctx = Context(client, args.base_url, args.poll_interval)
+        await scenario.prepare(ctx)
+        # Requests made while preparing are not part of the measurement
+        ctx.latency.clear()
+        ctx.statuses.clear()
+        ctx.errors.clear()
+
+        load = await run(
+            ctx, scenario.step, args.duration, args.concurrency, args.rate, args.poisson
+        )
+        drain_started = time.perf_counter()
+        unresolved = await ctx.drain(args.drain_timeout)
+        drain_seconds = time.perf_counter() - drain_started
+
+    invariants = scenario.fixture.check()
+    requests = sum(histogram.total for histogram in ctx.latency.values())
+    return {
+        "scenario": args.scenario,
+        "label": args.label,
+        "started_at": started_at,
+        "host": platform.node(),
+        "parameters": {
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "arrivals": "poisson" if args.poisson else "constant",
+            **_options(args),
+        },
+        "load": {
+            "issued": load["issued"],
+            "elapsed_s": round(load["elapsed"], 3),
+            "throughput_rps": round(requests / load["elapsed"], 1),
+        },
+        "requests": {
+            name: {
+                "throughput_rps": round(histogram.total / load["elapsed"], 1),
+                "status_codes": {
+                    str(code): count for code, count in sorted(ctx.statuses[name].items())
+                },
+                "latency_ms": histogram.summary(scale=1000),
+            }
+            for name, histogram in sorted(ctx.latency.items())
+        },
+        "errors": dict(ctx.errors),
+        "orders": {
+            "tracked": len(ctx.orders),
+            "outcomes": dict(ctx.outcomes),
+            "unresolved": unresolved,
+            "drain_s": round(drain_seconds, 3),
+            "time_to_final_ms": ctx.time_to_final.summary(scale=1000),
+            "poll_interval_ms": args.poll_interval * 1000,
+        },
+        "invariants": invariants,
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    checks = ("stock_never_negative", "stock_conserved", "money_conserved")
+    sys.exit(0 if all(report["invariants"][check]["ok"] for check in checks) else 1)
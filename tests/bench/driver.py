@@ -0,0 +1,132 @@
+"""
+Load driver: HTTP calls with latency recording and order status tracking.
+
+With a rate, arrivals are scheduled open-loop (constant or Poisson spacing)
+and latency is measured from each request's intended start, so a stalled
+server shows up as latency instead of silently lowering the offered load
+(no coordinated omission). CONCURRENCY caps requests in flight. Without a
+rate, CONCURRENCY workers run closed-loop, back to back.
+"""
+
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from .hdr import Histogram
+
+FINAL_STATUSES = {"COMPLETED", "FAILED", "CANCELLED"}
+
+
+class Context:
+    def __init__(self, client: httpx.AsyncClient, base_url: str, poll_interval: float):
+        self.client = client
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self.latency: Dict[str, Histogram] = {}
+        self.statuses: Dict[str, Counter] = {}
+        self.errors: Counter = Counter()
+        self.time_to_final = Histogram()
+        self.outcomes: Counter = Counter()
+        self.orders: Dict[str, Optional[str]] = {}
+        self._trackers = set()
+
+    async def request(
+        self, name: str, method: str, path: str, since: Optional[float] = None, **kwargs
+    ) -> Optional[httpx.Response]:
+        """Send one request, recording latency (µs) and status under `name`."""
+        start = since if since is not None else time.perf_counter()
+        try:
+            response = await self.client.request(method, self.base_url + path, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[f"{name}: {type(e).__name__}"] += 1
+            return None
+        elapsed = (time.perf_counter() - start) * 1_000_000
+        self.latency.setdefault(name, Histogram()).record(elapsed)
+        self.statuses.setdefault(name, Counter())[response.status_code] += 1
+        return response
+
+    def track(self, order_id: str, submitted: float) -> None:
+        """Poll the order until it is final and record its time to final status."""
+        self.orders[order_id] = None
+        task = asyncio.get_running_loop().create_task(self._track(order_id, submitted))
+        self._trackers.add(task)
+        task.add_done_callback(self._trackers.discard)
+
+    async def _track(self, order_id: str, submitted: float) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                response = await self.client.get(f"{self.base_url}/orders/{order_id}")
+            except httpx.HTTPError:
+                continue
+            # 404 until the worker has written the order row
+            if response.status_code != 200:
+                continue
+            status = response.json().get("status")
+            if status in FINAL_STATUSES:
+                self.orders[order_id] = status
+                self.outcomes[status] += 1
+                self.time_to_final.record((time.perf_counter() - submitted) * 1_000_000)
+                return
+
+    async def drain(self, timeout: float) -> int:
+        """Wait for tracked orders to become final; returns how many did not."""
+        if self._trackers:
+            _, pending = await asyncio.wait(set(self._trackers), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        return sum(1 for status in self.orders.values() if status is None)
+
+
+Step = Callable[[Context, int, float], Awaitable[None]]
+
+
+async def run(
+    ctx: Context,
+    step: Step,
+    duration: float,
+    concurrency: int,
+    rate: Optional[float] = None,
+    poisson: bool = False,
+) -> dict:
+    """Run `step` for `duration` seconds; returns the offered and achieved counts."""
+    started = time.perf_counter()
+    deadline = started + duration
+    issued = 0
+
+    if rate:
+        slots = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        async def one(i: int, intended: float):
+            async with slots:
+                await step(ctx, i, intended)
+
+        intended = started
+        while intended < deadline:
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.get_running_loop().create_task(one(issued, intended))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            issued += 1
+            intended += random.expovariate(rate) if poisson else 1 / rate
+        if tasks:
+            await asyncio.wait(set(tasks))
+    else:
+
+        async def worker():
+            nonlocal issued
+            while time.perf_counter() < deadline:
+                i = issued
+                issued += 1
+                await step(ctx, i, time.perf_counter())
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    return {"issued": issued, "elapsed": time.perf_counter() - started}
@@ -0,0 +1,147 @@
+"""
+Benchmark data and invariant checks, straight against MySQL (DATABASE_URL).
+
+Every run seeds its own products and customers, so the checks only look at
+rows the run created:
+
+- stock_never_negative: no product (or stock shard) ends below zero
+- stock_conserved:      per product, initial stock = stock left + units in
+                        COMPLETED orders (cancellations put units back)
+- money_conserved:      initial balances = balances left + price_paid of
+                        COMPLETED orders (cancellations refund)
+"""
+
+import uuid
+from typing import Dict, List
+
+from sqlalchemy import func
+
+from src.core import config
+from src.database.core import SessionLocal
+from src.entities.customer import Customer
+from src.entities.order import Order, OrderStatus
+from src.entities.product import Product
+from src.entities.product_stock_shard import ProductStockShard
+
+MONEY_TOLERANCE = 0.01
+
+
+class Fixture:
+    def __init__(self):
+        self.product_ids: List[str] = []
+        self.customer_ids: List[str] = []
+        self.initial_stock: Dict[str, int] = {}
+        self.initial_balance = 0.0
+
+    def seed(self, products: int, stock: int, customers: int, balance: float, price: float):
+        db = SessionLocal()
+        try:
+            run = uuid.uuid4().hex[:8]
+            for i in range(products):
+                product = Product(
+                    id=str(uuid.uuid4()),
+                    name=f"bench-{run}-{i}",
+                    description="benchmark product",
+                    base_price=price,
+                    stock=stock,
+                    initial_stock=stock,
+                )
+                db.add(product)
+                self.product_ids.append(product.id)
+                self.initial_stock[product.id] = stock
+            for i in range(customers):
+                customer = Customer(
+                    customer_id=str(uuid.uuid4()),
+                    username=f"bench-{run}-{i}",
+                    wallet_balance=balance,
+                )
+                db.add(customer)
+                self.customer_ids.append(customer.customer_id)
+            db.commit()
+        finally:
+            db.close()
+        self.initial_balance = balance * customers
+        if config.ID_FILTER_ENABLED:
+            # Rows inserted behind the API's back are unknown to the id filters
+            from src.modules.customers.service import known_ids as customer_ids
+            from src.modules.products.service import known_ids as product_ids
+
+            product_ids.add(*self.product_ids)
+            customer_ids.add(*self.customer_ids)
+
+    def check(self) -> dict:
+        db = SessionLocal()
+        try:
+            stock = dict(
+                db.query(Product.id, Product.stock)
+                .filter(Product.id.in_(self.product_ids))
+                .all()
+            )
+            shards = dict(
+                db.query(ProductStockShard.product_id, func.sum(ProductStockShard.stock))
+                .filter(ProductStockShard.product_id.in_(self.product_ids))
+                .group_by(ProductStockShard.product_id)
+                .all()
+            )
+            negative_shards = (
+                db.query(func.count())
+                .select_from(ProductStockShard)
+                .filter(
+                    ProductStockShard.product_id.in_(self.product_ids),
+                    ProductStockShard.stock < 0,
+                )
+                .scalar()
+            )
+            sold = dict(
+                db.query(Order.product_id, func.count())
+                .filter(
+                    Order.product_id.in_(self.product_ids),
+                    Order.status == OrderStatus.COMPLETED,
+                )
+                .group_by(Order.product_id)
+                .all()
+            )
+            paid = (
+                db.query(func.coalesce(func.sum(Order.price_paid), 0.0))
+                .filter(
+                    Order.customer_id.in_(self.customer_ids),
+                    Order.status == OrderStatus.COMPLETED,
+                )
+                .scalar()
+            )
+            balances = (
+                db.query(func.coalesce(func.sum(Customer.wallet_balance), 0.0))
+                .filter(Customer.customer_id.in_(self.customer_ids))
+                .scalar()
+            )
+            statuses = dict(
+                db.query(Order.status, func.count())
+                .filter(Order.product_id.in_(self.product_ids))
+                .group_by(Order.status)
+                .all()
+            )
+        finally:
+            db.close()
+
+        # Shards hold the real stock of sharded products
+        left = {pid: int(shards.get(pid, stock[pid])) for pid in self.product_ids}
+        drift = {
+            pid: self.initial_stock[pid] - left[pid] - sold.get(pid, 0)
+            for pid in self.product_ids
+        }
+        money_drift = self.initial_balance - float(balances) - float(paid)
+        return {
+            "stock_never_negative": {
+                "ok": all(value >= 0 for value in left.values()) and not negative_shards,
+                "min_stock": min(left.values()) if left else 0,
+            },
+            "stock_conserved": {
+                "ok": all(value == 0 for value in drift.values()),
+                "drift": {pid: value for pid, value in drift.items() if value},
+            },
+            "money_conserved": {
+                "ok": abs(money_drift) <= MONEY_TOLERANCE,
+                "drift": round(money_drift, 2),
+            },
+            "orders": {status.value: count for status, count in statuses.items()},
+        }
@@ -0,0 +1,76 @@
+"""
+Minimal HDR histogram: constant relative precision over a wide value range.
+
+Values (integers, here microseconds) are counted in buckets whose width grows
+with the magnitude, so every recorded value is kept to SIGNIFICANT_DIGITS
+decimal digits of precision with a fixed, small memory footprint, the same
+layout HdrHistogram uses.
+"""
+
+import math
+from typing import Dict, Tuple
+
+SIGNIFICANT_DIGITS = 3
+
+
+class Histogram:
+    def __init__(self, significant_digits: int = SIGNIFICANT_DIGITS):
+        # Smallest power of two giving the requested precision in one bucket
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10**significant_digits))
+        self.counts: Dict[Tuple[int, int], int] = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> Tuple[int, int]:
+        bucket = max(0, value.bit_length() - self.sub_bucket_bits)
+        return bucket, value >> bucket
+
+    def record(self, value: float) -> None:
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    def percentile(self, percent: float) -> int:
+        """Highest value equivalent to the value at `percent` (0-100)."""
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(self.total * percent / 100))
+        seen = 0
+        for (bucket, sub), count in sorted(self.counts.items(), key=_lowest):
+            seen += count
+            if seen >= target:
+                return min(self.max, ((sub + 1) << bucket) - 1)
+        return self.max
+
+    def summary(self, scale: float = 1.0) -> dict:
+        """Count, mean and percentiles, values divided by `scale`."""
+        return {
+            "count": self.total,
+            "mean": round(self.sum / self.total / scale, 3) if self.total else 0,
+            "min": round((self.min or 0) / scale, 3),
+            "p50": round(self.percentile(50) / scale, 3),
+            "p90": round(self.percentile(90) / scale, 3),
+            "p99": round(self.percentile(99) / scale, 3),
+            "p99.9": round(self.percentile(99.9) / scale, 3),
+            "max": round(self.max / scale, 3),
+        }
+
+
+def _lowest(item) -> int:
+    (bucket, sub), _ = item
+    return sub << bucket
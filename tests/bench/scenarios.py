@@ -0,0 +1,150 @@
+"""
+Named benchmark scenarios.
+
+Each scenario seeds its own data (`seed`), optionally prepares state through
+the API (`prepare`), then has the driver call `step` once per arrival.
+
+- hot_sku:     every order targets one product with less stock than demand
+- uniform:     orders spread uniformly over a catalog with ample stock
+- browse:      read-heavy: single and batch product lookups, few orders
+- status_poll: clients polling the status of orders placed beforehand
+- cancel_storm: concurrent (and repeated) cancellations of completed orders
+"""
+
+import random
+import time
+from typing import Dict, List
+
+from .driver import Context
+from .fixtures import Fixture
+
+
+class Scenario:
+    name = ""
+    products = 1
+    stock = 1_000_000
+    customers = 200
+    balance = 1_000_000.0
+    price = 10.0
+
+    def __init__(self, options: Dict):
+        self.options = options
+        self.fixture = Fixture()
+
+    def seed(self) -> None:
+        self.fixture.seed(
+            self.options.get("products", self.products),
+            self.options.get("stock", self.stock),
+            self.options.get("customers", self.customers),
+            self.balance,
+            self.price,
+        )
+
+    async def prepare(self, ctx: Context) -> None:
+        pass
+
+    async def step(self, ctx: Context, i: int, intended: float) -> None:
+        raise NotImplementedError
+
+    async def order(self, ctx: Context, product_id: str, since: float) -> None:
+        payload = {
+            "product_id": product_id,
+            "customer_id": random.choice(self.fixture.customer_ids),
+        }
+        response = await ctx.request("POST /orders/", "POST", "/orders/", since, json=payload)
+        if response is not None and response.status_code == 202:
+            ctx.track(response.json()["order_id"], since)
+
+
+class HotSku(Scenario):
+    name = "hot_sku"
+    stock = 500
+
+    async def step(self, ctx, i, intended):
+        await self.order(ctx, self.fixture.product_ids[0], intended)
+
+
+class Uniform(Scenario):
+    name = "uniform"
+    products = 500
+    stock = 10_000
+
+    async def step(self, ctx, i, intended):
+        await self.order(ctx, random.choice(self.fixture.product_ids), intended)
+
+
+class Browse(Scenario):
+    name = "browse"
+    products = 2_000
+    stock = 10_000
+    lookup_size = 20
+
+    def seed(self):
+        super().seed()
+        # Zipf-like popularity: a few products get most of the views
+        count = len(self.fixture.product_ids)
+        self.weights = [1 / (rank + 1) for rank in range(count)]
+
+    async def step(self, ctx, i, intended):
+        roll = random.random()
+        if roll < 0.9:
+            (product_id,) = random.choices(self.fixture.product_ids, self.weights)
+            await ctx.request(
+                "GET /products/{id}", "GET", f"/products/{product_id}", intended
+            )
+        elif roll < 0.98:
+            ids = random.choices(self.fixture.product_ids, self.weights, k=self.lookup_size)
+            await ctx.request(
+                "GET /products?ids=", "GET", "/products", intended,
+                params={"ids": ",".join(ids)},
+            )
+        else:
+            (product_id,) = random.choices(self.fixture.product_ids, self.weights)
+            await self.order(ctx, product_id, intended)
+
+
+class StatusPoll(Scenario):
+    name = "status_poll"
+    products = 50
+    stock = 10_000
+
+    async def prepare(self, ctx):
+        self.order_ids: List[str] = []
+        for _ in range(self.options.get("orders", 500)):
+            since = time.perf_counter()
+            await self.order(ctx, random.choice(self.fixture.product_ids), since)
+        self.order_ids = list(ctx.orders)
+
+    async def step(self, ctx, i, intended):
+        order_id = random.choice(self.order_ids)
+        await ctx.request("GET /orders/{id}", "GET", f"/orders/{order_id}", intended)
+
+
+class CancelStorm(Scenario):
+    name = "cancel_storm"
+    products = 20
+    stock = 10_000
+
+    async def prepare(self, ctx):
+        for _ in range(self.options.get("orders", 500)):
+            since = time.perf_counter()
+            await self.order(ctx, random.choice(self.fixture.product_ids), since)
+        await ctx.drain(self.options.get("drain_timeout", 120))
+        self.completed = [
+            order_id for order_id, status in ctx.orders.items() if status == "COMPLETED"
+        ]
+
+    async def step(self, ctx, i, intended):
+        if not self.completed:
+            return
+        # Orders are picked with replacement, so most get cancelled repeatedly
+        order_id = random.choice(self.completed)
+        await ctx.request(
+            "POST /orders/{id}/cancel", "POST", f"/orders/{order_id}/cancel", intended
+        )
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (HotSku, Uniform, Browse, StatusPoll, CancelStorm)
+}
@@ -0,0 +1,72 @@
+"""
+Sync vs async request path benchmark: requests/s per gunicorn worker for
+GET /products/{id} and GET /orders/{id}.
+
+Run it once against the stack started normally and once with
+ASYNC_API_ENABLED=true, then compare. WORKERS must match the gunicorn
+--workers value of the stack under test (9 in start.sh).
+
+    MODE=sync  python tests/bench_async_api.py
+    MODE=async python tests/bench_async_api.py
+"""
+
+import asyncio
+import os
+import time
+
+import httpx
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000/api/v1")
+MODE = os.getenv("MODE", "sync")
+WORKERS = int(os.getenv("WORKERS", "9"))
+CONCURRENCY = int(os.getenv("CONCURRENCY", "500"))
+DURATION = float(os.getenv("DURATION", "15"))
+
+PRODUCT_ID = "a1b2c3d4-e5f6-7890-1234-567890abcdef"
+ORDER_ID = "2a8ad668-6afe-47c5-bcb1-e48046dec281"
+
+ENDPOINTS = {
+    "GET /products/{id}": f"{BASE_URL}/products/{PRODUCT_ID}",
+    "GET /orders/{id}": f"{BASE_URL}/orders/{ORDER_ID}",
+}
+
+
+async def worker(client, url, deadline, counts):
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get(url)
+            counts["ok" if response.status_code == 200 else "error"] += 1
+        except httpx.HTTPError:
+            counts["error"] += 1
+
+
+async def measure(url: str) -> dict:
+    counts = {"ok": 0, "error": 0}
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(timeout=10.0, limits=limits) as client:
+        # Warm caches and connection pools
+        await client.get(url)
+        start = time.perf_counter()
+        deadline = start + DURATION
+        await asyncio.gather(
+            *[worker(client, url, deadline, counts) for _ in range(CONCURRENCY)]
+        )
+        elapsed = time.perf_counter() - start
+
+    rps = counts["ok"] / elapsed
+    return {"rps": round(rps, 1), "rps_per_worker": round(rps / WORKERS, 1), **counts}
+
+
+async def main():
+    print(f"mode={MODE} workers={WORKERS} concurrency={CONCURRENCY} duration={DURATION}s")
+    print(f"{'endpoint':<20} {'req/s':>9} {'req/s/worker':>13} {'errors':>7}")
+    for name, url in ENDPOINTS.items():
+        result = await measure(url)
+        print(
+            f"{name:<20} {result['rps']:>9} {result['rps_per_worker']:>13} "
+            f"{result['error']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Enqueue throughput: POST /orders/ per order vs POST /orders/batch.
+
+Submits ORDERS orders through each endpoint against the running stack and
+reports accepted orders per second. The single endpoint is driven with
+CONCURRENCY parallel requests; the batch endpoint with BATCH_SIZE orders per
+request and BATCH_CONCURRENCY parallel requests. Only the enqueue path is
+measured, the orders are settled by the workers afterwards.
+
+    python tests/bench_bulk_orders.py
+"""
+
+import asyncio
+import os
+import time
+
+import httpx
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000/api/v1")
+ORDERS = int(os.getenv("ORDERS", "20000"))
+CONCURRENCY = int(os.getenv("CONCURRENCY", "200"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+PAYLOAD = {
+    "customer_id": "43e8ff2f-5d48-498f-a569-ca2cf9f7fae3",
+    "product_id": "a1b2c3d4-e5f6-7890-1234-567890abcdef",
+}
+
+
+async def run_single(client) -> dict:
+    counts = {"accepted": 0, "error": 0}
+    queue = asyncio.Queue()
+    for _ in range(ORDERS):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            try:
+                response = await client.post(f"{BASE_URL}/orders/", json=PAYLOAD)
+                counts["accepted" if response.status_code == 202 else "error"] += 1
+            except httpx.HTTPError:
+                counts["error"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    return {**counts, "elapsed": time.perf_counter() - start}
+
+
+async def run_batch(client) -> dict:
+    counts = {"accepted": 0, "error": 0}
+    sizes = [min(BATCH_SIZE, ORDERS - i) for i in range(0, ORDERS, BATCH_SIZE)]
+    queue = asyncio.Queue()
+    for size in sizes:
+        queue.put_nowait(size)
+
+    async def worker():
+        while not queue.empty():
+            size = queue.get_nowait()
+            try:
+                response = await client.post(
+                    f"{BASE_URL}/orders/batch", json={"orders": [PAYLOAD] * size}
+                )
+                if response.status_code != 202:
+                    counts["error"] += size
+                    continue
+                items = response.json()["items"]
+                accepted = sum(1 for item in items if item.get("status") == "PENDING")
+                counts["accepted"] += accepted
+                counts["error"] += size - accepted
+            except httpx.HTTPError:
+                counts["error"] += size
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(BATCH_CONCURRENCY)])
+    return {**counts, "elapsed": time.perf_counter() - start}
+
+
+async def main():
+    print(f"orders={ORDERS} concurrency={CONCURRENCY} batch_size={BATCH_SIZE}")
+    print(f"{'endpoint':<16} {'orders/s':>10} {'accepted':>9} {'errors':>7}")
+    limits = httpx.Limits(max_connections=max(CONCURRENCY, BATCH_CONCURRENCY))
+    async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+        for name, run in (("POST /orders/", run_single), ("POST /orders/batch", run_batch)):
+            result = await run(client)
+            print(
+                f"{name:<16} {result['accepted'] / result['elapsed']:>10.1f} "
+                f"{result['accepted']:>9} {result['error']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
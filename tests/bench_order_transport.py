@@ -0,0 +1,106 @@
+"""
+Broker overhead benchmark: Celery tasks vs the Redis Streams transport.
+
+Needs only Redis (REDIS_URL, and the Celery broker configured in
+workers/celery.py); nothing is settled. For ORDERS orders each transport is
+measured on:
+
+- enqueue:  one message per order the way `dispatch_order` sends it
+            (process_order.apply_async vs a single-entry XADD)
+- broker:   bytes held by Redis per queued order (MEMORY USAGE of the queue)
+- drain:    messages consumed per second by one consumer, including the
+            per-message acknowledgement and, for Celery, the result write to
+            the result backend that a worker performs after every task
+
+Celery messages go to a private queue and the stream uses its own key, so
+running workers do not consume them.
+
+    PYTHONPATH=. python tests/bench_order_transport.py
+"""
+
+import os
+import time
+import uuid
+
+os.environ.setdefault("ORDER_STREAM_KEY", "bench:orders:stream")
+os.environ.setdefault("ORDER_STREAM_GROUP", "bench")
+
+from src.core import config  # noqa: E402
+from src.database.redis import r  # noqa: E402
+from src.modules.workers import streams  # noqa: E402
+from src.modules.workers.celery import celery_app, process_order  # noqa: E402
+
+ORDERS = int(os.getenv("ORDERS", "20000"))
+BATCH = int(os.getenv("BATCH", "200"))
+CELERY_QUEUE = "bench.transport"
+
+PRODUCT_ID = "a1b2c3d4-e5f6-7890-1234-567890abcdef"
+CUSTOMER_ID = "43e8ff2f-5d48-498f-a569-ca2cf9f7fae3"
+
+
+def bench_celery() -> dict:
+    r.delete(CELERY_QUEUE)
+    start = time.perf_counter()
+    for _ in range(ORDERS):
+        process_order.apply_async(
+            (str(uuid.uuid4()), PRODUCT_ID, CUSTOMER_ID),
+            {"reserved": False},
+            queue=CELERY_QUEUE,
+        )
+    enqueue = time.perf_counter() - start
+    broker_bytes = r.memory_usage(CELERY_QUEUE, samples=0) or 0
+
+    drained = 0
+    start = time.perf_counter()
+    with celery_app.connection_for_read() as conn:
+        queue = conn.SimpleQueue(CELERY_QUEUE)
+        while drained < ORDERS:
+            message = queue.get(timeout=5)
+            task_id = message.headers["id"]
+            message.ack()
+            celery_app.backend.store_result(
+                task_id, {"order_id": task_id, "status": "COMPLETED"}, "SUCCESS"
+            )
+            drained += 1
+        queue.close()
+    drain = time.perf_counter() - start
+    r.delete(CELERY_QUEUE)
+    return {"enqueue": enqueue, "broker_bytes": broker_bytes, "drain": drain}
+
+
+def bench_stream() -> dict:
+    r.delete(config.ORDER_STREAM_KEY)
+    consumer = streams.StreamConsumer("bench")
+    consumer.ensure_group()
+    start = time.perf_counter()
+    for _ in range(ORDERS):
+        streams.publish([(str(uuid.uuid4()), PRODUCT_ID, CUSTOMER_ID, False)])
+    enqueue = time.perf_counter() - start
+    broker_bytes = r.memory_usage(config.ORDER_STREAM_KEY, samples=0) or 0
+
+    drained = 0
+    start = time.perf_counter()
+    while drained < ORDERS:
+        entries = consumer._read()
+        consumer._ack([entry_id for entry_id, _ in entries])
+        drained += len(entries)
+    drain = time.perf_counter() - start
+    r.delete(config.ORDER_STREAM_KEY)
+    return {"enqueue": enqueue, "broker_bytes": broker_bytes, "drain": drain}
+
+
+def main():
+    config.ORDER_STREAM_BATCH = BATCH
+    print(f"orders={ORDERS} stream_batch={BATCH}")
+    print(f"{'transport':<10} {'enqueue/s':>10} {'bytes/order':>12} {'drain/s':>10}")
+    for name, bench in (("celery", bench_celery), ("stream", bench_stream)):
+        result = bench()
+        print(
+            f"{name:<10} {ORDERS / result['enqueue']:>10.1f} "
+            f"{result['broker_bytes'] / ORDERS:>12.1f} "
+            f"{ORDERS / result['drain']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
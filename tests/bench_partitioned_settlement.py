@@ -0,0 +1,93 @@
+"""
+Hot-SKU settlement benchmark: row locking vs a single partition writer.
+
+Runs in-process (no broker, no API) against the MySQL in DATABASE_URL. All
+orders target one product, spread over CUSTOMERS funded customers. The
+`locking` engine settles them from THREADS threads, which all serialize on
+the product row lock; the partition settler (ORDER_PROCESSING_MODE=partitioned)
+settles them from one thread in batches of BATCH_SIZE, the way a partition
+consumer drains its queue. Reports throughput and the outcome split. Each
+engine seeds its own product and customers (tests/bench/fixtures), so the
+database dump is left untouched.
+
+    PYTHONPATH=. python tests/bench_partitioned_settlement.py
+"""
+
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.bench import use_local_database
+
+use_local_database()
+
+from src.database.core import SessionLocal  # noqa: E402
+from src.modules.workers.partition import PartitionSettler  # noqa: E402
+from src.modules.workers.settlement import settle_order  # noqa: E402
+from tests.bench.fixtures import Fixture  # noqa: E402
+
+ORDERS = int(os.getenv("ORDERS", "5000"))
+CUSTOMERS = int(os.getenv("CUSTOMERS", "50"))
+THREADS = int(os.getenv("THREADS", "32"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "200"))
+
+
+def prepare() -> Fixture:
+    """Seed one hot product with enough stock and funded customers."""
+    fixture = Fixture()
+    fixture.seed(
+        products=1,
+        stock=ORDERS * 10,
+        customers=CUSTOMERS,
+        balance=10_000_000.0,
+        price=10.0,
+    )
+    return fixture
+
+
+def run_locking(product_id: str, orders: list) -> list:
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = pool.map(
+            lambda order: settle_order(order[0], product_id, order[1], engine="locking"),
+            orders,
+        )
+        return [result["status"] for result in results]
+
+
+def run_partition(product_id: str, orders: list) -> list:
+    settler = PartitionSettler()
+    statuses = []
+    for i in range(0, len(orders), BATCH_SIZE):
+        db = SessionLocal()
+        try:
+            results = settler.settle(db, product_id, orders[i : i + BATCH_SIZE])
+        finally:
+            db.close()
+        statuses.extend(result["status"] for result in results.values())
+    return statuses
+
+
+def main():
+    print(f"orders={ORDERS} customers={CUSTOMERS} threads={THREADS} batch={BATCH_SIZE}")
+    print(f"{'engine':<24} {'orders/s':>9} {'completed':>10} {'failed':>7}")
+    for name, run in (
+        (f"locking x{THREADS} threads", run_locking),
+        ("partition writer", run_partition),
+    ):
+        fixture = prepare()
+        orders = [
+            (str(uuid.uuid4()), fixture.customer_ids[i % CUSTOMERS])
+            for i in range(ORDERS)
+        ]
+        start = time.perf_counter()
+        statuses = run(fixture.product_ids[0], orders)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<24} {ORDERS / elapsed:>9.1f} "
+            f"{statuses.count('COMPLETED'):>10} {statuses.count('FAILED'):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+In-process settlement microbenchmark for orders.process_order.
+
+Calls the process_order task body directly (no broker, no API) from WORKERS
+threads, or from WORKERS single-threaded processes like the prefork pool, once
+per settlement engine. Data is seeded fresh for every engine run in the
+database at DATABASE_URL (MySQL, or a SQLite file whose tables are created on
+the fly). Redis is REDIS_URL, or an in-memory stand-in with --fake-redis
+(needs the fakeredis package, threads only).
+
+Reports settles per second, latency percentiles, the COMPLETED/FAILED split,
+orders that raised (the task would have retried them), the stock and money
+invariants, and the time spent in each settlement phase (see `phase_hook` in
+src/modules/workers/settlement.py). Latencies are in milliseconds. SQLite
+ignores FOR UPDATE, so the locking engine oversells there and fails the
+invariants; compare engines on MySQL.
+
+    PYTHONPATH=. python tests/bench_process_order.py
+    PYTHONPATH=. python tests/bench_process_order.py --products 500 --distribution zipf --processes
+    DATABASE_URL=sqlite:////tmp/bench.db PYTHONPATH=. python tests/bench_process_order.py \\
+        --fake-redis --engines conditional
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tests.bench import use_local_database
+
+use_local_database()
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+
+DISTRIBUTIONS = ("hot", "uniform", "zipf")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="tests/bench_process_order.py")
+    parser.add_argument("--engines", nargs="+", default=None, help="default: every settlement engine")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32, help="threads, or processes with --processes")
+    parser.add_argument("--processes", action="store_true", help="one single-threaded process per worker")
+    parser.add_argument("--products", type=int, default=1)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="hot",
+                        help="hot: every order on one product; zipf: a few products get most orders")
+    parser.add_argument("--stock", type=int, default=None, help="per product; default 10x the orders")
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--balance", type=float, default=10_000_000.0)
+    parser.add_argument("--price", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the order mix")
+    parser.add_argument("--fake-redis", action="store_true", help="in-memory Redis stand-in (fakeredis)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+    if args.fake_redis and args.processes:
+        parser.error("--fake-redis is per process; point REDIS_URL at a local Redis for --processes")
+    return args
+
+
+def use_fake_redis() -> None:
+    """Swap the shared clients before any module binds them."""
+    import fakeredis
+
+    import src.database.redis as redis_clients
+
+    server = fakeredis.FakeServer()
+    redis_clients.r = fakeredis.FakeRedis(server=server)
+    redis_clients.ar = fakeredis.FakeAsyncRedis(server=server)
+
+
+def prepare_database() -> None:
+    from sqlalchemy import event
+
+    from src.database.core import engine
+    from src.entities.customer import Customer
+    from src.entities.order import Order
+    from src.entities.product import Product
+    from src.entities.product_stock_shard import ProductStockShard
+
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(connection, _):
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA busy_timeout=30000")
+
+    # Each entity module declares its own Base
+    for entity in (Customer, Product, Order, ProductStockShard):
+        entity.metadata.create_all(engine)
+
+
+def make_orders(args, product_ids: list, customer_ids: list) -> list:
+    rng = random.Random(args.seed)
+    if args.distribution == "hot":
+        products = [product_ids[0]] * args.orders
+    elif args.distribution == "uniform":
+        products = [rng.choice(product_ids) for _ in range(args.orders)]
+    else:
+        weights = [1 / (rank + 1) for rank in range(len(product_ids))]
+        products = rng.choices(product_ids, weights, k=args.orders)
+    return [(str(uuid.uuid4()), pid, rng.choice(customer_ids)) for pid in products]
+
+
+# Phases of the order being settled by the current thread
+_current = threading.local()
+
+
+def _record_phase(name: str, seconds: float) -> None:
+    phases = _current.phases
+    phases[name] = phases.get(name, 0.0) + seconds
+
+
+def init_worker(engine_name: str, fork: bool = False) -> None:
+    from src.core import config
+    from src.modules.workers import settlement
+
+    # Imported once up front: threads importing it concurrently can see a
+    # half-initialised module
+    import src.modules.workers.celery  # noqa: F401
+
+    if fork:
+        # Pooled connections inherited from the parent belong to the parent
+        from src.database.core import engine
+
+        engine.dispose(close=False)
+    config.SETTLEMENT_ENGINE = engine_name
+    settlement.phase_hook = _record_phase
+
+
+def settle(order) -> tuple:
+    """Run process_order once; returns (seconds, status, phases)."""
+    from src.modules.workers.celery import process_order
+
+    _current.phases = {}
+    start = time.perf_counter()
+    try:
+        status = process_order(*order)["status"]
+    except Exception as e:
+        # A worker would retry these (SQLAlchemyError) or log them
+        status = f"ERROR {type(e).__name__}"
+    return time.perf_counter() - start, status, _current.phases
+
+
+def settle_chunk(orders: list) -> list:
+    return [settle(order) for order in orders]
+
+
+def run(args, engine_name: str) -> dict:
+    from tests.bench.fixtures import Fixture
+    from tests.bench.hdr import Histogram
+
+    fixture = Fixture()
+    fixture.seed(
+        args.products,
+        args.stock if args.stock is not None else args.orders * 10,
+        args.customers,
+        args.balance,
+        args.price,
+    )
+    orders = make_orders(args, fixture.product_ids, fixture.customer_ids)
+
+    start = time.perf_counter()
+    if args.processes:
+        chunks = [orders[i :: args.workers] for i in range(args.workers)]
+        with ProcessPoolExecutor(
+            max_workers=args.workers, initializer=init_worker, initargs=(engine_name, True)
+        ) as pool:
+            samples = [sample for chunk in pool.map(settle_chunk, chunks) for sample in chunk]
+    else:
+        init_worker(engine_name)
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            samples = list(pool.map(settle, orders))
+    elapsed = time.perf_counter() - start
+
+    latency = Histogram()
+    phases = {}
+    statuses = {}
+    unaccounted = Histogram()
+    for seconds, status, order_phases in samples:
+        latency.record(seconds * 1_000_000)
+        statuses[status] = statuses.get(status, 0) + 1
+        for name, spent in order_phases.items():
+            phases.setdefault(name, Histogram()).record(spent * 1_000_000)
+        unaccounted.record((seconds - sum(order_phases.values())) * 1_000_000)
+
+    invariants = fixture.check()
+    return {
+        "engine": engine_name,
+        "settles_per_second": round(len(samples) / elapsed, 1),
+        "elapsed_s": round(elapsed, 3),
+        "latency_ms": latency.summary(scale=1000),
+        "statuses": dict(sorted(statuses.items())),
+        "phases_ms": {name: histogram.summary(scale=1000) for name, histogram in phases.items()},
+        "unaccounted_ms": unaccounted.summary(scale=1000),
+        "invariants": {
+            check: invariants[check]["ok"]
+            for check in ("stock_never_negative", "stock_conserved", "money_conserved")
+        },
+    }
+
+
+def print_result(result: dict) -> None:
+    statuses = result["statuses"]
+    errors = sum(count for status, count in statuses.items() if status.startswith("ERROR"))
+    latency = result["latency_ms"]
+    print(
+        f"{result['engine']:<12} {result['settles_per_second']:>9} {latency['p50']:>8} "
+        f"{latency['p99']:>8} {statuses.get('COMPLETED', 0):>10} "
+        f"{statuses.get('FAILED', 0):>7} {errors:>7}  "
+        + " ".join(name for name, ok in result["invariants"].items() if not ok)
+    )
+    phases = dict(result["phases_ms"], unaccounted=result["unaccounted_ms"])
+    for name, summary in phases.items():
+        print(
+            f"  {name:<16} n={summary['count']:<7} mean {summary['mean']:>8} "
+            f"p50 {summary['p50']:>8} p99 {summary['p99']:>8}"
+        )
+
+
+def main():
+    args = parse_args()
+    # Per-order warnings (insufficient stock, ...) would drown the report
+    logging.basicConfig(level=logging.ERROR)
+    if args.fake_redis:
+        use_fake_redis()
+    prepare_database()
+
+    from src.modules.workers.settlement import ENGINES
+
+    engines = args.engines or list(ENGINES)
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        raise SystemExit(f"Unknown engines: {', '.join(sorted(unknown))}")
+
+    mode = f"{args.workers} {'processes' if args.processes else 'threads'}"
+    print(
+        f"{args.orders} orders, {mode}, {args.products} products ({args.distribution}), "
+        f"{args.customers} customers"
+    )
+    print(
+        f"{'engine':<12} {'settles/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'completed':>10} {'failed':>7} {'errors':>7}  violated"
+    )
+    results = []
+    for engine_name in engines:
+        result = run(args, engine_name)
+        results.append(result)
+        print_result(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
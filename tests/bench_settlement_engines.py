@@ -0,0 +1,100 @@
+"""
+Settlement engine contention benchmark: locking vs conditional.
+
+Runs the settlement engines in-process (no broker, no API) from THREADS threads
+against the MySQL in DATABASE_URL. All orders target one hot product, spread
+over CUSTOMERS funded customers, which is the flash-sale shape where row-lock
+hold time dominates. Reports throughput and latency percentiles per engine.
+
+    PYTHONPATH=. python tests/bench_settlement_engines.py
+"""
+
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.bench import use_local_database
+
+use_local_database()
+
+from src.database.core import SessionLocal  # noqa: E402
+from src.entities.customer import Customer  # noqa: E402
+from src.entities.product import Product  # noqa: E402
+from src.modules.workers.settlement import ENGINES, settle_order  # noqa: E402
+
+PRODUCT_ID = "b2c3d4e5-f6a7-8901-2345-67890abcdef1"
+ORDERS = 2000
+CUSTOMERS = 50
+THREADS = 32
+
+
+def prepare() -> list:
+    """Give the hot product enough stock and create funded customers."""
+    db = SessionLocal()
+    try:
+        product = db.query(Product).filter(Product.id == PRODUCT_ID).one()
+        product.stock = ORDERS * 10
+        product.initial_stock = ORDERS * 10
+
+        customer_ids = []
+        for _ in range(CUSTOMERS):
+            customer = Customer(
+                customer_id=str(uuid.uuid4()),
+                username=f"bench-{uuid.uuid4()}",
+                wallet_balance=10_000_000.0,
+            )
+            db.add(customer)
+            customer_ids.append(customer.customer_id)
+        db.commit()
+        return customer_ids
+    finally:
+        db.close()
+
+
+def timed_settle(engine: str, customer_id: str):
+    start = time.perf_counter()
+    result = settle_order(str(uuid.uuid4()), PRODUCT_ID, customer_id, engine=engine)
+    return time.perf_counter() - start, result["status"]
+
+
+def run(engine: str) -> dict:
+    customer_ids = prepare()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        samples = list(
+            pool.map(
+                lambda i: timed_settle(engine, customer_ids[i % CUSTOMERS]),
+                range(ORDERS),
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "engine": engine,
+        "orders_per_second": round(ORDERS / elapsed, 1),
+        "p50_ms": round(percentiles[49], 2),
+        "p99_ms": round(percentiles[98], 2),
+        "completed": sum(1 for _, status in samples if status == "COMPLETED"),
+        "failed": sum(1 for _, status in samples if status == "FAILED"),
+    }
+
+
+def main():
+    print(
+        f"{'engine':<12} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'completed':>10} {'failed':>7}"
+    )
+    for engine in ENGINES:
+        result = run(engine)
+        print(
+            f"{result['engine']:<12} {result['orders_per_second']:>9} "
+            f"{result['p50_ms']:>8} {result['p99_ms']:>8} "
+            f"{result['completed']:>10} {result['failed']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Sharded stock benchmark: settle throughput for a single hot product as the
+number of stock shards (K) grows.
+
+Requires the stack running with SHARDED_STOCK_ENABLED=true and direct access to
+MySQL (DATABASE_URL). For every K the product is re-sharded, ORDERS orders are
+submitted concurrently from CUSTOMERS distinct customers (so customer row locks
+do not serialize the run), and the time until every order is settled is measured.
+
+    PYTHONPATH=. python tests/bench_sharded_stock.py
+"""
+
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from tests.bench import use_local_database
+
+use_local_database()
+
+from src.database.core import SessionLocal  # noqa: E402
+from src.entities.customer import Customer  # noqa: E402
+from src.entities.order import Order, OrderStatus  # noqa: E402
+from src.entities.product import Product  # noqa: E402
+from src.modules.products import shards  # noqa: E402
+
+URL = "http://localhost:8000/api/v1/orders/"
+PRODUCT_ID = "b2c3d4e5-f6a7-8901-2345-67890abcdef1"
+SHARD_COUNTS = [1, 2, 4, 8, 16]
+ORDERS = 2000
+CUSTOMERS = 200
+CONCURRENCY = 200
+SETTLE_TIMEOUT = 300
+
+
+def prepare(shard_count: int) -> list:
+    """Reset stock, shard the product and create funded customers."""
+    db = SessionLocal()
+    try:
+        shards.merge(db, PRODUCT_ID)
+        product = db.query(Product).filter(Product.id == PRODUCT_ID).one()
+        product.stock = ORDERS * 10
+        product.initial_stock = ORDERS * 10
+        db.commit()
+        shards.split(db, PRODUCT_ID, shard_count)
+
+        customer_ids = []
+        for _ in range(CUSTOMERS):
+            customer = Customer(
+                customer_id=str(uuid.uuid4()),
+                username=f"bench-{uuid.uuid4()}",
+                wallet_balance=10_000_000.0,
+            )
+            db.add(customer)
+            customer_ids.append(customer.customer_id)
+        db.commit()
+        return customer_ids
+    finally:
+        db.close()
+
+
+def settled(order_ids: list) -> int:
+    db = SessionLocal()
+    try:
+        return (
+            db.query(Order)
+            .filter(
+                Order.order_id.in_(order_ids),
+                Order.status.in_([OrderStatus.COMPLETED, OrderStatus.FAILED]),
+            )
+            .count()
+        )
+    finally:
+        db.close()
+
+
+async def submit(client, semaphore, customer_id, order_ids):
+    async with semaphore:
+        response = await client.post(
+            URL, json={"customer_id": customer_id, "product_id": PRODUCT_ID}
+        )
+        if response.status_code == 202:
+            order_ids.append(response.json()["order_id"])
+
+
+async def run(shard_count: int) -> dict:
+    customer_ids = prepare(shard_count)
+    order_ids = []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        await asyncio.gather(
+            *[
+                submit(client, semaphore, customer_ids[i % CUSTOMERS], order_ids)
+                for i in range(ORDERS)
+            ]
+        )
+
+    done = 0
+    while time.perf_counter() - start < SETTLE_TIMEOUT:
+        done = settled(order_ids)
+        if done >= len(order_ids):
+            break
+        await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "shards": shard_count,
+        "accepted": len(order_ids),
+        "settled": done,
+        "seconds": round(elapsed, 2),
+        "orders_per_second": round(done / elapsed, 1),
+    }
+
+
+async def main():
+    print(f"{'K':>4} {'accepted':>9} {'settled':>8} {'seconds':>8} {'orders/s':>9}")
+    for shard_count in SHARD_COUNTS:
+        result = await run(shard_count)
+        print(
+            f"{result['shards']:>4} {result['accepted']:>9} {result['settled']:>8} "
+            f"{result['seconds']:>8} {result['orders_per_second']:>9}"
+        )
+
+    db = SessionLocal()
+    try:
+        shards.merge(db, PRODUCT_ID)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""
+Per-process vs shared-memory product cache at WORKERS processes.
+
+Simulates the API workers of one host reading a CATALOG-sized product catalog
+with a skewed (Zipf-like) popularity for DURATION seconds. A miss stands for a
+Redis/MySQL round trip and refills the caches. Two layouts are compared:
+
+- inproc: each worker has its own TTLCache (the default layout)
+- shm:    a small per-worker TTLCache in front of one shared-memory table
+
+Reports the hit rate seen by the workers and the memory held by the caches:
+per-worker cache contents are measured with tracemalloc and summed, the
+shared table counts once at the size tmpfs actually allocated for it (pages
+never written are not backed by memory).
+
+    python tests/bench_shm_cache.py
+"""
+
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from multiprocessing import Process, Queue
+
+from cachetools import TTLCache
+
+from src.modules.products.model import ProductResponse
+from src.modules.products.shm import SharedTable
+
+WORKERS = int(os.getenv("WORKERS", "9"))
+CATALOG = int(os.getenv("CATALOG", "5000"))
+DURATION = float(os.getenv("DURATION", "10"))
+TTL = float(os.getenv("TTL", "2"))
+LOCAL_MAXSIZE = int(os.getenv("LOCAL_MAXSIZE", "10000"))
+SHM_LOCAL_MAXSIZE = int(os.getenv("SHM_LOCAL_MAXSIZE", "256"))
+SHM_SLOTS = int(os.getenv("SHM_SLOTS", str(2 * CATALOG)))
+SHM_SLOT_BYTES = int(os.getenv("SHM_SLOT_BYTES", "512"))
+
+PRODUCT_IDS = [str(uuid.UUID(int=i + 1)) for i in range(CATALOG)]
+WEIGHTS = [1 / (rank + 1) for rank in range(CATALOG)]
+
+
+def product(product_id: str) -> ProductResponse:
+    return ProductResponse(
+        product_id=product_id,
+        name=f"Product {product_id[-6:]}",
+        description="Benchmark product with a description of typical length.",
+        base_price=100.0,
+        current_price=112.5,
+        stock=1000,
+        initial_stock=1000,
+    )
+
+
+def run_worker(layout: str, table_path: str, results: Queue) -> None:
+    rng = random.Random(os.getpid())
+    table = SharedTable(table_path, SHM_SLOTS, SHM_SLOT_BYTES) if layout == "shm" else None
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    local = TTLCache(maxsize=LOCAL_MAXSIZE if table is None else SHM_LOCAL_MAXSIZE, ttl=TTL)
+    counts = {"local": 0, "shared": 0, "miss": 0}
+
+    deadline = time.monotonic() + DURATION
+    while time.monotonic() < deadline:
+        for product_id in rng.choices(PRODUCT_IDS, WEIGHTS, k=256):
+            if product_id in local:
+                counts["local"] += 1
+                continue
+            if table is not None:
+                payload = table.get(product_id)
+                if payload is not None:
+                    counts["shared"] += 1
+                    local[product_id] = ProductResponse.model_validate_json(payload)
+                    continue
+            counts["miss"] += 1
+            response = product(product_id)
+            local[product_id] = response
+            if table is not None:
+                table.put(product_id, response.model_dump_json().encode("utf-8"), TTL)
+
+    counts["local_bytes"] = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    results.put(counts)
+
+
+def run(layout: str, table_path: str) -> dict:
+    results = Queue()
+    workers = [
+        Process(target=run_worker, args=(layout, table_path, results))
+        for _ in range(WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    samples = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    reads = sum(s["local"] + s["shared"] + s["miss"] for s in samples)
+    local_bytes = sum(s["local_bytes"] for s in samples)
+    if layout == "shm":
+        table_file = SharedTable(table_path, SHM_SLOTS, SHM_SLOT_BYTES).path
+        shared_bytes = os.stat(table_file).st_blocks * 512
+    else:
+        shared_bytes = 0
+    return {
+        "layout": layout,
+        "reads": reads,
+        "hit_rate": (reads - sum(s["miss"] for s in samples)) / reads,
+        "shared_hits": sum(s["shared"] for s in samples) / reads,
+        "memory_mb": (local_bytes + shared_bytes) / 2**20,
+    }
+
+
+def main():
+    print(f"workers={WORKERS} catalog={CATALOG} ttl={TTL}s duration={DURATION}s")
+    print(f"{'layout':<8} {'reads':>10} {'hit rate':>9} {'shm hits':>9} {'memory MB':>10}")
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as tmp:
+        table_path = os.path.join(tmp, "bench-products")
+        rows = [run("inproc", table_path), run("shm", table_path)]
+    for row in rows:
+        print(
+            f"{row['layout']:<8} {row['reads']:>10} {row['hit_rate']:>9.2%} "
+            f"{row['shared_hits']:>9.2%} {row['memory_mb']:>10.1f}"
+        )
+    saved = rows[0]["memory_mb"] - rows[1]["memory_mb"]
+    print(f"memory saved: {saved:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
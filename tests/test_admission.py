@@ -0,0 +1,87 @@
+"""
+Admission control against an in-memory Redis (fakeredis) and a fake clock.
+
+    PYTHONPATH=. python -m pytest tests/test_admission.py
+"""
+
+import types
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+from src.core import config
+from src.modules.orders import admission
+
+
+@pytest.fixture
+def env(monkeypatch):
+    redis = fakeredis.FakeRedis()
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(admission, "r", redis)
+    monkeypatch.setattr(admission, "_take", redis.register_script(admission._TAKE))
+    monkeypatch.setattr(
+        admission, "time", types.SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    monkeypatch.setattr(config, "ORDER_TRANSPORT", "celery")
+    return types.SimpleNamespace(
+        redis=redis, clock=clock, controller=admission.AdmissionController()
+    )
+
+
+def _tick(env, settled: int = 0) -> None:
+    env.clock.now += config.ADMISSION_SAMPLE_SECONDS
+    if settled:
+        env.redis.incrby(admission.SETTLED_KEY, settled)
+    env.controller._sample()
+
+
+def test_idle_after_burst_admits_on_empty_queue(env):
+    env.controller._sample()
+    _tick(env, settled=200)
+    assert env.controller.settle_rate > 0
+
+    # Halved per idle sample until it drops below the floor
+    for _ in range(20):
+        _tick(env)
+    assert env.controller.settle_rate == 0.0
+    assert env.controller.queue_depth == 0
+
+    env.controller.admit("customer-1")
+    assert env.controller.admit_many([f"customer-{n}" for n in range(100)]) == [None] * 100
+
+
+def test_large_batch_on_empty_queue_is_admitted(env):
+    env.controller._sample()
+    _tick(env, settled=1)
+    assert env.controller.overload_retry_after(incoming=500) is None
+
+
+def test_backlog_over_drain_time_is_shed(env):
+    env.controller._sample()
+    _tick(env, settled=10)
+    env.redis.rpush("celery", *range(1000))
+    _tick(env, settled=10)
+
+    with pytest.raises(HTTPException) as shed:
+        env.controller.admit("customer-1")
+    assert shed.value.status_code == 503
+    assert int(shed.value.headers["Retry-After"]) > 0
+
+
+def test_metrics_track_depth_and_shed(env, monkeypatch):
+    from src.core import metrics
+
+    monkeypatch.setattr(config, "METRICS_ENABLED", True)
+    monkeypatch.setattr(admission, "metrics", metrics, raising=False)
+    shed = metrics.ORDERS_SHED.labels("overloaded")._value.get()
+
+    env.controller._sample()
+    _tick(env, settled=10)
+    env.redis.rpush("celery", *range(1000))
+    _tick(env, settled=10)
+    with pytest.raises(HTTPException):
+        env.controller.admit("customer-1")
+
+    assert metrics.ADMISSION_QUEUE_DEPTH._value.get() == 1000
+    assert metrics.ORDERS_SHED.labels("overloaded")._value.get() == shed + 1